@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The Modal apps live as top-level modules in modal/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,67 @@
+import base64
+import shutil
+import subprocess
+
+import pytest
+
+from vectcut_models import SceneClip, SceneData, VideoCompositionRequest
+from vectcut_processor import build_timeline, plan_render_chunks, render_chunks_local
+
+pytestmark = pytest.mark.skipif(
+    not (shutil.which("ffmpeg") and shutil.which("ffprobe")), reason="ffmpeg not installed"
+)
+
+FPS = 30
+
+
+def make_clip(path, color, duration):
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "lavfi", "-i", f"color=c={color}:s=1280x720:r={FPS}:d={duration}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-shortest", str(path),
+        ],
+        check=True,
+    )
+    return "data:video/mp4;base64," + base64.b64encode(path.read_bytes()).decode()
+
+
+def frame_count(path):
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-count_frames", "-select_streams", "v:0",
+            "-show_entries", "stream=nb_read_frames", "-of", "csv=p=0", str(path),
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    return int(result.stdout.strip())
+
+
+def test_local_backend_renders_chunks(tmp_path):
+    scenes = [
+        SceneData(id=f"s{i}", video_url=make_clip(tmp_path / f"s{i}.mp4", color, 2), duration=2)
+        for i, color in enumerate(["red", "green", "blue", "white"])
+    ]
+    request = VideoCompositionRequest(
+        project_id="test", scenes=scenes, resolution="sd", fps=FPS, transition_duration=0.5,
+        render_mode="distributed", render_workers=2, use_cache=False,
+    )
+
+    chunks = plan_render_chunks(request, tmp_path / "chunks", "ultrafast")
+    results = render_chunks_local(request, chunks)
+
+    assert [chunk.index for chunk in chunks] == [0, 1]
+    assert all(results)
+    first, second = results
+    assert first.head is None and first.tail is not None
+    assert second.head is not None and second.tail is None
+    assert frame_count(first.tail) == frame_count(second.head) == round(chunks[0].overlap_out * FPS)
+    assert [clip.scene_index for clip in first.clips + second.clips] == [0, 1, 2, 3]
+
+    # Bodies and the seam overlap add up to the whole film
+    planned = [SceneClip(path=tmp_path, duration=2, scene_index=i) for i in range(4)]
+    film_frames = round(build_timeline(planned, request).duration * FPS)
+    seam_frames = round(chunks[0].overlap_out * FPS)
+    assert frame_count(first.body) + frame_count(second.body) + seam_frames == film_frames
@@ -0,0 +1,827 @@
+import base64
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import vectcut_processor
+import vectcut_storage
+from vectcut_cache import JobCheckpoint, OutputCache, RenderManifest, SceneCache
+from vectcut_models import (
+    CaptionData,
+    MusicData,
+    SceneClip,
+    SceneData,
+    VideoCompositionRequest,
+    VideoCompositionResponse,
+    VoiceoverData,
+)
+from vectcut_processor import (
+    Base64StreamDecoder,
+    JobProgress,
+    MediaFetcher,
+    MediaProcessor,
+    STEM_SAMPLE_RATE,
+    accepts_ranges,
+    build_render_graph,
+    build_timeline,
+    get_transition_overlap,
+    is_conforming,
+    keyframe_args,
+    keyframe_time,
+    media_key,
+    mix_pcm,
+    parse_byte_range,
+    plan_chunks,
+    probe_streams,
+    request_fingerprint,
+)
+from vectcut_storage import S3StreamingUpload, upload_to_s3
+
+
+requires_ffmpeg = pytest.mark.skipif(
+    not (shutil.which("ffmpeg") and shutil.which("ffprobe")), reason="ffmpeg not installed"
+)
+
+
+def make_request(durations, transitions=None, **fields):
+    transitions = transitions or [None] * len(durations)
+    scenes = [
+        SceneData(id=f"s{i}", duration=duration, transition_to_next=transition)
+        for i, (duration, transition) in enumerate(zip(durations, transitions))
+    ]
+    return VideoCompositionRequest(project_id="test", scenes=scenes, **fields)
+
+
+def make_clips(request):
+    return [
+        SceneClip(
+            path=Path(f"scene_{i:03d}.mp4"), duration=scene.duration,
+            transition_to_next=scene.transition_to_next, scene_index=i,
+        )
+        for i, scene in enumerate(request.scenes)
+    ]
+
+
+def lavfi_clip(path, duration, size="320x240", audio=True, sample_rate=44100, channels=2, source="testsrc2", args=()):
+    inputs = ["-f", "lavfi", "-i", f"{source}=s={size}:r=30:d={duration}"]
+    if audio:
+        inputs += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate={sample_rate}:duration={duration}"]
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-v", "error", *inputs,
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", *args,
+            *(["-c:a", "aac", "-ac", str(channels)] if audio else []), str(path),
+        ],
+        check=True,
+    )
+    return path
+
+
+def test_scene_cache_overwrite_keeps_size(tmp_path):
+    cache = SceneCache(tmp_path / "cache", max_bytes=1000)
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"x" * 100)
+    cache.put("a", clip)
+    for _ in range(5):
+        cache.put("b", clip)
+
+    assert cache._total_bytes == 200
+    assert cache.stored == 6
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves the server's files, honoring Range headers unless the server disables ranges."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send(head=True)
+
+    def do_GET(self):
+        self.send(head=False)
+
+    def send(self, head):
+        data = self.server.files[self.path.lstrip("/")]
+        start, end = 0, len(data) - 1
+        ranged = self.server.ranges and self.headers.get("Range")
+        if ranged:
+            first, _, last = self.headers["Range"][len("bytes="):].partition("-")
+            start, end = int(first), min(int(last or end), end)
+        self.send_response(206 if ranged else 200)
+        if self.server.ranges and self.server.advertise:
+            self.send_header("Accept-Ranges", "bytes")
+        if ranged:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not head:
+            self.wfile.write(data[start:end + 1])
+            self.server.bytes_served += end - start + 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(files, ranges=True, advertise=True):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        server.files, server.ranges, server.advertise, server.bytes_served = files, ranges, advertise, 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_accepts_ranges(serve):
+    files = {"clip.mp4": b"x" * 100}
+    _, advertised = serve(files)
+    _, unadvertised = serve(files, advertise=False)
+    _, no_ranges = serve(files, ranges=False)
+
+    assert accepts_ranges(f"{advertised}/clip.mp4")
+    # Detected from a 206 answer when HEAD does not advertise ranges
+    assert accepts_ranges(f"{unadvertised}/clip.mp4")
+    assert not accepts_ranges(f"{no_ranges}/clip.mp4")
+    assert not accepts_ranges("data:video/mp4;base64,AAAA")
+    assert not accepts_ranges(None)
+
+
+def test_prefetch_leaves_streamed_videos_to_ffmpeg(tmp_path, serve):
+    _, url = serve({"clip.mp4": b"video", "vo.wav": b"voice"})
+    scene = SceneData(
+        id="s0", video_url=f"{url}/clip.mp4", voiceovers=[VoiceoverData(audio_url=f"{url}/vo.wav")],
+    )
+    request = VideoCompositionRequest(project_id="test", scenes=[scene], input_mode="stream")
+
+    with MediaFetcher(tmp_path / "media") as fetcher:
+        assert fetcher.prefetch(request) == 1
+        assert fetcher.fetch(f"{url}/vo.wav", tmp_path / "vo.wav")
+    assert (tmp_path / "vo.wav").read_bytes() == b"voice"
+
+    with MediaFetcher(tmp_path / "media") as fetcher:
+        assert fetcher.prefetch(request.model_copy(update={"input_mode": "download"})) == 2
+
+
+@requires_ffmpeg
+def test_streamed_scene_reads_only_what_it_uses(tmp_path, serve):
+    source = tmp_path / "source.mp4"
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "lavfi", "-i", "testsrc2=s=1280x720:r=30:d=30",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100:duration=30",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-ac", "2", "-movflags", "+faststart", str(source),
+        ],
+        check=True,
+    )
+    server, url = serve({"source.mp4": source.read_bytes()})
+    clip = tmp_path / "clip.mp4"
+
+    # A conforming source is trimmed by stream copy straight from the URL
+    passthrough = MediaProcessor().normalize_video(f"{url}/source.mp4", clip, 2, 1280, 720, 30, stream=True)
+
+    assert passthrough is True
+    assert float(probe_streams(clip)["format"]["duration"]) == pytest.approx(2, abs=0.1)
+    assert server.bytes_served < source.stat().st_size / 4
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-1,5-9", None),
+    ("items=0-9", None),
+    ("bytes=a-b", None),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=500-100", "bytes=-0"])
+def test_parse_byte_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, 1000)
+
+
+@pytest.mark.parametrize("piece", [1, 3, 4, 7, 1024])
+def test_base64_decoder_pieces(piece):
+    payload = bytes(range(256)) * 5
+    text = base64.b64encode(payload).decode()
+    decoder = Base64StreamDecoder()
+    decoded = b"".join(decoder.feed(text[i:i + piece]) for i in range(0, len(text), piece))
+    decoder.close()
+    assert decoded == payload
+
+
+def test_base64_decoder_skips_whitespace():
+    payload = b"film generator" * 10
+    text = base64.encodebytes(payload)  # Wrapped at 76 characters
+    decoder = Base64StreamDecoder()
+    assert decoder.feed(text[:50]) + decoder.feed(text[50:]) == payload
+    decoder.close()
+
+
+def test_base64_decoder_truncated():
+    decoder = Base64StreamDecoder()
+    decoder.feed(base64.b64encode(b"abcd")[:-1])
+    with pytest.raises(ValueError):
+        decoder.close()
+
+
+def test_keyframe_time_whole_seconds():
+    assert keyframe_time(1.2, 1.0, 30, round_up=True) == 2.0
+    assert keyframe_time(1.2, 1.0, 30, round_up=False) == 1.0
+    assert keyframe_time(2.0, 1.0, 30, round_up=True) == 2.0
+    assert keyframe_time(2.0, 1.0, 30, round_up=False) == 2.0
+
+
+def test_keyframe_time_snaps_to_frames():
+    # Keyframe 1 of a 0.55 s grid lands on frame 17, the first frame at or after 16.5
+    assert keyframe_time(0.56, 0.55, 30, round_up=True) == pytest.approx(17 / 30)
+    assert keyframe_time(0.56, 0.55, 30, round_up=False) == 0.0
+    assert keyframe_time(0.57, 0.55, 30, round_up=False) == pytest.approx(17 / 30)
+
+
+def test_transition_overlap():
+    request = make_request([4, 4, 4], ["fade", "none", None], transition_duration=1.0)
+    clips = make_clips(request)
+    assert get_transition_overlap(clips[0], clips[1], request) == 1.0
+    assert get_transition_overlap(clips[1], clips[2], request) == 0.0
+    # Falls back to the request's transition style
+    assert get_transition_overlap(clips[2], clips[0], request) == 1.0
+    assert get_transition_overlap(clips[2], clips[0], request.model_copy(update={"transition_style": "none"})) == 0.0
+
+
+def test_transition_overlap_clamped_to_half_clip():
+    request = make_request([4, 1], transition_duration=3.0)
+    clips = make_clips(request)
+    assert get_transition_overlap(clips[0], clips[1], request) == 0.5
+
+
+def test_build_timeline():
+    request = make_request(
+        [4, 4, 4], ["fade", "none", None], transition_duration=1.0,
+        captions=[
+            CaptionData(text="late", start_time=10, end_time=20),
+            CaptionData(text="early", start_time=-1, end_time=2),
+            CaptionData(text="gone", start_time=12, end_time=14),
+        ],
+    )
+    timeline = build_timeline(make_clips(request), request)
+
+    assert [(s.start, s.end) for s in timeline.segments] == [(0, 4), (3, 7), (7, 11)]
+    assert [(s.overlap_in, s.overlap_out) for s in timeline.segments] == [(0, 1), (1, 0), (0, 0)]
+    assert timeline.duration == 11
+    assert [(c.text, c.start_time, c.end_time) for c in timeline.captions] == [("early", 0, 2), ("late", 10, 11)]
+
+
+def test_build_render_graph():
+    request = make_request([4, 4, 4], ["fade", "none", None], transition_duration=1.0, fps=24)
+    clips = make_clips(request)
+    clips[2] = clips[2].model_copy(update={"has_audio": False})
+    timeline = build_timeline(clips, request)
+    graph = build_render_graph(clips, timeline, request, 1280, 720)
+
+    assert graph.input_args == ["-i", "scene_000.mp4", "-i", "scene_001.mp4", "-i", "scene_002.mp4"]
+    assert graph.duration == 11
+    lines = graph.filter_script.split(";\n")
+    # Only clips that fade out get a frame for xfade to finish on
+    assert "[0:v]fps=24,scale=1280:720,format=yuv420p,setsar=1,settb=AVTB,tpad=stop=1:stop_mode=clone[v0]" in lines
+    assert "[1:v]fps=24,scale=1280:720,format=yuv420p,setsar=1,settb=AVTB[v1]" in lines
+    assert "anullsrc=channel_layout=stereo:sample_rate=44100,atrim=duration=4.0,aformat=sample_fmts=fltp[a2]" in lines
+    # The crossfade starts where the second segment starts on the timeline
+    assert "[v0][v1]xfade=transition=fade:duration=1.000:offset=3.000[vx1]" in lines
+    assert "[a0][a1]acrossfade=d=1.000[ax1]" in lines
+    assert "[vx1][ax1][v2][a2]concat=n=2:v=1:a=1[vx2][ax2]" in lines
+    assert lines[-2:] == ["[vx2]null[vout]", "[ax2]anull[aout]"]
+
+
+def test_build_render_graph_offsets_follow_clamped_overlaps():
+    request = make_request([4, 1, 4], transition_duration=2.0)
+    clips = make_clips(request)
+    graph = build_render_graph(clips, build_timeline(clips, request), request, 1280, 720, include_audio=False)
+
+    assert "[v0][v1]xfade=transition=fade:duration=0.500:offset=3.500[vx1]" in graph.filter_script
+    assert "[vx1][v2]xfade=transition=fade:duration=0.500:offset=4.000[vx2]" in graph.filter_script
+    assert "[a" not in graph.filter_script
+
+
+def test_plan_chunks():
+    request = make_request([2, 2, 8, 2, 2, 2, 2], transition_style="none")
+    timeline = build_timeline(make_clips(request), request)
+
+    assert plan_chunks(timeline, 1) == [(0, 7)]
+    assert plan_chunks(timeline, 2) == [(0, 3), (3, 7)]
+    # Never more chunks than scenes, and every chunk keeps at least one scene
+    assert plan_chunks(timeline, 10) == [(i, i + 1) for i in range(7)]
+    # Breaks at the scene starts closest to 1/3 and 2/3 of the film
+    assert plan_chunks(timeline, 3) == [(0, 2), (2, 4), (4, 7)]
+
+
+def test_fallback_copies_report_failure(tmp_path):
+    # Unreadable inputs make each step fall back to copying the video unchanged
+    processor = MediaProcessor()
+    video = tmp_path / "in.mp4"
+    video.write_bytes(b"not a video")
+    captions = [CaptionData(text="hi", start_time=0, end_time=1)]
+
+    assert not processor.burn_captions(video, tmp_path / "captioned.mp4", captions, 1280, 720)
+    assert not processor.add_music(video, tmp_path / "music.mp4", MusicData(audio_url="!not base64!"), 1.0)
+    assert not processor.add_voiceovers(
+        video, tmp_path / "voiced.mp4", [VoiceoverData(audio_url=base64.b64encode(b"x").decode())], 0,
+        video_duration=1.0,
+    )
+    for name in ["captioned.mp4", "music.mp4", "voiced.mp4"]:
+        assert (tmp_path / name).read_bytes() == b"not a video"
+    assert processor.burn_captions(video, tmp_path / "uncaptioned.mp4", [], 1280, 720)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    moto = pytest.importorskip("moto")
+    monkeypatch.setattr(vectcut_storage, "_s3_clients", {})
+    monkeypatch.setattr(vectcut_storage, "S3_PART_SIZE", 5 * 1024**2)
+    monkeypatch.setattr(vectcut_storage, "S3_POLL_INTERVAL", 0.01)
+    with moto.mock_aws():
+        request = make_request([1], s3_bucket="bucket", s3_access_key="key", s3_secret_key="secret")
+        client = vectcut_storage.get_s3_client(request)
+        client.create_bucket(Bucket="bucket")
+        yield client, request
+
+
+def test_s3_streaming_upload_sends_parts_while_writing(tmp_path, s3):
+    client, request = s3
+    path = tmp_path / "final.mp4"
+    data = bytes(range(256)) * (12 * 1024**2 // 256 + 1000)
+    upload = S3StreamingUpload(path, "out/final.mp4", request)
+    with open(path, "wb") as f:
+        for i in range(0, len(data), 1024**2):
+            f.write(data[i:i + 1024**2])
+            f.flush()
+            if i == 11 * 1024**2:
+                # Both full parts go up before the writer is done
+                deadline = time.time() + 10
+                while len(upload.parts) < 2 and time.time() < deadline:
+                    time.sleep(0.01)
+                assert len(upload.parts) == 2
+
+    assert upload.finish(True).endswith("/out/final.mp4")
+    assert len(upload.parts) == 3
+    obj = client.get_object(Bucket="bucket", Key="out/final.mp4")
+    assert obj["ContentType"] == "video/mp4"
+    assert obj["Body"].read() == data
+
+
+def test_s3_streaming_upload_aborts_failed_render(tmp_path, s3):
+    client, request = s3
+    path = tmp_path / "final.mp4"
+    path.write_bytes(b"partial")
+    upload = S3StreamingUpload(path, "out/final.mp4", request)
+
+    assert upload.finish(False) is None
+    assert "Uploads" not in client.list_multipart_uploads(Bucket="bucket")
+    assert "Contents" not in client.list_objects_v2(Bucket="bucket")
+
+
+def test_upload_to_s3_multipart_above_part_size(tmp_path, s3):
+    client, request = s3
+    small, large = tmp_path / "draft.zip", tmp_path / "final.mp4"
+    small.write_bytes(b"zip")
+    large.write_bytes(b"v" * (12 * 1024**2))
+
+    assert upload_to_s3(small, "out/draft.zip", request).endswith("/out/draft.zip")
+    assert upload_to_s3(large, "out/final.mp4", request)
+    # Multipart uploads get an ETag with the part count
+    assert client.head_object(Bucket="bucket", Key="out/final.mp4")["ETag"].endswith('-3"')
+    assert client.head_object(Bucket="bucket", Key="out/draft.zip")["ContentType"] == "application/zip"
+    assert upload_to_s3(small, "x", request.model_copy(update={"s3_bucket": None})) is None
+
+
+@requires_ffmpeg
+def test_failed_transition_fails_the_merge(tmp_path):
+    # xfade rejects inputs of different sizes, which a stream-copy concat would join
+    first = lavfi_clip(tmp_path / "a.mp4", 2, size="320x240")
+    second = lavfi_clip(tmp_path / "b.mp4", 2, size="640x480")
+    processor = MediaProcessor()
+
+    joined = processor.apply_transition(
+        first, second, tmp_path / "joined.mp4", "fade", 0.5, encode_preset="ultrafast", duration1=2, duration2=2
+    )
+    assert joined is None
+
+    request = make_request([2, 2], transition_duration=0.5)
+    clips = [SceneClip(path=path, duration=2, scene_index=i) for i, path in enumerate([first, second])]
+    with pytest.raises(RuntimeError):
+        processor.merge_tree(clips, tmp_path, request, "ultrafast")
+
+
+def conforming_info(**audio):
+    video = {
+        "codec_type": "video", "codec_name": "h264", "width": 320, "height": 240, "pix_fmt": "yuv420p",
+        "r_frame_rate": "30/1", "avg_frame_rate": "30/1", "duration": "2.0",
+    }
+    audio = {"codec_type": "audio", "codec_name": "aac", "sample_rate": "44100", "channels": 2, "duration": "2.0", **audio}
+    return {"format": {"duration": "2.0"}, "streams": [video, audio]}
+
+
+def test_is_conforming_requires_scene_audio_layout():
+    assert is_conforming(conforming_info(), 320, 240, 30, 2)
+    assert not is_conforming(conforming_info(sample_rate="48000"), 320, 240, 30, 2)
+    assert not is_conforming(conforming_info(channels=1), 320, 240, 30, 2)
+
+
+@requires_ffmpeg
+def test_hard_cut_joins_silent_passthrough_clip(tmp_path):
+    silent = lavfi_clip(tmp_path / "silent.mp4", 2, audio=False)
+    voiced = lavfi_clip(tmp_path / "voiced.mp4", 2)
+    request = make_request([2, 2], transition_duration=0.5, transition_style="none")
+    clips = [
+        SceneClip(path=silent, duration=2, has_audio=False, passthrough=True, scene_index=0),
+        SceneClip(path=voiced, duration=2, scene_index=1),
+    ]
+
+    [merged] = MediaProcessor().merge_tree(clips, tmp_path, request, "ultrafast")
+
+    info = probe_streams(merged.path)
+    assert merged.duration == pytest.approx(4)
+    assert float(info["format"]["duration"]) == pytest.approx(4, abs=0.1)
+    assert [s["codec_type"] for s in info["streams"]] == ["video", "audio"]
+
+
+def test_render_manifest_keeps_segments_of_running_renders(tmp_path):
+    old = time.time() - 3600
+
+    def segment(manifest, key):
+        path = tmp_path / f"{key}.src"
+        path.write_bytes(b"x" * 100)
+        return manifest.put(key, path)
+
+    manifest = RenderManifest(tmp_path / "projects", "film", grace=60)
+    stale, fresh, kept = (segment(manifest, key) for key in ("stale", "fresh", "kept"))
+    os.utime(stale, (old, old))
+    manifest.save([{"key": "kept", "stored": True}], [])
+
+    assert not stale.exists() and fresh.exists() and kept.exists()
+    assert not list(manifest.dir.glob("*.tmp"))
+    assert RenderManifest(tmp_path / "projects", "film").get("kept") == kept
+
+    # Another project over the size limit is evicted only once it is idle
+    other = RenderManifest(tmp_path / "projects", "other", max_bytes=0, grace=60)
+    other.save([], [])
+    assert manifest.dir.exists()
+    for path in manifest.dir.iterdir():
+        os.utime(path, (old, old))
+    other.save([], [])
+    assert not manifest.dir.exists()
+
+
+def psnr(path, reference, start_frame, end_frame):
+    trim = f"trim=start_frame={start_frame}:end_frame={end_frame},setpts=PTS-STARTPTS"
+    result = subprocess.run(
+        [
+            "ffmpeg", "-v", "info", "-i", str(path), "-i", str(reference),
+            "-lavfi", f"[0:v]{trim}[a];[1:v]{trim}[b];[a][b]psnr", "-f", "null", "-",
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stderr.rsplit("average:", 1)[1].split()[0])
+
+
+@requires_ffmpeg
+def test_smart_windows_match_single_pass(tmp_path):
+    smart_args = keyframe_args(30, 0.5)
+    clips = [
+        SceneClip(
+            path=lavfi_clip(tmp_path / f"s{i}.mp4", 2, size="1280x720", audio=False, source=source, args=smart_args),
+            duration=2, has_audio=False, scene_index=i,
+        )
+        for i, source in enumerate(["testsrc2", "testsrc", "testsrc2"])
+    ]
+    request = make_request([2, 2, 2], fps=30, resolution="sd", transition_duration=0.5, transition_style="slideLeft")
+    timeline = build_timeline(clips, request)
+    processor = MediaProcessor()
+
+    assert processor.render_smart(clips, timeline, tmp_path / "smart.mp4", request, "ultrafast")
+    assert processor.render_single_pass(clips, timeline, tmp_path / "single.mp4", request, 1280, 720, "ultrafast")
+
+    info = probe_streams(tmp_path / "smart.mp4")
+    assert float(info["format"]["duration"]) == pytest.approx(timeline.duration, abs=0.02)
+    # Both transition windows line up with the single-pass frames
+    for segment in timeline.segments[1:]:
+        start = round(segment.start * 30)
+        assert psnr(tmp_path / "smart.mp4", tmp_path / "single.mp4", start, start + 15) > 30
+
+
+def data_url(path, mime):
+    return f"data:{mime};base64," + base64.b64encode(Path(path).read_bytes()).decode()
+
+
+def tone(path, duration):
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=880:sample_rate=44100:duration={duration}", str(path),
+        ],
+        check=True,
+    )
+    return data_url(path, "audio/wav")
+
+
+def test_mix_pcm_places_and_fades():
+    np = pytest.importorskip("numpy")
+    rate = STEM_SAMPLE_RATE
+    mix = np.zeros((rate, 2), dtype=np.float32)
+    pcm = np.ones((rate, 2), dtype=np.float32)
+
+    mix_pcm(mix, pcm, 0.25, 0.5, gain=0.5, fade_in=0.1)
+
+    assert not mix[:rate // 4].any() and not mix[3 * rate // 4:].any()
+    assert mix[rate // 4 + rate // 20, 0] == pytest.approx(0.25, abs=1e-3)  # Halfway through the fade-in
+    assert mix[rate // 2, 0] == pytest.approx(0.5)
+
+
+@requires_ffmpeg
+def test_render_audio_stem_timing(tmp_path):
+    np = pytest.importorskip("numpy")
+    voiceover = VoiceoverData(audio_url=tone(tmp_path / "vo.wav", 0.5), start_time=1.0, duration=0.5)
+    request = VideoCompositionRequest(
+        project_id="test", transition_duration=1.0,
+        scenes=[SceneData(id="s0", duration=2), SceneData(id="s1", duration=2, voiceovers=[voiceover])],
+    )
+    clips = [
+        SceneClip(path=lavfi_clip(tmp_path / "s0.mp4", 2), duration=2, scene_index=0),
+        SceneClip(path=lavfi_clip(tmp_path / "s1.mp4", 2, audio=False), duration=2, has_audio=False, scene_index=1),
+    ]
+    timeline = build_timeline(clips, request)
+    stem = tmp_path / "stem.f32"
+
+    assert MediaProcessor().render_audio_stem(clips, timeline, stem, request)
+
+    mix = np.fromfile(stem, dtype=np.float32).reshape(-1, 2)
+    rate = STEM_SAMPLE_RATE
+
+    def level(start, end):
+        return float(np.abs(mix[int(start * rate):int(end * rate)]).max())
+
+    assert len(mix) == round(timeline.duration * rate)
+    # Scene audio fades out over the transition, the voiceover plays 1 s into the second scene
+    assert level(0.1, 0.9) > 0.05
+    assert level(2.0, 2.5) > 0.05
+    assert level(2.52, 3.0) == 0
+
+
+@requires_ffmpeg
+def test_compose_with_defaults(tmp_path):
+    # Silent black scenes, so the audio is the voiceover and the only drawing the caption
+    scenes = [
+        SceneData(id=f"s{i}", duration=2, video_url=data_url(
+            lavfi_clip(tmp_path / f"s{i}.mp4", 2, size="1280x720", audio=False, source="color"), "video/mp4"
+        ))
+        for i in range(2)
+    ]
+    scenes[1].voiceovers = [VoiceoverData(audio_url=tone(tmp_path / "vo.wav", 0.5), start_time=0.5, duration=0.5)]
+    request = VideoCompositionRequest(
+        project_id="test", scenes=scenes, resolution="sd", output_format="mp4",
+        captions=[CaptionData(text="HELLO WORLD", start_time=2.0, end_time=2.5)],
+    )
+    assert request.render_mode == "single_pass" and request.audio_engine == "numpy"
+
+    response = MediaProcessor().compose(request)
+
+    assert response.status == "complete"
+    assert response.duration == pytest.approx(3.0, abs=0.1)
+    assert "00:00:02,000 --> 00:00:02,500" in response.srt_content
+    output = tmp_path / "final.mp4"
+    output.write_bytes(base64.b64decode(response.video_base64))
+    assert sorted(s["codec_type"] for s in probe_streams(output)["streams"]) == ["audio", "video"]
+
+    # The voiceover starts 0.5 s into the second scene, which starts at 1.0 s
+    detect = subprocess.run(
+        ["ffmpeg", "-i", str(output), "-af", "silencedetect=noise=-40dB:d=0.1", "-f", "null", "-"],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    sound_start = float(detect.split("silence_end: ")[1].split()[0])
+    sound_end = float(detect.split("silence_start: ")[2].split()[0])
+    assert (sound_start, sound_end) == (pytest.approx(1.5, abs=0.05), pytest.approx(2.0, abs=0.05))
+
+    def drawn(t):
+        frame = subprocess.run(
+            [
+                "ffmpeg", "-v", "error", "-ss", str(t), "-i", str(output), "-frames:v", "1",
+                "-vf", "format=gray", "-f", "rawvideo", "-",
+            ],
+            capture_output=True, check=True,
+        ).stdout
+        return max(frame) > 100
+
+    assert [drawn(t) for t in (1.8, 2.2, 2.7)] == [False, True, False]
+
+
+def test_request_fingerprint_hashes_inline_media():
+    inline = "data:video/mp4;base64," + base64.b64encode(b"x" * 100_000).decode()
+    request = make_request([2, 2])
+    request.scenes[0].video_url = inline
+    request.scenes[1].video_url = "https://example.com/clip.mp4"
+
+    fingerprint = request_fingerprint(request)
+    assert fingerprint == request_fingerprint(request.model_copy(update={"project_id": "other", "delivery": "download"}))
+
+    changed = request.model_copy(deep=True)
+    changed.scenes[0].video_url = inline[:-4] + "eHh4"
+    assert request_fingerprint(changed) != fingerprint
+    changed.scenes[0].video_url = inline
+    changed.scenes[0].voiceovers = [VoiceoverData(audio_url="upload:" + "0" * 64)]
+    assert request_fingerprint(changed) != fingerprint
+    assert media_key(inline).startswith("sha256:") and len(media_key(inline)) == 71
+    assert media_key("upload:" + "0" * 64) == "upload:" + "0" * 64
+
+
+def test_output_cache_hits_and_expiry(tmp_path):
+    video = tmp_path / "final.mp4"
+    video.write_bytes(b"video")
+    cache = OutputCache(tmp_path / "cache", ttl=60)
+    key = request_fingerprint(make_request([2, 2]))
+    out = tmp_path / "out"
+    out.mkdir()
+
+    cache.put(key, [video], {"duration": 4.0})
+
+    assert cache.get(key, out, with_draft=False)["duration"] == 4.0
+    assert (out / "final.mp4").read_bytes() == b"video"
+    assert cache.get(request_fingerprint(make_request([2, 3])), out, with_draft=False) is None
+    # A draft was not stored, so a request for one misses
+    assert cache.get(key, out, with_draft=True) is None
+
+    meta = cache.root / key / "meta.json"
+    meta.write_text(json.dumps({**json.loads(meta.read_text()), "created": time.time() - 61}))
+    assert cache.get(key, out, with_draft=False) is None
+    assert not (cache.root / key).exists()
+
+
+def test_job_checkpoint_survives_a_retry(tmp_path):
+    commits = []
+    clip = tmp_path / "scene.mp4"
+    clip.write_bytes(b"scene")
+    checkpoint = JobCheckpoint(tmp_path / "jobs", "job", commit=lambda: commits.append(1))
+
+    checkpoint.put("scene_000", [SceneClip(path=clip, duration=2, scene_index=0)])
+    checkpoint.put("merge_1", [SceneClip(path=clip, duration=2)], throttle=True, round=0)
+    checkpoint.put("merge_1", [SceneClip(path=clip, duration=3)], throttle=True, round=1)
+
+    # Throttled stages right after a commit wait for flush
+    assert len(commits) == 1
+    checkpoint.flush()
+    assert len(commits) == 2
+
+    retry = JobCheckpoint(tmp_path / "jobs", "job")
+    restore_dir = tmp_path / "restore"
+    restore_dir.mkdir()
+    assert retry.has("scene_000") and not retry.has("scene_001")
+    merged = retry.get("merge_1", restore_dir)
+    assert merged["round"] == 1 and merged["clips"][0].duration == 3
+    assert merged["clips"][0].path.read_bytes() == b"scene"
+    assert retry.restored == 1
+
+    retry.clear()
+    assert not JobCheckpoint(tmp_path / "jobs", "job").state
+
+
+@requires_ffmpeg
+def test_merge_tree_resumes_from_checkpoint(tmp_path, monkeypatch):
+    request = make_request([2, 2, 2], transition_duration=0.5)
+    clips = [
+        SceneClip(path=lavfi_clip(tmp_path / f"s{i}.mp4", 2), duration=2, scene_index=i, cache_key=f"s{i}")
+        for i in range(3)
+    ]
+    processor = MediaProcessor()
+    [first] = processor.merge_tree(
+        clips, tmp_path, request, "ultrafast", checkpoint=JobCheckpoint(tmp_path / "jobs", "job")
+    )
+
+    # The retry finds every round done and encodes nothing
+    monkeypatch.setattr(MediaProcessor, "apply_transition", lambda *args, **kwargs: None)
+    retry = JobCheckpoint(tmp_path / "jobs", "job")
+    [resumed] = processor.merge_tree(clips, tmp_path, request, "ultrafast", checkpoint=retry)
+
+    assert retry.restored == 1
+    assert resumed.duration == first.duration == pytest.approx(5)
+    assert resumed.path.exists()
+
+
+class FakeCall:
+    """Spawned call that stays pending until a response is set."""
+
+    calls = {}
+
+    def __init__(self, request):
+        self.request = request
+        self.response = None
+        self.object_id = f"fc-{len(self.calls)}"
+        self.calls[self.object_id] = self
+
+    @classmethod
+    def from_id(cls, call_id):
+        return cls.calls[call_id]
+
+    def get(self, timeout=None):
+        if self.response is None:
+            raise TimeoutError
+        return self.response
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    store = {}
+    spawned = []
+
+    class Processor:
+        class compose_job:
+            @staticmethod
+            def spawn(request):
+                spawned.append(FakeCall(request))
+                return spawned[-1]
+
+    FakeCall.calls = {}
+    monkeypatch.setattr(vectcut_processor, "job_store", store)
+    monkeypatch.setattr(vectcut_processor, "VectCutProcessor", Processor)
+    monkeypatch.setattr(vectcut_processor.modal, "FunctionCall", FakeCall)
+    return store, spawned
+
+
+def test_job_state_machine(jobs):
+    store, spawned = jobs
+    request = make_request([2, 2])
+
+    record = vectcut_processor.submit.local(request)
+    job_id = record["job_id"]
+    assert job_id == request_fingerprint(request)
+    assert record["status"] == "queued" and spawned[0].request.job_id == job_id
+    assert vectcut_processor.result.local(job_id).status == "queued"
+
+    # A resubmit while the job is pending returns it instead of starting another
+    assert vectcut_processor.submit.local(request)["job_id"] == job_id
+    assert len(spawned) == 1
+
+    progress = JobProgress(store, job_id)
+    progress.stage("rendering", mode="single_pass")
+    status = vectcut_processor.status.local(job_id)
+    assert (status["status"], status["stage"], status["progress"]) == ("running", "rendering", {"mode": "single_pass"})
+    assert vectcut_processor.result.local(job_id).stats["stage"] == "rendering"
+
+    response = VideoCompositionResponse(status="complete", duration=4.0)
+    progress.finish("complete", stage=None, response={"duration": 4.0})
+    spawned[0].response = response
+    assert vectcut_processor.status.local(job_id)["status"] == "complete"
+    assert vectcut_processor.result.local(job_id) == response
+
+    # Resubmitting a finished job starts it again
+    assert vectcut_processor.submit.local(request)["status"] == "queued"
+    assert len(spawned) == 2
+
+    with pytest.raises(pytest.importorskip("fastapi").HTTPException) as error:
+        vectcut_processor.status.local("unknown")
+    assert error.value.status_code == 404
+
+
+def test_media_fetcher_shares_identical_content(tmp_path):
+    same = base64.b64encode(b"same media").decode()
+    first, second = f"data:video/mp4;base64,{same}", same
+    other = base64.b64encode(b"other media").decode()
+
+    with MediaFetcher(tmp_path / "media") as fetcher:
+        assert fetcher.fetch(first, tmp_path / "a.mp4") and fetcher.fetch(second, tmp_path / "b.mp4")
+        fetcher.fetch(other, tmp_path / "c.mp4")
+        assert fetcher.duplicates == 1
+        assert fetcher.content_hash(first) == fetcher.content_hash(second) != fetcher.content_hash(other)
+        assert len(list((tmp_path / "media").iterdir())) == 2
+
+        # The shared file stays until the last URL using it is discarded
+        fetcher.discard(first)
+        assert len(list((tmp_path / "media").iterdir())) == 2
+        fetcher.discard(second)
+        assert len(list((tmp_path / "media").iterdir())) == 1
+        assert (tmp_path / "a.mp4").read_bytes() == b"same media"
+
+        # A discarded URL is downloaded again when it is needed after all
+        assert fetcher.fetch(first, tmp_path / "d.mp4")
+        assert (tmp_path / "d.mp4").read_bytes() == b"same media"
+        fetcher.discard("never fetched")
@@ -0,0 +1,427 @@
+"""Caches and stage checkpoints kept on the vectcut-cache volume."""
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from vectcut_models import SceneClip
+
+
+# Normalized scene clip cache on the vectcut-cache volume
+SCENE_CACHE_DIR = "/cache/scenes"
+SCENE_CACHE_MAX_BYTES = int(float(os.environ.get("VECTCUT_SCENE_CACHE_GB", "50")) * 1024**3)
+SCENE_CACHE_VERSION = 3  # Bump when scene normalization output changes
+
+
+class SceneCache:
+    """Content-addressed cache of normalized scene clips with size-based LRU eviction.
+
+    Entries are stored as <key> plus the clip's extension. A hit touches the file's mtime, and eviction
+    removes the least recently used entries once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = SCENE_CACHE_MAX_BYTES):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._total_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str, output_path: Path) -> bool:
+        """Copy a cached clip to output_path, returning False on a miss."""
+        path = self.root / f"{key}{output_path.suffix}"
+        try:
+            os.utime(path)
+            shutil.copyfile(path, output_path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key: str, clip_path: Path) -> None:
+        """Store a clip under key, then evict old entries if over budget."""
+        if not clip_path.exists() or clip_path.stat().st_size == 0:
+            return
+        path = self.root / f"{key}{clip_path.suffix}"
+        tmp_path = self.root / f".{key}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(clip_path, tmp_path)
+        except OSError as e:
+            print(f"Scene cache store failed: {e}")
+            return
+        with self._lock:
+            # An overwritten entry no longer counts towards the cache size
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            try:
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Scene cache store failed: {e}")
+                return
+            self.stored += 1
+            # Track the cache size incrementally and only scan the volume when over budget
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += clip_path.stat().st_size - replaced
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """List (mtime, size, path) of all cached clips."""
+        entries = []
+        for path in self.root.glob("[!.]*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evicted += 1
+        self._total_bytes = total
+
+    def stats(self) -> dict:
+        """Get hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses, "stored": self.stored, "evicted": self.evicted}
+
+
+# Finished composition cache on the vectcut-cache volume
+OUTPUT_CACHE_DIR = "/cache/output"
+OUTPUT_CACHE_MAX_BYTES = int(float(os.environ.get("VECTCUT_OUTPUT_CACHE_GB", "20")) * 1024**3)
+OUTPUT_CACHE_TTL = float(os.environ.get("VECTCUT_OUTPUT_CACHE_TTL_HOURS", "24")) * 3600
+
+
+class OutputCache:
+    """Cache of finished compositions keyed by request fingerprint.
+
+    Each entry is a directory holding final.mp4, the zipped CapCut draft when one
+    was built, and meta.json with the response fields that do not need a render.
+    Entries expire ttl seconds after they were stored; a hit touches the entry's
+    mtime, and eviction removes the least recently used entries beyond max_bytes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = OUTPUT_CACHE_MAX_BYTES, ttl: float = OUTPUT_CACHE_TTL):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def get(self, key: str, dest_dir: Path, with_draft: bool) -> Optional[dict]:
+        """Copy a cached composition into dest_dir and return its metadata, or None on a miss."""
+        entry = self.root / key
+        try:
+            meta = json.loads((entry / "meta.json").read_text())
+            if time.time() - meta["created"] > self.ttl:
+                shutil.rmtree(entry, ignore_errors=True)
+                return None
+            names = ["final.mp4", "capcut_draft.zip"] if with_draft else ["final.mp4"]
+            for name in names:
+                shutil.copyfile(entry / name, dest_dir / name)
+            os.utime(entry)
+        except (OSError, ValueError, KeyError):
+            return None
+        return meta
+
+    def put(self, key: str, files: list[Path], meta: dict) -> None:
+        """Store a composition's files under key, then evict expired and old entries."""
+        tmp_dir = self.root / f".{key}.{threading.get_ident()}.tmp"
+        try:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir()
+            for path in files:
+                shutil.copyfile(path, tmp_dir / path.name)
+            (tmp_dir / "meta.json").write_text(json.dumps({**meta, "created": time.time()}))
+            shutil.rmtree(self.root / key, ignore_errors=True)
+            os.replace(tmp_dir, self.root / key)
+        except OSError as e:
+            print(f"Output cache store failed: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove expired entries, then least recently used ones until the cache fits max_bytes."""
+        entries = []
+        evicted = 0
+        now = time.time()
+        for entry in self.root.glob("[!.]*"):
+            try:
+                created = json.loads((entry / "meta.json").read_text())["created"]
+                size = sum(path.stat().st_size for path in entry.iterdir())
+                mtime = entry.stat().st_mtime
+            except (OSError, ValueError, KeyError):
+                continue
+            if now - created > self.ttl:
+                shutil.rmtree(entry, ignore_errors=True)
+                evicted += 1
+            else:
+                entries.append((mtime, size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+
+# Smart-render segments kept per project on the vectcut-cache volume
+PROJECT_CACHE_DIR = "/cache/projects"
+PROJECT_CACHE_MAX_BYTES = int(float(os.environ.get("VECTCUT_PROJECT_CACHE_GB", "100")) * 1024**3)
+SEGMENT_VERSION = 1  # Bump when smart-render segment encoding changes
+# Segments touched this recently may belong to a render still running; matches the composer timeout
+SEGMENT_GRACE = float(os.environ.get("VECTCUT_SEGMENT_GRACE_HOURS", "4")) * 3600
+
+
+class RenderManifest:
+    """Encoded segments of a project's last smart render, for incremental re-renders.
+
+    Smart rendering cuts the film into transition windows and clip middles, each
+    keyed by a hash of everything it is made from. Segments that had to be encoded
+    (windows, and middles with burned-in captions) are stored as <key>.mp4 in the
+    project's directory; manifest.json lists every segment of the last render in
+    timeline order, with the scene keys it was built from. A later render of the
+    same project reuses listed segments whose key is unchanged and encodes only the
+    rest. Saving a manifest drops the project's segments the new render no longer
+    uses, then evicts the least recently rendered projects beyond max_bytes.
+    Renders of the same or other projects may run concurrently, so segments and
+    projects touched within the grace period are never deleted.
+    """
+
+    def __init__(
+        self, root: Path, project_id: str, max_bytes: int = PROJECT_CACHE_MAX_BYTES, grace: float = SEGMENT_GRACE
+    ):
+        self.root = root
+        self.dir = root / hashlib.sha256(project_id.encode()).hexdigest()[:32]
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self.reused = 0
+        self.stored = 0
+        try:
+            self.previous = json.loads((self.dir / "manifest.json").read_text())
+        except (OSError, ValueError):
+            self.previous = {"segments": [], "scenes": []}
+        self._stored_keys = {
+            segment["key"] for segment in self.previous["segments"] if segment.get("stored")
+        }
+
+    def changed_scenes(self, scene_keys: list[Optional[str]]) -> int:
+        """Count the scene clips that the previous render did not have."""
+        unkeyed = sum(key is None for key in scene_keys)
+        added = Counter(key for key in scene_keys if key) - Counter(self.previous["scenes"])
+        return unkeyed + sum(added.values())
+
+    def get(self, key: Optional[str]) -> Optional[Path]:
+        """Get a stored segment of the previous render, or None if it has to be encoded."""
+        path = self.dir / f"{key}.mp4"
+        if key is None or key not in self._stored_keys:
+            return None
+        try:
+            # Mark the segment as in use, so concurrent saves and evictions leave it alone
+            os.utime(path)
+        except OSError:
+            return None
+        self.reused += 1
+        return path
+
+    def put(self, key: Optional[str], segment_path: Path) -> Path:
+        """Move an encoded segment into the store and return where it now lives."""
+        if key is None:
+            return segment_path
+        try:
+            tmp_path = self.dir / f".{key}.{threading.get_ident()}.tmp"
+            shutil.copyfile(segment_path, tmp_path)
+            os.replace(tmp_path, self.dir / f"{key}.mp4")
+        except OSError as e:
+            print(f"Segment store failed: {e}")
+            return segment_path
+        segment_path.unlink(missing_ok=True)
+        self.stored += 1
+        return self.dir / f"{key}.mp4"
+
+    def save(self, segments: list[dict], scene_keys: list[Optional[str]]) -> None:
+        """Record a finished render and drop stored segments it does not use."""
+        manifest = {"segments": segments, "scenes": [key for key in scene_keys if key], "updated": time.time()}
+        tmp_path = self.dir / f".manifest.{threading.get_ident()}.tmp"
+        try:
+            tmp_path.write_text(json.dumps(manifest))
+            os.replace(tmp_path, self.dir / "manifest.json")
+        except OSError as e:
+            print(f"Manifest save failed: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        keep = {f"{segment['key']}.mp4" for segment in segments if segment.get("stored")}
+        now = time.time()
+        for path in self.dir.glob("*.mp4"):
+            try:
+                if path.name in keep or now - path.stat().st_mtime < self.grace:
+                    continue
+            except OSError:
+                continue
+            path.unlink(missing_ok=True)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently rendered other projects until all fit max_bytes.
+
+        Projects with a file touched within the grace period are being rendered and kept.
+        """
+        now = time.time()
+        projects = []
+        for project_dir in self.root.iterdir():
+            try:
+                stats = [path.stat() for path in project_dir.iterdir()]
+                mtime = (project_dir / "manifest.json").stat().st_mtime
+            except OSError:
+                continue
+            busy = now - max(stat.st_mtime for stat in stats) < self.grace
+            projects.append((mtime, sum(stat.st_size for stat in stats), busy, project_dir))
+
+        total = sum(size for _, size, _, _ in projects)
+        for _, size, busy, project_dir in sorted(projects):
+            if total <= self.max_bytes:
+                break
+            if project_dir != self.dir and not busy:
+                shutil.rmtree(project_dir, ignore_errors=True)
+                total -= size
+
+    def stats(self) -> dict:
+        """Get reuse counters."""
+        return {"reused": self.reused, "stored": self.stored}
+
+
+# Stage checkpoints of running compositions on the vectcut-cache volume
+JOB_CHECKPOINT_DIR = "/cache/jobs"
+JOB_CHECKPOINT_TTL = float(os.environ.get("VECTCUT_JOB_CHECKPOINT_TTL_HOURS", "48")) * 3600
+CHECKPOINT_COMMIT_INTERVAL = 60  # Seconds between volume commits for frequent checkpoints
+
+
+class JobCheckpoint:
+    """Stage outputs of one composition job, kept on the cache volume until it completes.
+
+    Each stage (a normalized scene, the merge tree's last finished round, the audio
+    stem, the captioned film) is stored as copies of its clips next to state.json,
+    which records the clips' metadata. A retried job with the same ID restores the
+    stages it finds instead of redoing them. put() commits the volume so the
+    checkpoint survives the container; frequent stages pass throttle=True to commit
+    at most every CHECKPOINT_COMMIT_INTERVAL seconds.
+    """
+
+    def __init__(self, root: Path, job_id: str, commit=None):
+        self.dir = root / hashlib.sha256(job_id.encode()).hexdigest()[:32]
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.commit = commit
+        self.restored = 0
+        self._last_commit = 0.0
+        self._lock = threading.Lock()
+        try:
+            self.state = json.loads((self.dir / "state.json").read_text())
+        except (OSError, ValueError):
+            self.state = {}
+
+    def has(self, stage: str) -> bool:
+        """Check whether a stage has been stored."""
+        with self._lock:
+            return stage in self.state
+
+    def get(self, stage: str, dest_dir: Path) -> Optional[dict]:
+        """Copy a stage's clips into dest_dir and return its data with their paths, or None."""
+        with self._lock:
+            data = self.state.get(stage)
+        if data is None:
+            return None
+        clips = []
+        try:
+            for clip in data["clips"]:
+                path = dest_dir / clip["path"]
+                shutil.copyfile(self.dir / clip["path"], path)
+                clips.append(SceneClip(**{**clip, "path": path}))
+        except (OSError, KeyError, ValueError):
+            return None
+        with self._lock:
+            self.restored += 1
+        return {**data, "clips": clips}
+
+    def put(self, stage: str, clips: list[SceneClip], throttle: bool = False, **data) -> None:
+        """Store a stage's clips and data, replacing what the stage stored before."""
+        records = []
+        try:
+            for n, clip in enumerate(clips):
+                name = f"{stage}_{n:03d}{clip.path.suffix}"
+                tmp_path = self.dir / f".{name}.tmp"
+                shutil.copyfile(clip.path, tmp_path)
+                os.replace(tmp_path, self.dir / name)
+                records.append({**clip.model_dump(mode="json"), "path": name})
+        except OSError as e:
+            print(f"Checkpoint of {stage} failed: {e}")
+            return
+
+        with self._lock:
+            previous = self.state.get(stage, {}).get("clips", [])
+            self.state[stage] = {**data, "clips": records}
+            tmp_state = self.dir / ".state.json.tmp"
+            tmp_state.write_text(json.dumps(self.state))
+            os.replace(tmp_state, self.dir / "state.json")
+            for clip in previous:
+                if clip["path"] not in {record["path"] for record in records}:
+                    (self.dir / clip["path"]).unlink(missing_ok=True)
+
+            now = time.time()
+            if self.commit and (not throttle or now - self._last_commit >= CHECKPOINT_COMMIT_INTERVAL):
+                self._last_commit = now
+                self.commit()
+
+    def flush(self) -> None:
+        """Commit checkpoints that throttling has held back."""
+        if self.commit:
+            with self._lock:
+                self._last_commit = time.time()
+                self.commit()
+
+    def clear(self) -> None:
+        """Delete the job's checkpoints once it has completed."""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        if self.commit:
+            self.commit()
+
+    @staticmethod
+    def expire(root: Path, ttl: float = JOB_CHECKPOINT_TTL) -> int:
+        """Delete checkpoints of jobs that have not been touched for ttl seconds."""
+        expired = 0
+        now = time.time()
+        for job_dir in root.glob("[!.]*"):
+            try:
+                stale = now - job_dir.stat().st_mtime > ttl
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                expired += 1
+        return expired
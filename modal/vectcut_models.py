@@ -0,0 +1,156 @@
+"""Request and response models of the VectCut composition endpoint."""
+from pathlib import Path
+from typing import Optional, Literal
+
+from pydantic import BaseModel, Field
+
+
+class VoiceoverData(BaseModel):
+    """Voiceover/dialogue audio data for a scene."""
+    audio_url: str  # S3 URL, base64, or "part:<field name>" in a multipart request
+    start_time: float = 0  # Relative to scene start in seconds
+    duration: float = 3.0  # Audio duration in seconds
+    volume: float = 1.0  # 0-1
+    character_name: Optional[str] = None
+
+
+class SceneData(BaseModel):
+    """Scene data for video composition."""
+    id: str
+    video_url: Optional[str] = None  # S3 URL, base64, or "part:<field name>" in a multipart request
+    image_url: Optional[str] = None  # Fallback if no video
+    duration: float = 6.0  # seconds
+    transition_to_next: Optional[str] = None  # fade, slideLeft, slideRight, zoomIn, zoomOut, swoosh
+    voiceovers: Optional[list[VoiceoverData]] = None  # Dialogue audio tracks
+    strip_original_audio: bool = False  # Remove original video audio before adding voiceovers
+
+
+class CaptionStyleData(BaseModel):
+    """Caption styling options."""
+    font_size: Literal["small", "medium", "large"] = "medium"
+    font_color: str = "#FFFFFF"
+    bg_color: str = "#000000"
+    bg_alpha: float = 0.7
+    position: Literal["top", "center", "bottom"] = "bottom"
+    shadow: bool = True
+
+
+class CaptionData(BaseModel):
+    """Caption data for burned-in subtitles."""
+    text: str
+    start_time: float  # Global timeline time in seconds
+    end_time: float
+    font_size: int = 36
+    font_color: str = "#FFFFFF"
+    background_color: Optional[str] = "#00000080"
+    position: Literal["top", "center", "bottom"] = "bottom"
+
+
+class AudioSettingsData(BaseModel):
+    """Audio settings for music."""
+    music_volume: float = 0.3
+    fade_in: float = 2.0
+    fade_out: float = 2.0
+
+
+class MusicData(BaseModel):
+    """Background music data."""
+    audio_url: str
+    volume: float = 0.3  # 0-1
+    start_offset: float = 0  # Trim from start
+    fade_in: float = 2.0  # Fade in duration
+    fade_out: float = 2.0  # Fade out duration
+
+
+class VideoCompositionRequest(BaseModel):
+    """Request for video composition."""
+    project_id: str
+    project_name: str = "Untitled Project"
+    scenes: list[SceneData]
+    captions: list[CaptionData] = []
+    music: Optional[MusicData] = None
+    output_format: Literal["mp4", "draft", "both"] = "both"
+    resolution: Literal["sd", "hd", "4k"] = "hd"
+    fps: int = 30
+    include_srt: bool = True
+    include_vtt: bool = False
+
+    # burned = draw captions into the video, soft = mux a mov_text subtitle track
+    caption_mode: Literal["burned", "soft"] = "burned"
+
+    # New VectCutAPI options
+    caption_style: Optional[CaptionStyleData] = None
+    transition_style: Literal["fade", "slideLeft", "slideRight", "zoomIn", "zoomOut", "wipe", "none"] = "fade"
+    transition_duration: float = 1.0
+    audio_settings: Optional[AudioSettingsData] = None
+    ken_burns_effect: bool = True
+
+    # Rendering options
+    # single_pass = one filter graph, iterative = pairwise transitions, smart = re-encode
+    # transition windows and captioned spans only, reusing the unchanged segments of the
+    # project's previous smart render, distributed = render contiguous chunks of scenes on
+    # separate workers and join them at the seams
+    render_mode: Literal["single_pass", "smart", "iterative", "distributed"] = "single_pass"
+    # Chunk count for distributed rendering; defaults to one per DISTRIBUTED_CHUNK_SCENES scenes
+    render_workers: Optional[int] = None
+    # numpy = mix all audio into one stem muxed once, ffmpeg = amix in every step
+    audio_engine: Literal["numpy", "ffmpeg"] = "numpy"
+    # delivery = CRF 18 MP4 at every stage, mezzanine = lossless intermediates and one final encode
+    intermediate_format: Literal["delivery", "mezzanine"] = "delivery"
+    # files = each stage writes a file, pipes = stream the final transition, captions
+    # and audio mux of the iterative path into each other
+    stage_io: Literal["files", "pipes"] = "files"
+    # download = fetch every source in full, stream = let ffmpeg read remote scene videos
+    # over HTTP range requests, only as far as the scene uses them
+    input_mode: Literal["download", "stream"] = "download"
+    # Scratch disk budget in GB; defaults to VECTCUT_SCRATCH_GB or 90% of free disk
+    scratch_budget_gb: Optional[float] = None
+    # ID of a resumable job: stages are checkpointed under it and a retry resumes from them,
+    # and submitted jobs are polled by it. Jobs submitted without one use the request
+    # fingerprint; plain synchronous renders without one are not checkpointed
+    job_id: Optional[str] = None
+    # False renders from scratch: the scene, output and smart-render segment caches are
+    # neither read nor written, e.g. for benchmarks
+    use_cache: bool = True
+    # URL a submitted job POSTs its final status to when it finishes
+    callback_url: Optional[str] = None
+    # Without S3: inline = base64 in the response, download = keep the files on the volume
+    # and return handles for the download endpoint, which streams them with range support
+    delivery: Literal["inline", "download"] = "inline"
+
+    # S3 config for uploading results
+    s3_bucket: Optional[str] = None
+    s3_region: Optional[str] = None
+    s3_access_key: Optional[str] = None
+    s3_secret_key: Optional[str] = None
+    s3_endpoint_url: Optional[str] = None  # S3-compatible endpoint (MinIO, moto server)
+
+
+class VideoCompositionResponse(BaseModel):
+    """Response from video composition."""
+    status: str  # "complete", "error", or "queued"/"running" for a submitted job's result
+    video_url: Optional[str] = None  # S3 URL or base64 of rendered MP4
+    video_base64: Optional[str] = None  # Base64 if no S3 config
+    draft_url: Optional[str] = None  # S3 URL of zipped draft folder
+    draft_base64: Optional[str] = None  # Base64 if no S3 config
+    video_handle: Optional[str] = None  # Download handle of the MP4 with delivery="download"
+    draft_handle: Optional[str] = None  # Download handle of the draft zip with delivery="download"
+    srt_content: Optional[str] = None  # SRT file content
+    vtt_content: Optional[str] = None  # WebVTT file content
+    duration: float = 0
+    file_size: int = 0
+    error: Optional[str] = None
+    stats: dict = Field(default_factory=dict)  # Render telemetry (cache hits, timings)
+
+
+class SceneClip(BaseModel):
+    """Prepared scene clip ready for composition."""
+    path: Path
+    duration: float
+    has_audio: bool = True
+    transition_to_next: Optional[str] = None
+    scene_index: int = 0  # Index into request.scenes
+    passthrough: bool = False  # Stream-copied from the source, not encoded by us
+    cache_key: Optional[str] = None  # Scene cache key, identifies the clip's content
+    overlap_out: float = 0  # Merge tree: timeline overlap with the next segment, 0 for a hard cut
+    degraded: bool = False  # A fallback left part of the scene out, e.g. its voiceovers
@@ -6,6 +6,10 @@ Features:
 - Generate CapCut/Jianying draft folder for advanced editing
 - AI-suggested transitions based on scene content
 - SRT subtitle file export
+- Asynchronous jobs: submit, poll status and progress, fetch the result
+- Streaming downloads of rendered files with HTTP range support
+- Multipart S3 uploads, streamed while the final video encodes
+- Multipart/form-data intake streaming large media to disk
 
 Deploy: modal deploy modal/vectcut_processor.py
 Test locally: modal run modal/vectcut_processor.py
@@ -19,7 +23,18 @@ import tempfile
 import subprocess
 import zipfile
 import time
+import math
+import shutil
+import hashlib
+import itertools
+import mimetypes
+import secrets
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from fractions import Fraction
 from pathlib import Path
+from urllib.parse import urlparse
 from typing import Optional, Literal
 
 import modal
@@ -42,6 +57,7 @@ image = (
         "fastapi",
         "pydantic>=2.0",
         "httpx",
+        "numpy",
         "pillow",
         "boto3",
         "requests",
@@ -54,140 +70,487 @@ image = (
         # Install VectCutAPI dependencies
         "cd /app/vectcut && pip install -r requirements.txt || pip install flask flask-cors",
     )
+    # Sibling modules holding the request models, caches and delivery storage
+    .add_local_python_source("vectcut_models", "vectcut_cache", "vectcut_storage")
 )
 
+# Web-endpoint types, only needed inside the container; annotations using them are
+# quoted, since the local client may not have fastapi installed
+with image.imports():
+    from fastapi import HTTPException, Request
+    from fastapi.responses import StreamingResponse
+    from starlette.concurrency import run_in_threadpool
+    from starlette.datastructures import UploadFile
+
 # Volume for caching processed videos
 cache_volume = modal.Volume.from_name("vectcut-cache", create_if_missing=True)
 
+# CPU cores reserved per container; scene preparation fans out across them
+CONTAINER_CPUS = 16.0
 
-from pydantic import BaseModel, Field
-
+# Override the number of parallel scene workers (0 = one per core)
+SCENE_WORKERS = int(os.environ.get("VECTCUT_SCENE_WORKERS", "0"))
 
-class VoiceoverData(BaseModel):
-    """Voiceover/dialogue audio data for a scene."""
-    audio_url: str  # S3 URL or base64
-    start_time: float = 0  # Relative to scene start in seconds
-    duration: float = 3.0  # Audio duration in seconds
-    volume: float = 1.0  # 0-1
-    character_name: Optional[str] = None
 
+from pydantic import BaseModel
 
-class SceneData(BaseModel):
-    """Scene data for video composition."""
-    id: str
-    video_url: Optional[str] = None  # S3 URL or base64
-    image_url: Optional[str] = None  # Fallback if no video
-    duration: float = 6.0  # seconds
-    transition_to_next: Optional[str] = None  # fade, slideLeft, slideRight, zoomIn, zoomOut, swoosh
-    voiceovers: Optional[list[VoiceoverData]] = None  # Dialogue audio tracks
-    strip_original_audio: bool = False  # Remove original video audio before adding voiceovers
+from vectcut_models import (
+    CaptionData,
+    CaptionStyleData,
+    MusicData,
+    SceneClip,
+    SceneData,
+    VideoCompositionRequest,
+    VideoCompositionResponse,
+    VoiceoverData,
+)
+from vectcut_cache import (
+    JOB_CHECKPOINT_DIR,
+    OUTPUT_CACHE_DIR,
+    PROJECT_CACHE_DIR,
+    SCENE_CACHE_DIR,
+    SCENE_CACHE_VERSION,
+    SEGMENT_VERSION,
+    JobCheckpoint,
+    OutputCache,
+    RenderManifest,
+    SceneCache,
+)
+from vectcut_storage import ARTIFACT_DIR, ArtifactStore, S3StreamingUpload, s3_configured, upload_to_s3
 
 
-class CaptionStyleData(BaseModel):
-    """Caption styling options."""
-    font_size: Literal["small", "medium", "large"] = "medium"
-    font_color: str = "#FFFFFF"
-    bg_color: str = "#000000"
-    bg_alpha: float = 0.7
-    position: Literal["top", "center", "bottom"] = "bottom"
-    shadow: bool = True
+# Media download tuning
+DOWNLOAD_WORKERS = 16  # Concurrent downloads per composition
+DOWNLOAD_PER_HOST = 8  # Concurrent downloads per host
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB streaming buffer
+STREAM_TIMEOUT_US = 30_000_000  # ffmpeg I/O timeout for streamed inputs, in microseconds
+BASE64_SLICE = DOWNLOAD_CHUNK_SIZE // 3 * 4  # Base64 text decoded per step, about 1 MB of output
 
+# Media uploaded through the multipart endpoint, kept on the vectcut-cache volume by
+# content hash and referenced from requests as "upload:<sha256>"
+UPLOAD_DIR = "/cache/uploads"
+UPLOAD_SCHEME = "upload:"
+UPLOAD_TTL = float(os.environ.get("VECTCUT_UPLOAD_TTL_HOURS", "24")) * 3600
 
-class CaptionData(BaseModel):
-    """Caption data for burned-in subtitles."""
-    text: str
-    start_time: float  # Global timeline time in seconds
-    end_time: float
-    font_size: int = 36
-    font_color: str = "#FFFFFF"
-    background_color: Optional[str] = "#00000080"
-    position: Literal["top", "center", "bottom"] = "bottom"
+_http_session = None
+_http_lock = threading.Lock()
+_host_limits: dict[str, threading.BoundedSemaphore] = {}
 
 
-class AudioSettingsData(BaseModel):
-    """Audio settings for music."""
-    music_volume: float = 0.3
-    fade_in: float = 2.0
-    fade_out: float = 2.0
+def get_http_session():
+    """Get the shared pooled HTTP session used for all media downloads."""
+    global _http_session
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _http_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=DOWNLOAD_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def get_host_limit(url: str) -> threading.BoundedSemaphore:
+    """Get the semaphore limiting concurrent downloads from the URL's host."""
+    host = urlparse(url).netloc
+    with _http_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(DOWNLOAD_PER_HOST)
+        return _host_limits[host]
+
+
+class Base64StreamDecoder:
+    """Decodes base64 text fed in pieces of any size.
+
+    Whitespace is dropped and an incomplete 4-character group is carried over to
+    the next piece, so a payload can be decoded while it is being read.
+    """
+
+    def __init__(self):
+        self._pending = b""
+
+    def feed(self, data: bytes | str) -> bytes:
+        """Decode as much of the text received so far as forms whole groups."""
+        if isinstance(data, str):
+            data = data.encode("ascii")
+        data = self._pending + b"".join(data.split())
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return base64.b64decode(data[:usable])
+
+    def close(self) -> None:
+        """Check that the payload ended on a whole group."""
+        if self._pending:
+            raise ValueError("Truncated base64 payload")
+
+
+def write_base64(text: str, output_path: Path) -> None:
+    """Decode base64 text into a file one slice at a time."""
+    decoder = Base64StreamDecoder()
+    with open(output_path, "wb") as f:
+        for i in range(0, len(text), BASE64_SLICE):
+            f.write(decoder.feed(text[i:i + BASE64_SLICE]))
+    decoder.close()
+
+
+def link_or_copy(source: Path, dest: Path) -> None:
+    """Hard-link a file to dest, copying it when the two are on different filesystems."""
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
 
 
-class MusicData(BaseModel):
-    """Background music data."""
-    audio_url: str
-    volume: float = 0.3  # 0-1
-    start_offset: float = 0  # Trim from start
-    fade_in: float = 2.0  # Fade in duration
-    fade_out: float = 2.0  # Fade out duration
-
-
-class VideoCompositionRequest(BaseModel):
-    """Request for video composition."""
-    project_id: str
-    project_name: str = "Untitled Project"
-    scenes: list[SceneData]
-    captions: list[CaptionData] = []
-    music: Optional[MusicData] = None
-    output_format: Literal["mp4", "draft", "both"] = "both"
-    resolution: Literal["sd", "hd", "4k"] = "hd"
-    fps: int = 30
-    include_srt: bool = True
-
-    # New VectCutAPI options
-    caption_style: Optional[CaptionStyleData] = None
-    transition_style: Literal["fade", "slideLeft", "slideRight", "zoomIn", "zoomOut", "wipe", "none"] = "fade"
-    transition_duration: float = 1.0
-    audio_settings: Optional[AudioSettingsData] = None
-    ken_burns_effect: bool = True
-
-    # S3 config for uploading results
-    s3_bucket: Optional[str] = None
-    s3_region: Optional[str] = None
-    s3_access_key: Optional[str] = None
-    s3_secret_key: Optional[str] = None
-
-
-class VideoCompositionResponse(BaseModel):
-    """Response from video composition."""
-    status: str  # "complete", "error"
-    video_url: Optional[str] = None  # S3 URL or base64 of rendered MP4
-    video_base64: Optional[str] = None  # Base64 if no S3 config
-    draft_url: Optional[str] = None  # S3 URL of zipped draft folder
-    draft_base64: Optional[str] = None  # Base64 if no S3 config
-    srt_content: Optional[str] = None  # SRT file content
-    duration: float = 0
-    file_size: int = 0
-    error: Optional[str] = None
+def upload_path(url: str) -> Path:
+    """Get the intake file behind an "upload:<sha256>" URL."""
+    digest = url[len(UPLOAD_SCHEME):]
+    if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+        raise ValueError(f"Malformed upload reference: {url[:80]}")
+    return Path(UPLOAD_DIR) / digest
 
 
 def download_media(url: str, output_path: Path) -> bool:
-    """Download media file from URL or decode base64."""
-    import requests
-
+    """Download media file from URL, decode base64 or link an uploaded file."""
     try:
         if url.startswith("data:"):
-            # Base64 data URL
-            header, data = url.split(",", 1)
-            with open(output_path, "wb") as f:
-                f.write(base64.b64decode(data))
+            # Base64 data URL, decoded in slices so the decoded bytes never sit in memory whole
+            write_base64(url[url.index(",") + 1:], output_path)
             return True
-        elif url.startswith("http"):
-            # HTTP URL
-            response = requests.get(url, timeout=120, stream=True)
-            response.raise_for_status()
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        elif url.startswith(UPLOAD_SCHEME):
+            # Streamed to the volume by the multipart endpoint
+            link_or_copy(upload_path(url), output_path)
             return True
+        elif url.startswith("http"):
+            # HTTP URL over the shared connection pool, retrying with backoff
+            session = get_http_session()
+            for attempt in range(DOWNLOAD_RETRIES + 1):
+                try:
+                    with get_host_limit(url):
+                        with session.get(url, timeout=120, stream=True) as response:
+                            response.raise_for_status()
+                            with open(output_path, "wb") as f:
+                                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                                    f.write(chunk)
+                    return True
+                except Exception as e:
+                    status = getattr(getattr(e, "response", None), "status_code", None)
+                    if attempt == DOWNLOAD_RETRIES or (status and 400 <= status < 500 and status != 429):
+                        raise
+                    delay = 0.5 * (2 ** attempt)
+                    print(f"Retrying download of {url[:50]}... in {delay}s: {e}")
+                    time.sleep(delay)
         else:
             # Raw base64
-            with open(output_path, "wb") as f:
-                f.write(base64.b64decode(url))
+            write_base64(url, output_path)
             return True
     except Exception as e:
         print(f"Failed to download {url[:50]}...: {e}")
         return False
 
 
+def accepts_ranges(url: Optional[str]) -> bool:
+    """Check whether a URL is served over HTTP(S) by a server that honors byte ranges."""
+    if not url or not url.startswith(("http://", "https://")):
+        return False
+    session = get_http_session()
+    try:
+        with get_host_limit(url):
+            response = session.head(url, timeout=30, allow_redirects=True)
+            if response.ok and response.headers.get("Accept-Ranges", "").lower() == "bytes":
+                return True
+            # Some servers only reveal range support by answering a ranged GET
+            with session.get(url, headers={"Range": "bytes=0-0"}, timeout=30, stream=True) as response:
+                return response.status_code == 206
+    except Exception as e:
+        print(f"Range check failed for {url[:50]}...: {e}")
+        return False
+
+
+def stream_input_args() -> list[str]:
+    """Get ffmpeg input options for reading a remote video over range requests.
+
+    ffmpeg seeks with ranged GETs on kept-alive connections, so it only fetches
+    the container index and the packets it actually decodes.
+    """
+    return [
+        "-seekable", "1", "-multiple_requests", "1",
+        "-reconnect", "1", "-reconnect_on_network_error", "1", "-reconnect_delay_max", "4",
+        "-rw_timeout", str(STREAM_TIMEOUT_US),
+    ]
+
+
+def hash_file(path: Path) -> str:
+    """Get the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_upload(source, root: Path) -> str:
+    """Copy an uploaded media part into the intake directory and return its "upload:" URL.
+
+    The part is read in DOWNLOAD_CHUNK_SIZE pieces and hashed on the way; a part
+    holding a base64 data URL is decoded as it streams. Files are named by content
+    hash, so a re-uploaded asset replaces nothing and is only touched.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    tmp_path = root / f".{secrets.token_hex(8)}.tmp"
+    digest = hashlib.sha256()
+    decoder = None
+    try:
+        with open(tmp_path, "wb") as f:
+            first = True
+            for chunk in iter(lambda: source.read(DOWNLOAD_CHUNK_SIZE), b""):
+                if first and chunk.startswith(b"data:"):
+                    # Text part holding a data URL; the header ends at the first comma
+                    while b"," not in chunk:
+                        more = source.read(DOWNLOAD_CHUNK_SIZE)
+                        if not more:
+                            raise ValueError("Data URL without payload")
+                        chunk += more
+                    chunk = chunk[chunk.index(b",") + 1:]
+                    decoder = Base64StreamDecoder()
+                first = False
+                data = decoder.feed(chunk) if decoder else chunk
+                digest.update(data)
+                f.write(data)
+        if decoder:
+            decoder.close()
+
+        path = root / digest.hexdigest()
+        if path.exists():
+            tmp_path.unlink()
+            os.utime(path)
+        else:
+            os.replace(tmp_path, path)
+        return f"{UPLOAD_SCHEME}{digest.hexdigest()}"
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def expire_uploads(root: Path, ttl: float = UPLOAD_TTL) -> int:
+    """Delete uploaded media not used for ttl seconds."""
+    expired = 0
+    now = time.time()
+    for path in root.glob("[!.]*"):
+        try:
+            if now - path.stat().st_mtime > ttl:
+                path.unlink()
+                expired += 1
+        except OSError:
+            continue
+    return expired
+
+
+def resolve_parts(request: VideoCompositionRequest, uploads: dict[str, str]) -> None:
+    """Replace "part:<field name>" media URLs of a request with the stored parts' URLs."""
+    def resolve(url: Optional[str]) -> Optional[str]:
+        if not url or not url.startswith("part:"):
+            return url
+        name = url[len("part:"):]
+        if name not in uploads:
+            raise ValueError(f"No media part named {name!r}")
+        return uploads[name]
+
+    for scene in request.scenes:
+        scene.video_url = resolve(scene.video_url)
+        scene.image_url = resolve(scene.image_url)
+        for vo in scene.voiceovers or []:
+            vo.audio_url = resolve(vo.audio_url)
+    if request.music:
+        request.music.audio_url = resolve(request.music.audio_url)
+
+
+class MediaFetcher:
+    """Downloads all media of a composition up front, in parallel.
+
+    Each unique URL is fetched once into the fetcher's directory, and URLs whose
+    content turns out identical share one file. Callers use fetch() like
+    download_media; it waits for the prefetched file and links it to the
+    requested path, so downloads overlap with scene encoding.
+    """
+
+    def __init__(self, dest_dir: Path, max_workers: int = DOWNLOAD_WORKERS):
+        self.dest_dir = dest_dir
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures: dict[str, Future] = {}
+        self._names = itertools.count()  # Never reused, unlike len(self._futures) after a discard
+        self._hashes: dict[str, str] = {}
+        self._by_hash: dict[str, Path] = {}  # Content hash -> the one file holding it
+        self._refs: dict[Path, int] = {}  # URLs sharing each file
+        self.duplicates = 0  # Downloads whose content another URL had already fetched
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "MediaFetcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop pending downloads."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, url: str) -> Future:
+        """Start downloading a URL unless it is already queued."""
+        with self._lock:
+            if url not in self._futures:
+                path = self.dest_dir / f"media_{next(self._names):04d}"
+                self._futures[url] = self._pool.submit(self._download, url, path)
+            return self._futures[url]
+
+    def _download(self, url: str, path: Path) -> Optional[Path]:
+        """Download a URL, collapsing content already fetched under another URL onto its file."""
+        if not download_media(url, path):
+            return None
+        digest = hash_file(path)
+        with self._lock:
+            self._hashes[url] = digest
+            shared = self._by_hash.setdefault(digest, path)
+            self._refs[shared] = self._refs.get(shared, 0) + 1
+            self.duplicates += shared != path
+        if shared != path:
+            path.unlink(missing_ok=True)
+        return shared
+
+    def prefetch(self, request: VideoCompositionRequest, done_scenes: frozenset[int] = frozenset()) -> int:
+        """Queue every media URL of a request in timeline order.
+
+        In stream input mode remote scene videos are left to ffmpeg; they are
+        only downloaded if a scene falls back to a full download. Scenes in
+        done_scenes already have their clip, so only their voiceovers are fetched.
+        """
+        for i, scene in enumerate(request.scenes):
+            media_url = scene.video_url or scene.image_url
+            if request.input_mode == "stream" and scene.video_url and scene.video_url.startswith("http"):
+                media_url = None
+            if media_url and i not in done_scenes:
+                self.submit(media_url)
+            for vo in scene.voiceovers or []:
+                self.submit(vo.audio_url)
+        if request.music:
+            self.submit(request.music.audio_url)
+        return len(self._futures)
+
+    def content_hash(self, url: str) -> Optional[str]:
+        """Get the SHA-256 of a URL's downloaded content, or None if it failed."""
+        if self.submit(url).result() is None:
+            return None
+        with self._lock:
+            return self._hashes[url]
+
+    def discard(self, url: str) -> None:
+        """Drop a download that is no longer needed; a later fetch downloads it again.
+
+        The file is deleted once no other URL shares it.
+        """
+        with self._lock:
+            future = self._futures.pop(url, None)
+        path = future.result() if future else None
+        if path is None:
+            return
+        with self._lock:
+            digest = self._hashes.pop(url)
+            self._refs[path] -= 1
+            if self._refs[path]:
+                return
+            del self._refs[path]
+            del self._by_hash[digest]
+        path.unlink(missing_ok=True)
+
+    def fetch(self, url: str, output_path: Path) -> bool:
+        """Wait for a URL to be downloaded and place it at output_path."""
+        path = self.submit(url).result()
+        if path is None:
+            return False
+        link_or_copy(path, output_path)
+        return True
+
+
+# Scratch disk accounting per composition
+SCRATCH_BUDGET_BYTES = int(float(os.environ.get("VECTCUT_SCRATCH_GB", "0")) * 1024**3)  # 0 = 90% of free disk
+SCRATCH_SAMPLE_INTERVAL = 0.5  # Seconds between usage samples
+
+
+class ScratchBudgetExceeded(Exception):
+    """Raised when a composition's scratch files outgrow its disk budget."""
+
+
+class ScratchSpace:
+    """Tracks the disk usage of a composition's temp directory against a budget.
+
+    A background thread samples the directory size to record the peak. Stages
+    delete intermediates as soon as nothing reads them, and check() aborts the
+    composition once usage passes the budget.
+    """
+
+    def __init__(self, root: Path, budget_bytes: int = SCRATCH_BUDGET_BYTES):
+        self.root = root
+        if budget_bytes <= 0:
+            budget_bytes = int(shutil.disk_usage(root).free * 0.9)
+        self.budget_bytes = budget_bytes
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ScratchSpace":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(SCRATCH_SAMPLE_INTERVAL):
+            self.sample()
+
+    def usage(self) -> int:
+        """Get the bytes currently used under root, counting hard links once."""
+        seen = set()
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                try:
+                    stat = os.lstat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                if (stat.st_dev, stat.st_ino) not in seen:
+                    seen.add((stat.st_dev, stat.st_ino))
+                    total += stat.st_size
+        return total
+
+    def sample(self) -> int:
+        """Measure current usage and update the peak."""
+        usage = self.usage()
+        with self._lock:
+            self.peak_bytes = max(self.peak_bytes, usage)
+        return usage
+
+    def check(self) -> None:
+        """Raise ScratchBudgetExceeded if usage is over budget."""
+        usage = self.sample()
+        if usage > self.budget_bytes:
+            raise ScratchBudgetExceeded(
+                f"Scratch usage {usage / 1024**2:.0f} MB exceeds budget of {self.budget_bytes / 1024**2:.0f} MB"
+            )
+
+    def stats(self) -> dict:
+        """Get peak usage and budget in bytes."""
+        self.sample()
+        return {"peak_bytes": self.peak_bytes, "budget_bytes": self.budget_bytes}
+
+
 def generate_srt(captions: list[CaptionData]) -> str:
     """Generate SRT subtitle file content."""
     def format_time(seconds: float) -> str:
@@ -207,6 +570,24 @@ def generate_srt(captions: list[CaptionData]) -> str:
     return "\n".join(srt_lines)
 
 
+def generate_vtt(captions: list[CaptionData]) -> str:
+    """Generate WebVTT subtitle file content."""
+    def format_time(seconds: float) -> str:
+        h = int(seconds // 3600)
+        m = int((seconds % 3600) // 60)
+        s = int(seconds % 60)
+        ms = int((seconds % 1) * 1000)
+        return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+    vtt_lines = ["WEBVTT", ""]
+    for caption in captions:
+        vtt_lines.append(f"{format_time(caption.start_time)} --> {format_time(caption.end_time)}")
+        vtt_lines.append(caption.text)
+        vtt_lines.append("")
+
+    return "\n".join(vtt_lines)
+
+
 def get_resolution(resolution: str) -> tuple[int, int]:
     """Get width and height for resolution preset."""
     if resolution == "4k":
@@ -216,62 +597,1055 @@ def get_resolution(resolution: str) -> tuple[int, int]:
     return 1920, 1080  # HD default
 
 
-def upload_to_s3(file_path: Path, s3_key: str, request: VideoCompositionRequest) -> Optional[str]:
-    """Upload file to S3 and return URL."""
-    if not all([request.s3_bucket, request.s3_access_key, request.s3_secret_key]):
+# Audio layout of every normalized scene clip, so clips join without resampling
+SCENE_SAMPLE_RATE = 44100
+SCENE_CHANNELS = 2
+
+# Map transition names used by the frontend to ffmpeg xfade transitions
+XFADE_TRANSITIONS = {
+    "fade": "fade", "fadeIn": "fade", "fadeOut": "fade", "crossfade": "fade",
+    "slideLeft": "slideleft", "slideleft": "slideleft", "wipeleft": "slideleft",
+    "slideRight": "slideright", "slideright": "slideright", "wiperight": "slideright",
+    "zoomIn": "circlecrop", "zoomin": "circlecrop", "zoom": "circlecrop",
+    "zoomOut": "circleopen", "zoomout": "circleopen",
+    "swoosh": "wipeleft", "wipe": "wipeleft",
+}
+
+
+def get_xfade_transition(transition_type: Optional[str]) -> Optional[str]:
+    """Get ffmpeg xfade transition name, or None for a hard cut."""
+    if not transition_type:
+        return None
+    return XFADE_TRANSITIONS.get(transition_type)
+
+
+def probe_media(path: Path) -> dict:
+    """Probe duration, video stream duration and audio presence of a media file."""
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration:stream=codec_type,duration",
+         "-of", "json", str(path)],
+        capture_output=True, text=True
+    )
+    info = json.loads(probe.stdout) if probe.stdout.strip() else {}
+    streams = info.get("streams", [])
+    duration = float(info.get("format", {}).get("duration", 0) or 0)
+    video_durations = [
+        float(s["duration"]) for s in streams
+        if s.get("codec_type") == "video" and s.get("duration") not in (None, "N/A")
+    ]
+    return {
+        "duration": duration,
+        "video_duration": video_durations[0] if video_durations else duration,
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+    }
+
+
+def probe_streams(path: Path | str) -> dict:
+    """Probe the container duration and the codec parameters of every stream."""
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries",
+         "format=duration:stream=codec_type,codec_name,width,height,pix_fmt,sample_aspect_ratio,"
+         "r_frame_rate,avg_frame_rate,duration,sample_rate,channels",
+         "-of", "json", str(path)],
+        capture_output=True, text=True
+    )
+    return json.loads(probe.stdout) if probe.stdout.strip() else {}
+
+
+def is_conforming(info: dict, width: int, height: int, fps: int, duration: float) -> bool:
+    """Check whether a source video already matches what scene normalization produces.
+
+    Conforming sources are H.264 yuv420p at the output size with square pixels and a
+    constant fps, carry AAC audio in the scene sample rate and channel count if any,
+    and last at least the scene duration, so trimming them by stream copy gives the
+    same clip without a generation of loss.
+    """
+    streams = info.get("streams", [])
+    video = [s for s in streams if s.get("codec_type") == "video"]
+    audio = [s for s in streams if s.get("codec_type") == "audio"]
+    if len(video) != 1 or len(audio) > 1:
+        return False
+
+    def frame_rate(value: Optional[str]) -> float:
+        try:
+            return float(Fraction(value))
+        except (TypeError, ValueError, ZeroDivisionError):
+            return 0.0
+
+    def covers(stream: dict, tolerance: float) -> bool:
+        # Streams without their own duration (Matroska, some muxers) span the container
+        value = stream.get("duration")
+        if value in (None, "N/A"):
+            value = info.get("format", {}).get("duration")
+        try:
+            return float(value) >= duration - tolerance
+        except (TypeError, ValueError):
+            return False
+
+    v = video[0]
+    if (
+        v.get("codec_name") != "h264"
+        or (v.get("width"), v.get("height")) != (width, height)
+        or v.get("pix_fmt") != "yuv420p"
+        or v.get("sample_aspect_ratio") not in (None, "N/A", "0:1", "1:1")
+        or abs(frame_rate(v.get("r_frame_rate")) - fps) > 0.01
+        or abs(frame_rate(v.get("avg_frame_rate")) - fps) > 0.01
+        or not covers(v, 0.5 / fps)
+    ):
+        return False
+    # AAC frames are ~23 ms, so the audio track may end a frame short of the video
+    return not audio or (
+        audio[0].get("codec_name") == "aac"
+        and str(audio[0].get("sample_rate")) == str(SCENE_SAMPLE_RATE)
+        and audio[0].get("channels") == SCENE_CHANNELS
+        and covers(audio[0], 0.05)
+    )
+
+
+def keyframe_args(fps: int, keyframe_interval: float) -> list[str]:
+    """Get encoder args for constant-fps, closed-GOP clips with keyframes on a fixed grid.
+
+    Smart rendering stream-copies clip middles between grid keyframes, so every
+    clip must share fps, pixel format and keyframe placement. B-frames are disabled
+    so decode order matches presentation order and copy cuts are frame exact.
+    """
+    if keyframe_interval <= 0:
+        return []
+    return [
+        "-r", str(fps), "-pix_fmt", "yuv420p", "-flags", "+cgop", "-bf", "0",
+        "-force_key_frames", f"expr:gte(t,n_forced*{keyframe_interval})",
+    ]
+
+
+def keyframe_time(t: float, keyframe_interval: float, fps: int, round_up: bool) -> float:
+    """Snap a clip time to the nearest grid keyframe at or after/before it.
+
+    Matches -force_key_frames expr:gte(t,n_forced*interval), which puts keyframe k
+    on the first frame at or after k * interval.
+    """
+    def frame_of(k: int) -> int:
+        return math.ceil(k * keyframe_interval * fps - 1e-6)
+
+    k = int(t // keyframe_interval)
+    if round_up:
+        while frame_of(k) / fps < t - 1e-6:
+            k += 1
+    else:
+        while k > 0 and frame_of(k) / fps > t + 1e-6:
+            k -= 1
+    return frame_of(k) / fps
+
+
+def ass_color(color: str, alpha: float = 1.0) -> str:
+    """Convert #RRGGBB (or #RRGGBBAA) to an ASS &HAABBGGRR colour.
+
+    ASS alpha is inverted: 00 is opaque and FF is fully transparent.
+    """
+    color = color.lstrip("#")
+    if len(color) == 8:
+        alpha = int(color[6:8], 16) / 255
+        color = color[:6]
+    if len(color) != 6:
+        color = "FFFFFF"
+    r, g, b = color[0:2], color[2:4], color[4:6]
+    ass_alpha = 255 - int(max(0.0, min(alpha, 1.0)) * 255)
+    return f"&H{ass_alpha:02X}{b}{g}{r}".upper()
+
+
+# Ken Burns motion: a centered zoom from 1x, KEN_BURNS_ZOOM_STEP per frame up to KEN_BURNS_MAX_ZOOM
+KEN_BURNS_ZOOM_STEP = 0.001
+KEN_BURNS_MAX_ZOOM = 1.1
+
+
+def load_canvas(image_path: Path, width: int, height: int):
+    """Decode an image once and fit it into a black width x height RGB canvas.
+
+    Returns None when Pillow cannot decode the image.
+    """
+    try:
+        from PIL import Image, ImageOps
+
+        with Image.open(image_path) as image:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except Exception:
         return None
 
+    image = ImageOps.contain(image, (width, height), Image.Resampling.LANCZOS)
+    canvas = Image.new("RGB", (width, height))
+    canvas.paste(image, ((width - image.width) // 2, (height - image.height) // 2))
+    return canvas
+
+
+def ken_burns_boxes(frame_count: int, width: float, height: float):
+    """Get the (left, top, right, bottom) crop box of every Ken Burns frame.
+
+    Boxes are in canvas coordinates and keep sub-pixel precision, so resampling
+    each frame from its box gives smooth motion without zoompan's jitter.
+    """
+    import numpy as np
+
+    zoom = np.minimum(1 + KEN_BURNS_ZOOM_STEP * np.arange(1, frame_count + 1), KEN_BURNS_MAX_ZOOM)
+    half_width = width / zoom / 2
+    half_height = height / zoom / 2
+    return np.stack(
+        [width / 2 - half_width, height / 2 - half_height, width / 2 + half_width, height / 2 + half_height],
+        axis=1,
+    )
+
+
+def use_mezzanine(request: VideoCompositionRequest) -> bool:
+    """Check whether stages should exchange lossless mezzanine files.
+
+    Smart rendering stream-copies scene clips into the output, so they must
+    already be delivery encodes.
+    """
+    return request.intermediate_format == "mezzanine" and request.render_mode != "smart"
+
+
+def video_codec_args(encode_preset: str = "slow", mezzanine: bool = False) -> list[str]:
+    """Get ffmpeg video codec arguments for a stage output.
+
+    Mezzanine files are lossless x264 at the fastest preset: quick to write and
+    free of generation loss, at the cost of size.
+    """
+    if mezzanine:
+        return ["-c:v", "libx264", "-qp", "0", "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+    return ["-c:v", "libx264", "-preset", encode_preset, "-crf", "18", "-pix_fmt", "yuv420p"]
+
+
+def audio_codec_args(bitrate: str = "192k", mezzanine: bool = False) -> list[str]:
+    """Get ffmpeg audio codec arguments for a stage output."""
+    if mezzanine:
+        return ["-c:a", "pcm_s16le"]
+    return ["-c:a", "aac", "-b:a", bitrate]
+
+
+def stage_path(path: Path, mezzanine: bool = False) -> Path:
+    """Get the path of a stage output; mezzanine files use streamable Matroska."""
+    return path.with_suffix(".mkv") if mezzanine else path
+
+
+# Stage chaining over OS pipes: raw video and PCM audio in NUT, so piped stages skip
+# the intermediate encode and never touch the scratch disk
+PIPE_INPUT = ["-f", "nut", "-i", "pipe:0"]
+PIPE_OUTPUT = ["-c:v", "rawvideo", "-c:a", "pcm_s16le", "-f", "nut", "pipe:1"]
+
+
+def transition_command(
+    input1: Path,
+    input2: Path,
+    duration1: float,
+    transition_type: str,
+    transition_duration: float,
+    outputs: list[str],
+    duration2: Optional[float] = None,
+    has_audio: tuple[bool, bool] = (True, True),
+) -> list[str]:
+    """Build the ffmpeg command joining two clips with a transition.
+
+    outputs holds the codec arguments and destination. A clip without audio is
+    joined with silence of its duration, so duration2 is needed when the second
+    clip is silent.
+    """
+    # Calculate offset (where transition starts)
+    offset = duration1 - transition_duration
+
+    # Silent clips get an anullsrc track, as in the single-pass graph
+    lines = []
+    audio = []
+    for k, duration in enumerate((duration1, duration2)):
+        if has_audio[k]:
+            audio.append(f"[{k}:a]")
+        else:
+            lines.append(
+                f"anullsrc=channel_layout=stereo:sample_rate={SCENE_SAMPLE_RATE},"
+                f"atrim=duration={duration}[s{k}]"
+            )
+            audio.append(f"[s{k}]")
+
+    # Build ffmpeg filter based on transition type
+    transition = get_xfade_transition(transition_type)
+    if transition:
+        lines.append(f"[0:v][1:v]xfade=transition={transition}:duration={transition_duration}:offset={offset}[v]")
+        lines.append(f"{audio[0]}{audio[1]}acrossfade=d={transition_duration}[a]")
+    else:
+        # No transition, just concatenate
+        lines.append(f"[0:v]{audio[0]}[1:v]{audio[1]}concat=n=2:v=1:a=1[v][a]")
+    filter_complex = ";".join(lines)
+
+    return [
+        "ffmpeg", "-y",
+        "-i", str(input1),
+        "-i", str(input2),
+        "-filter_complex", filter_complex,
+        "-map", "[v]", "-map", "[a]",
+        *outputs
+    ]
+
+
+def caption_command(inputs: list[str], subtitle_path: Path, outputs: list[str]) -> list[str]:
+    """Build the ffmpeg command burning an ASS subtitle file into a video."""
+    return ["ffmpeg", "-y", *inputs, "-vf", ass_filter(subtitle_path), *outputs]
+
+
+def music_command(
+    inputs: list[str],
+    music_path: Path,
+    music: MusicData,
+    video_duration: float,
+    outputs: list[str],
+) -> list[str]:
+    """Build the ffmpeg command mixing background music into a video's audio."""
+    # Build audio filter with volume and fade
+    audio_filter = f"[1:a]volume={music.volume}"
+
+    if music.fade_in > 0:
+        audio_filter += f",afade=t=in:st=0:d={music.fade_in}"
+
+    if music.fade_out > 0:
+        fade_start = video_duration - music.fade_out
+        audio_filter += f",afade=t=out:st={fade_start}:d={music.fade_out}"
+
+    audio_filter += "[music]"
+
+    return [
+        "ffmpeg", "-y",
+        *inputs,
+        "-i", str(music_path),
+        "-filter_complex",
+        f"{audio_filter};[0:a][music]amix=inputs=2:duration=first[a]",
+        "-map", "0:v", "-map", "[a]",
+        "-shortest",
+        *outputs
+    ]
+
+
+def stem_mux_command(inputs: list[str], audio_stem: Path, duration: float, outputs: list[str]) -> list[str]:
+    """Build the ffmpeg command replacing a video's audio with the audio stem."""
+    return [
+        "ffmpeg", "-y",
+        *inputs,
+        *stem_input_args(audio_stem),
+        "-map", "0:v", "-map", "1:a",
+        "-t", f"{duration:.3f}",
+        *outputs
+    ]
+
+
+def run_pipeline(commands: list[list[str]], log_dir: Path) -> bool:
+    """Run ffmpeg commands concurrently, each stdout feeding the next stdin.
+
+    stderr goes to per-stage log files, so unread diagnostics can never stall the
+    chain. Returns False if any stage failed.
+    """
+    procs = []
+    logs = []
     try:
-        import boto3
+        for i, cmd in enumerate(commands):
+            log = open(log_dir / f"pipeline_{i}.log", "w+")
+            logs.append(log)
+            upstream = procs[-1].stdout if procs else subprocess.DEVNULL
+            last = i == len(commands) - 1
+            procs.append(subprocess.Popen(
+                cmd, stdin=upstream, stdout=subprocess.DEVNULL if last else subprocess.PIPE, stderr=log
+            ))
+            if i > 0:
+                # Only the downstream stage holds the pipe, so an early exit reaches upstream
+                upstream.close()
+
+        ok = True
+        for i, (proc, log) in enumerate(zip(procs, logs)):
+            if proc.wait() != 0:
+                log.seek(0)
+                print(f"Pipeline stage {i + 1} failed: {log.read()[-2000:]}")
+                ok = False
+        return ok
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+        for log in logs:
+            log.close()
+
+
+def build_ass_subtitles(
+    captions: list[CaptionData],
+    width: int,
+    height: int,
+    caption_style: Optional[CaptionStyleData] = None,
+) -> str:
+    """Generate ASS subtitle file content for burned-in captions.
+
+    All captions share one style, so libass looks up the active events per frame
+    instead of ffmpeg evaluating one drawtext filter per caption.
+    """
+    # Use caption_style if provided, otherwise use defaults
+    style = caption_style or CaptionStyleData()
+
+    # Map font size names to pixel sizes
+    font_size_map = {"small": 28, "medium": 36, "large": 48}
+    font_size = font_size_map.get(style.font_size, 36)
+
+    # PlayRes matches the output so sizes and margins are in pixels
+    if style.position == "top":
+        alignment, margin_v = 8, int(height * 0.1)
+    elif style.position == "center":
+        alignment, margin_v = 5, 0
+    else:  # bottom
+        alignment, margin_v = 2, max(height - int(height * 0.85) - font_size, 0)
+
+    # BorderStyle 3 draws an opaque box in OutlineColour, padded by Outline
+    primary = ass_color(style.font_color)
+    box = ass_color(style.bg_color, style.bg_alpha)
+    shadow_color = ass_color("#000000", 0.5)
+    shadow = 2 if style.shadow else 0
 
-        s3 = boto3.client(
-            "s3",
-            region_name=request.s3_region or "us-east-1",
-            aws_access_key_id=request.s3_access_key,
-            aws_secret_access_key=request.s3_secret_key,
+    def format_time(seconds: float) -> str:
+        cs = int(round(seconds * 100))
+        return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,DejaVu Sans,{font_size},{primary},{primary},{box},{shadow_color},"
+        f"0,0,0,0,100,100,0,0,3,10,{shadow},{alignment},20,20,{margin_v},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for caption in captions:
+        # Escape override blocks and backslash tags, keep line breaks
+        text = (
+            caption.text.replace("\\", "\\\u2060")
+            .replace("{", "\\{")
+            .replace("}", "\\}")
+            .replace("\n", "\\N")
         )
+        lines.append(
+            f"Dialogue: 0,{format_time(caption.start_time)},{format_time(caption.end_time)},Default,,0,0,0,,{text}"
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+def ass_filter(subtitle_path: Path) -> str:
+    """Build the ass filter that burns in a subtitle file."""
+    path = str(subtitle_path).replace("\\", "/").replace("'", "'\\''")
+    return f"ass=filename='{path}'"
+
+
+def captions_between(captions: list[CaptionData], start: float, end: float) -> list[CaptionData]:
+    """Get the captions shown between two timeline times, clipped to that span and shifted to start at 0."""
+    return [
+        caption.model_copy(update={
+            "start_time": max(caption.start_time, start) - start,
+            "end_time": min(caption.end_time, end) - start,
+        })
+        for caption in captions
+        if caption.start_time < end and caption.end_time > start
+    ]
+
+
+def get_transition_overlap(prev_clip: SceneClip, next_clip: SceneClip, request: VideoCompositionRequest) -> float:
+    """Get the transition overlap between two clips, or 0 for a hard cut.
 
-        content_type = "video/mp4" if s3_key.endswith(".mp4") else "application/zip"
+    The overlap is kept to at most half of either clip so consecutive transitions
+    never overlap each other.
+    """
+    # Use scene-specific transition or fall back to global transition_style
+    if not get_xfade_transition(prev_clip.transition_to_next or request.transition_style):
+        return 0.0
+    return max(0.0, min(request.transition_duration, prev_clip.duration / 2, next_clip.duration / 2))
 
-        s3.upload_file(
-            str(file_path),
-            request.s3_bucket,
-            s3_key,
-            ExtraArgs={"ContentType": content_type},
+
+class TimelineSegment(BaseModel):
+    """Scene clip placed on the global timeline."""
+    scene_index: int
+    start: float  # Global start, where the incoming transition begins
+    end: float
+    overlap_in: float = 0  # Seconds shared with the previous segment
+    overlap_out: float = 0  # Seconds shared with the next segment
+
+
+class TimelineAudio(BaseModel):
+    """Voiceover or music clip placed on the global timeline."""
+    kind: Literal["voiceover", "music"]
+    audio_url: str
+    start: float
+    end: float
+    volume: float = 1.0
+    scene_index: Optional[int] = None
+
+
+class Timeline(BaseModel):
+    """Global timing of every segment, caption and audio clip of a composition.
+
+    Built from scene durations, transition overlaps and voiceover offsets, so the
+    renderers and exports can place everything without probing intermediate files.
+    """
+    segments: list[TimelineSegment]
+    captions: list[CaptionData]
+    audio: list[TimelineAudio]
+    duration: float
+
+
+def build_timeline(clips: list[SceneClip], request: VideoCompositionRequest) -> Timeline:
+    """Lay out prepared scene clips, captions, voiceovers and music on one timeline."""
+    segments = []
+    audio = []
+    position = 0.0
+
+    for i, clip in enumerate(clips):
+        overlap_in = get_transition_overlap(clips[i - 1], clip, request) if i > 0 else 0.0
+        start = position - overlap_in
+        segment = TimelineSegment(
+            scene_index=clip.scene_index, start=start, end=start + clip.duration, overlap_in=overlap_in,
         )
+        if segments:
+            segments[-1].overlap_out = overlap_in
+        segments.append(segment)
+        position = segment.end
+
+        # Voiceovers are mixed into their scene clip, so they end with it
+        for vo in request.scenes[clip.scene_index].voiceovers or []:
+            vo_start = min(segment.start + vo.start_time, segment.end)
+            audio.append(TimelineAudio(
+                kind="voiceover", audio_url=vo.audio_url, start=vo_start,
+                end=min(vo_start + vo.duration, segment.end), volume=vo.volume,
+                scene_index=clip.scene_index,
+            ))
+
+    if request.music:
+        audio.append(TimelineAudio(
+            kind="music", audio_url=request.music.audio_url, start=0, end=position, volume=request.music.volume,
+        ))
+
+    # Keep captions within the film, in playback order
+    captions = [
+        caption.model_copy(update={"start_time": max(caption.start_time, 0), "end_time": min(caption.end_time, position)})
+        for caption in sorted(request.captions, key=lambda c: c.start_time)
+        if caption.start_time < position and caption.end_time > max(caption.start_time, 0)
+    ]
+
+    return Timeline(segments=segments, captions=captions, audio=audio, duration=position)
+
+
+class RenderGraph(BaseModel):
+    """Single-pass ffmpeg render plan for a whole composition."""
+    input_args: list[str]
+    filter_script: str
+    duration: float
+
+
+def build_render_graph(
+    clips: list[SceneClip],
+    timeline: Timeline,
+    request: VideoCompositionRequest,
+    width: int,
+    height: int,
+    music_path: Optional[Path] = None,
+    include_video: bool = True,
+    subtitle_path: Optional[Path] = None,
+    include_audio: bool = True,
+) -> RenderGraph:
+    """Compile scenes, transitions, captions and music into one filter graph.
+
+    Every scene clip becomes one ffmpeg input. Transitions are chained xfade/acrossfade
+    filters whose offsets are the segment start times on the timeline, so the final
+    video is produced by a single decode and a single encode. Captions are burned in
+    from the ASS file at subtitle_path. With include_video=False only the audio chain
+    and music mix are compiled, and with include_audio=False only the video chain.
+    """
+    input_args = []
+    lines = []
+
+    # Normalize every input so xfade sees identical timebase, fps, format and audio layout
+    for i, clip in enumerate(clips):
+        input_args.extend(["-i", str(clip.path)])
+        if include_video:
+            # xfade ends a transition a frame early when its first input runs out on the
+            # last transition frame, so clips that fade out get one cloned frame more
+            fades_out = (
+                i < len(clips) - 1 and timeline.segments[i + 1].overlap_in > 0
+                and get_xfade_transition(clip.transition_to_next or request.transition_style)
+            )
+            pad = ",tpad=stop=1:stop_mode=clone" if fades_out else ""
+            lines.append(
+                f"[{i}:v]fps={request.fps},scale={width}:{height},"
+                f"format=yuv420p,setsar=1,settb=AVTB{pad}[v{i}]"
+            )
+        if not include_audio:
+            continue
+        if clip.has_audio:
+            lines.append(
+                f"[{i}:a]aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo,"
+                f"apad,atrim=duration={clip.duration}[a{i}]"
+            )
+        else:
+            lines.append(
+                f"anullsrc=channel_layout=stereo:sample_rate=44100,"
+                f"atrim=duration={clip.duration},aformat=sample_fmts=fltp[a{i}]"
+            )
 
-        url = f"https://{request.s3_bucket}.s3.{request.s3_region or 'us-east-1'}.amazonaws.com/{s3_key}"
-        print(f"Uploaded to S3: {url}")
-        return url
-    except Exception as e:
-        print(f"S3 upload failed: {e}")
+    # Chain transitions at the segment start times
+    video_label, audio_label = "v0", "a0"
+    for i in range(1, len(clips)):
+        segment = timeline.segments[i]
+        # Use scene-specific transition or fall back to global transition_style
+        transition = get_xfade_transition(clips[i - 1].transition_to_next or request.transition_style)
+
+        if transition and segment.overlap_in > 0:
+            if include_video:
+                lines.append(
+                    f"[{video_label}][v{i}]xfade=transition={transition}:"
+                    f"duration={segment.overlap_in:.3f}:offset={segment.start:.3f}[vx{i}]"
+                )
+            if include_audio:
+                lines.append(f"[{audio_label}][a{i}]acrossfade=d={segment.overlap_in:.3f}[ax{i}]")
+        elif include_video and include_audio:
+            lines.append(f"[{video_label}][{audio_label}][v{i}][a{i}]concat=n=2:v=1:a=1[vx{i}][ax{i}]")
+        elif include_video:
+            lines.append(f"[{video_label}][v{i}]concat=n=2:v=1:a=0[vx{i}]")
+        else:
+            lines.append(f"[{audio_label}][a{i}]concat=n=2:v=0:a=1[ax{i}]")
+        video_label, audio_label = f"vx{i}", f"ax{i}"
+
+    # Captions
+    if include_video and timeline.captions and subtitle_path:
+        lines.append(f"[{video_label}]{ass_filter(subtitle_path)}[vout]")
+    elif include_video:
+        lines.append(f"[{video_label}]null[vout]")
+
+    # Background music
+    if include_audio and request.music and music_path:
+        music = request.music
+        music_index = len(clips)
+        input_args.extend(["-i", str(music_path)])
+        audio_filter = f"[{music_index}:a]volume={music.volume}"
+        if music.fade_in > 0:
+            audio_filter += f",afade=t=in:st=0:d={music.fade_in}"
+        if music.fade_out > 0:
+            fade_start = max(timeline.duration - music.fade_out, 0)
+            audio_filter += f",afade=t=out:st={fade_start}:d={music.fade_out}"
+        lines.append(f"{audio_filter}[music]")
+        lines.append(f"[{audio_label}][music]amix=inputs=2:duration=first[aout]")
+    elif include_audio:
+        lines.append(f"[{audio_label}]anull[aout]")
+
+    return RenderGraph(
+        input_args=input_args,
+        filter_script=";\n".join(lines),
+        duration=timeline.duration,
+    )
+
+
+# Whole-film audio stem: raw float32 stereo PCM mixed with NumPy
+STEM_SAMPLE_RATE = 44100
+STEM_BLOCK_SAMPLES = STEM_SAMPLE_RATE * 30  # Mix in 30 s blocks to bound memory
+
+
+def stem_input_args(stem_path: Path) -> list[str]:
+    """Get ffmpeg input arguments for a raw float32 stereo stem."""
+    return ["-f", "f32le", "-ar", str(STEM_SAMPLE_RATE), "-ac", "2", "-i", str(stem_path)]
+
+
+def decode_pcm(path: Path, pcm_path: Path, duration: Optional[float] = None):
+    """Decode the audio of a media file to a memory-mapped float32 stereo array.
+
+    Returns None when the file has no decodable audio.
+    """
+    import numpy as np
+
+    cmd = [
+        "ffmpeg", "-y",
+        "-i", str(path),
+        "-vn",
+        *(["-t", f"{duration:.6f}"] if duration else []),
+        "-f", "f32le", "-ac", "2", "-ar", str(STEM_SAMPLE_RATE),
+        str(pcm_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0 or not pcm_path.exists() or pcm_path.stat().st_size < 8:
+        return None
+    return np.memmap(pcm_path, dtype=np.float32, mode="r").reshape(-1, 2)
+
+
+def mix_pcm(
+    mix,
+    pcm,
+    start: float,
+    length: float,
+    gain: float = 1.0,
+    fade_in: float = 0.0,
+    fade_out: float = 0.0,
+    fade_out_end: Optional[float] = None,
+) -> None:
+    """Add up to length seconds of pcm into mix at start, with linear fades.
+
+    The fade-out ends at fade_out_end seconds on the mix (default start + length),
+    matching afade/acrossfade with their default triangular curve.
+    """
+    import numpy as np
+
+    offset = int(round(start * STEM_SAMPLE_RATE))
+    count = min(len(pcm), int(round(length * STEM_SAMPLE_RATE)), len(mix) - offset)
+    if offset < 0 or count <= 0:
+        return
+
+    fade_in_n = fade_in * STEM_SAMPLE_RATE
+    fade_out_n = fade_out * STEM_SAMPLE_RATE
+    end = ((fade_out_end if fade_out_end is not None else start + length) - start) * STEM_SAMPLE_RATE
+
+    for block in range(0, count, STEM_BLOCK_SAMPLES):
+        n = min(STEM_BLOCK_SAMPLES, count - block)
+        t = np.arange(block, block + n, dtype=np.float64)
+        envelope = np.full(n, gain, dtype=np.float32)
+        if fade_in_n > 0:
+            envelope *= np.clip(t / fade_in_n, 0, 1).astype(np.float32)
+        if fade_out_n > 0:
+            envelope *= np.clip((end - t) / fade_out_n, 0, 1).astype(np.float32)
+        mix[offset + block:offset + block + n] += pcm[block:block + n] * envelope[:, None]
+
+
+def scene_cache_key(
+    scene: SceneData,
+    request: VideoCompositionRequest,
+    width: int,
+    height: int,
+    encode_preset: str,
+    fetcher: MediaFetcher,
+) -> Optional[str]:
+    """Get the scene cache key from source content and output parameters.
+
+    Returns None when any source media could not be downloaded.
+    """
+    source_hash = fetcher.content_hash(scene.video_url or scene.image_url)
+    if source_hash is None:
         return None
 
+    # The numpy audio engine mixes voiceovers into the stem, not into the clip
+    bake_audio = request.audio_engine == "ffmpeg"
+    voiceovers = []
+    for vo in (scene.voiceovers or []) if bake_audio else []:
+        vo_hash = fetcher.content_hash(vo.audio_url)
+        if vo_hash is None:
+            return None
+        voiceovers.append([vo_hash, vo.start_time, vo.duration, vo.volume])
+
+    params = {
+        "version": SCENE_CACHE_VERSION,
+        "source": source_hash,
+        "kind": "video" if scene.video_url else "image",
+        "width": width,
+        "height": height,
+        "fps": request.fps,
+        "encode_preset": encode_preset,
+        "ken_burns": request.ken_burns_effect,
+        "keyframe_interval": request.transition_duration if request.render_mode == "smart" else 0,
+        "duration": scene.duration,
+        "voiceovers": voiceovers,
+        "strip_original_audio": scene.strip_original_audio and bake_audio,
+        "mezzanine": use_mezzanine(request),
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+class SharedClips:
+    """Normalized clips shared between the scenes of one composition.
+
+    Scenes with the same scene cache key (same source content and output
+    parameters) need the same clip. The first scene to claim a key normalizes it;
+    later ones wait for that clip and link it instead of normalizing again.
+    """
+
+    def __init__(self):
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def claim(self, key: str) -> Optional[Future]:
+        """Claim a key, or get the future clip of the scene that claimed it first."""
+        with self._lock:
+            if key in self._futures:
+                self.shared += 1
+                return self._futures[key]
+            self._futures[key] = Future()
+            return None
+
+    def resolve(self, key: str, clip: Optional["SceneClip"]) -> None:
+        """Hand the claimed key's clip, or None if it failed, to the scenes waiting for it."""
+        self._futures[key].set_result(clip)
+
+
+OUTPUT_CACHE_VERSION = 1  # Bump when rendering output changes
+
+# Request fields that only say where and how results are delivered, not what is rendered
+DELIVERY_FIELDS = {
+    "project_id", "project_name", "output_format", "include_srt", "include_vtt",
+    "input_mode", "scratch_budget_gb", "job_id", "render_workers", "callback_url", "delivery", "use_cache",
+    "s3_bucket", "s3_region", "s3_access_key", "s3_secret_key", "s3_endpoint_url",
+}
+
+
+def media_key(url: Optional[str]) -> Optional[str]:
+    """Identify a media URL for request fingerprints.
+
+    Remote and uploaded media are identified by their URL, which for uploads holds
+    the content hash; inline base64 is replaced by a hash of its data, so the
+    fingerprint does not serialize megabytes of it.
+    """
+    if not url or url.startswith(("http", UPLOAD_SCHEME)):
+        return url
+    return "sha256:" + hashlib.sha256(url.encode()).hexdigest()
+
+
+def request_fingerprint(request: VideoCompositionRequest) -> str:
+    """Get a deterministic hash of the render-relevant fields of a request.
+
+    Media is identified by URL, so content changing behind a URL is only picked
+    up once the cached result expires.
+    """
+    fields = request.model_dump(mode="json", exclude=DELIVERY_FIELDS)
+    for scene in fields["scenes"]:
+        scene["video_url"] = media_key(scene["video_url"])
+        scene["image_url"] = media_key(scene["image_url"])
+        for vo in scene["voiceovers"] or []:
+            vo["audio_url"] = media_key(vo["audio_url"])
+    if fields["music"]:
+        fields["music"]["audio_url"] = media_key(fields["music"]["audio_url"])
+    params = {"version": OUTPUT_CACHE_VERSION, "request": fields}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+# Distributed rendering: default scenes per chunk, where chunks run (modal = one container
+# per chunk via .map, local = a process pool in this container, for testing) and the
+# volume directory modal workers hand their chunk outputs back through
+DISTRIBUTED_CHUNK_SCENES = 25
+DISTRIBUTED_BACKEND = os.environ.get("VECTCUT_DISTRIBUTED_BACKEND", "modal")
+CHUNK_DIR = "/cache/chunks"
+
+
+class RenderChunk(BaseModel):
+    """Contiguous run of scenes rendered by one distributed worker."""
+    index: int
+    scene_start: int
+    scene_end: int  # Exclusive
+    overlap_in: float = 0  # Seconds of the first scene inside the seam with the previous chunk
+    overlap_out: float = 0  # Seconds of the last scene inside the seam with the next chunk
+    captions: list[CaptionData] = []  # Captions on the body, timed from its start
+    encode_preset: str = "slow"
+    output_dir: Path
+
+
+class ChunkResult(BaseModel):
+    """Rendered chunk handed back to the coordinator."""
+    index: int
+    body: Path  # The chunk less its seam overlaps, ready for stream-copy concat
+    head: Optional[Path] = None  # First scene's overlap_in, for the incoming seam
+    tail: Optional[Path] = None  # Last scene's overlap_out, for the outgoing seam
+    clips: list[SceneClip]  # Scene clips for the audio stem; paths are audio-only files
+
+
+def plan_chunks(timeline: Timeline, chunk_count: int) -> list[tuple[int, int]]:
+    """Split a timeline into contiguous scene ranges of about equal duration.
+
+    Ranges break at scene boundaries, so each seam between chunks is exactly one
+    transition or cut.
+    """
+    scene_count = len(timeline.segments)
+    count = max(1, min(chunk_count, scene_count))
+    bounds = [0]
+    for k in range(1, count):
+        # Start chunk k at the scene closest to its share of the duration, leaving
+        # at least one scene for each chunk after it
+        target = timeline.duration * k / count
+        candidates = range(bounds[-1] + 1, scene_count - (count - k) + 1)
+        bounds.append(min(candidates, key=lambda i: abs(timeline.segments[i].start - target)))
+    bounds.append(scene_count)
+    return list(zip(bounds, bounds[1:]))
+
+
+# Asynchronous jobs: status records of submitted compositions, keyed by job ID, with the
+# spawned call's ID under "call:<job ID>" so its result can be fetched later
+job_store = modal.Dict.from_name("vectcut-jobs", create_if_missing=True)
+PROGRESS_INTERVAL = 2.0  # Minimum seconds between progress writes to the job store
+CALLBACK_TIMEOUT = 30  # Seconds allowed for a completion callback
+
+
+class JobProgress:
+    """Progress of one composition job, published to the job store for status polling.
+
+    stage() starts a step and writes at once; update() merges details such as the
+    current scene, the merge index or ffmpeg's fps and ETA into the step, writing at
+    most every PROGRESS_INTERVAL seconds. A store that cannot be reached only costs
+    the reports, never the render.
+    """
+
+    def __init__(self, store, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.record = {"job_id": job_id, "status": "running", "stage": None, "progress": {}}
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+        try:
+            self.record = {**(store.get(job_id) or {}), **self.record}
+        except Exception as e:
+            print(f"  Job store read failed: {e}")
+        self.record.setdefault("started_at", time.time())
+        self._write()
 
-@app.cls(
-    image=image,
-    gpu="T4",  # Light GPU for video encoding
-    volumes={"/cache": cache_volume},
-    timeout=14400,  # 4 hours for very long videos with slow preset (360+ scenes)
-    scaledown_window=180,
-)
-class VectCutProcessor:
-    """Video composition processor using VectCutAPI and ffmpeg."""
+    def _write(self) -> None:
+        self._last_write = time.time()
+        self.record["updated_at"] = self._last_write
+        try:
+            self.store[self.job_id] = self.record
+        except Exception as e:
+            print(f"  Job store write failed: {e}")
+
+    def stage(self, name: str, **detail) -> None:
+        """Start a new stage of the job."""
+        with self._lock:
+            self.record["stage"] = name
+            self.record["progress"] = detail
+            self._write()
+
+    def update(self, **detail) -> None:
+        """Merge details into the current stage's progress."""
+        with self._lock:
+            self.record["progress"].update(detail)
+            if time.time() - self._last_write >= PROGRESS_INTERVAL:
+                self._write()
+
+    def ffmpeg(self, block: dict, duration: float) -> None:
+        """Report one block of ffmpeg -progress output against the expected output duration."""
+        try:
+            encoded = int(block.get("out_time_us", "")) / 1e6
+        except ValueError:
+            encoded = 0.0
+        try:
+            speed = float(block.get("speed", "").rstrip("x"))
+        except ValueError:
+            speed = 0.0
+        try:
+            fps = float(block.get("fps", ""))
+        except ValueError:
+            fps = 0.0
+        detail = {"encoded_seconds": round(encoded, 2), "fps": fps, "speed": speed}
+        if duration > 0 and speed > 0:
+            detail["percent"] = round(min(100.0, 100 * encoded / duration), 1)
+            detail["eta_seconds"] = round(max(0.0, duration - encoded) / speed, 1)
+        self.update(**detail)
+
+    def finish(self, status: str, **fields) -> dict:
+        """Record the job's final status and return the record."""
+        with self._lock:
+            self.record.update(status=status, finished_at=time.time(), **fields)
+            self._write()
+            return dict(self.record)
+
+
+def run_ffmpeg(
+    cmd: list[str],
+    progress: Optional[JobProgress] = None,
+    duration: float = 0,
+) -> subprocess.CompletedProcess:
+    """Run an ffmpeg command writing to a file, reporting its progress to a tracked job.
+
+    Without progress this is subprocess.run with captured output. With it, ffmpeg
+    writes -progress blocks to stdout, which are reported against duration, and
+    stderr goes to a temporary file so it cannot stall the run.
+    """
+    if progress is None:
+        return subprocess.run(cmd, capture_output=True, text=True)
+
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    with tempfile.TemporaryFile("w+") as log:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log, text=True)
+        block = {}
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            block[key] = value
+            if key == "progress":
+                progress.ffmpeg(block, duration)
+                block = {}
+        returncode = proc.wait()
+        log.seek(0)
+        return subprocess.CompletedProcess(cmd, returncode, "", log.read())
+
+
+def container_cpus() -> int:
+    """Get the cores this container may use.
+
+    os.cpu_count() reports the host's cores inside a container, so the count is
+    the CONTAINER_CPUS reservation, capped by the CPUs the process is allowed on.
+    """
+    try:
+        allowed = len(os.sched_getaffinity(0))
+    except AttributeError:
+        allowed = os.cpu_count() or 1
+    return max(1, min(int(CONTAINER_CPUS), allowed))
 
-    @modal.enter()
-    def setup(self):
-        """Initialize processor when container starts."""
-        print("VectCutProcessor initializing...")
 
-        # Verify ffmpeg is available
-        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
-        print(f"FFmpeg version: {result.stdout.split(chr(10))[0]}")
+def get_pool_size(task_count: int, max_workers: int = 0) -> tuple[int, int]:
+    """Get worker count and ffmpeg threads per worker for a pool of ffmpeg jobs.
 
-        # Create working directories
-        os.makedirs("/cache/temp", exist_ok=True)
-        os.makedirs("/cache/output", exist_ok=True)
+    Each worker gets an equal share of the cores through -threads, so concurrent
+    encodes do not oversubscribe the container.
+    """
+    cpus = container_cpus()
+    workers = max(1, min(task_count, max_workers or SCENE_WORKERS or cpus))
+    threads = max(1, cpus // workers)
+    return workers, threads
 
-        print("VectCutProcessor ready!")
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Parse a single-range Range header into an inclusive (start, end), or None for the whole file.
+
+    Multi-range and non-byte requests get the whole file. Raises ValueError when the
+    range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, end
+
+
+def read_file_range(path: Path, start: int, end: int):
+    """Yield bytes start..end (inclusive) of a file in DOWNLOAD_CHUNK_SIZE pieces."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class MediaProcessor:
+    """ffmpeg scene preparation and rendering, independent of the Modal container."""
 
     def apply_transition(
         self,
@@ -281,83 +1655,62 @@ class VectCutProcessor:
         transition_type: str,
         transition_duration: float = 1.0,
         encode_preset: str = "fast",
-    ) -> bool:
-        """Apply transition effect between two video clips using ffmpeg."""
-        try:
-            # Get durations
-            probe1 = subprocess.run(
+        duration1: Optional[float] = None,
+        threads: int = 0,
+        mezzanine: bool = False,
+        duration2: Optional[float] = None,
+        has_audio: tuple[bool, bool] = (True, True),
+    ) -> Optional[float]:
+        """Apply transition effect between two video clips using ffmpeg.
+
+        Returns the duration of the joined clip, or None on failure. transition_duration
+        is the overlap, so a hard cut overlaps by nothing. Pass duration1 and duration2
+        when the clips' durations are already known to skip probing them. has_audio
+        tells which clips have an audio track; the joined clip always has one.
+        """
+        def probe_duration(path: Path) -> float:
+            probe = subprocess.run(
                 ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-                 "-of", "default=noprint_wrappers=1:nokey=1", str(input1)],
+                 "-of", "default=noprint_wrappers=1:nokey=1", str(path)],
                 capture_output=True, text=True
             )
-            duration1 = float(probe1.stdout.strip())
-
-            # Calculate offset (where transition starts)
-            offset = duration1 - transition_duration
+            return float(probe.stdout.strip())
 
-            # Build ffmpeg filter based on transition type
-            if transition_type in ["fade", "fadeIn", "fadeOut", "crossfade"]:
-                # Crossfade transition
-                filter_complex = (
-                    f"[0:v][1:v]xfade=transition=fade:duration={transition_duration}:offset={offset}[v];"
-                    f"[0:a][1:a]acrossfade=d={transition_duration}[a]"
-                )
-            elif transition_type in ["slideLeft", "slideleft", "wipeleft"]:
-                filter_complex = (
-                    f"[0:v][1:v]xfade=transition=slideleft:duration={transition_duration}:offset={offset}[v];"
-                    f"[0:a][1:a]acrossfade=d={transition_duration}[a]"
-                )
-            elif transition_type in ["slideRight", "slideright", "wiperight"]:
-                filter_complex = (
-                    f"[0:v][1:v]xfade=transition=slideright:duration={transition_duration}:offset={offset}[v];"
-                    f"[0:a][1:a]acrossfade=d={transition_duration}[a]"
-                )
-            elif transition_type in ["zoomIn", "zoomin", "zoom"]:
-                filter_complex = (
-                    f"[0:v][1:v]xfade=transition=circlecrop:duration={transition_duration}:offset={offset}[v];"
-                    f"[0:a][1:a]acrossfade=d={transition_duration}[a]"
-                )
-            elif transition_type in ["zoomOut", "zoomout"]:
-                filter_complex = (
-                    f"[0:v][1:v]xfade=transition=circleopen:duration={transition_duration}:offset={offset}[v];"
-                    f"[0:a][1:a]acrossfade=d={transition_duration}[a]"
-                )
-            elif transition_type in ["swoosh", "wipe"]:
-                filter_complex = (
-                    f"[0:v][1:v]xfade=transition=wipeleft:duration={transition_duration}:offset={offset}[v];"
-                    f"[0:a][1:a]acrossfade=d={transition_duration}[a]"
-                )
-            else:
-                # No transition, just concatenate
-                filter_complex = "[0:v][0:a][1:v][1:a]concat=n=2:v=1:a=1[v][a]"
-
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", str(input1),
-                "-i", str(input2),
-                "-filter_complex", filter_complex,
-                "-map", "[v]", "-map", "[a]",
-                "-c:v", "libx264", "-preset", encode_preset, "-crf", "18",
-                "-c:a", "aac", "-b:a", "192k",
-                str(output)
-            ]
+        try:
+            # Get durations
+            if duration1 is None:
+                duration1 = probe_duration(input1)
+            if duration2 is None:
+                duration2 = probe_duration(input2)
+
+            cmd = transition_command(
+                input1, input2, duration1, transition_type, transition_duration,
+                [
+                    *video_codec_args(encode_preset, mezzanine),
+                    *audio_codec_args(mezzanine=mezzanine),
+                    "-threads", str(threads),
+                    str(output)
+                ],
+                duration2=duration2, has_audio=has_audio,
+            )
 
             result = subprocess.run(cmd, capture_output=True, text=True)
             if result.returncode != 0:
+                # A concat in its place would drop the overlap and run longer than the timeline
                 print(f"Transition failed: {result.stderr}")
-                # Fallback to simple concat
-                return self.simple_concat([input1, input2], output)
+                return None
 
-            return True
+            overlap = transition_duration if get_xfade_transition(transition_type) else 0.0
+            return duration1 + duration2 - overlap
         except Exception as e:
             print(f"Transition error: {e}")
-            return False
+            return None
 
     def simple_concat(self, inputs: list[Path], output: Path) -> bool:
         """Simple concatenation without transitions."""
         try:
             # Create concat file
-            concat_file = output.parent / "concat.txt"
+            concat_file = output.parent / f"{output.stem}_concat.txt"
             with open(concat_file, "w") as f:
                 for inp in inputs:
                     f.write(f"file '{inp}'\n")
@@ -384,80 +1737,85 @@ class VectCutProcessor:
         width: int,
         height: int,
         caption_style: Optional[CaptionStyleData] = None,
+        mezzanine: bool = False,
     ) -> bool:
-        """Burn captions into video using ffmpeg drawtext filter."""
+        """Burn captions into video using an ASS subtitle file.
+
+        Returns False when the burn failed and the video was copied without captions.
+        """
         if not captions:
             # No captions, just copy
             subprocess.run(["cp", str(input_video), str(output_video)])
             return True
 
-        # Use caption_style if provided, otherwise use defaults
-        style = caption_style or CaptionStyleData()
-
-        # Map font size names to pixel sizes
-        font_size_map = {"small": 28, "medium": 36, "large": 48}
-        font_size = font_size_map.get(style.font_size, 36)
-
-        # Build background color with alpha
-        bg_alpha_hex = hex(int(style.bg_alpha * 255))[2:].zfill(2)
-        bg_color = f"{style.bg_color}{bg_alpha_hex}"
-
         try:
-            # Build drawtext filters for each caption
-            filters = []
-            for caption in captions:
-                # Use style position or caption-specific position
-                position = style.position
-
-                # Calculate Y position
-                if position == "top":
-                    y_pos = "h*0.1"
-                elif position == "center":
-                    y_pos = "(h-text_h)/2"
-                else:  # bottom
-                    y_pos = "h*0.85"
+            # One subtitle file for all captions, rendered by libass
+            subtitle_path = output_video.parent / f"{output_video.stem}.ass"
+            subtitle_path.write_text(build_ass_subtitles(captions, width, height, caption_style), encoding="utf-8")
 
-                # Escape special characters
-                text = caption.text.replace("'", "'\\''").replace(":", "\\:")
-
-                # Build filter with style options
-                filter_str = (
-                    f"drawtext=text='{text}':"
-                    f"fontsize={font_size}:"
-                    f"fontcolor={style.font_color}:"
-                    f"x=(w-text_w)/2:"
-                    f"y={y_pos}:"
-                    f"enable='between(t,{caption.start_time},{caption.end_time})':"
-                    f"box=1:boxcolor={bg_color}:boxborderw=10"
-                )
+            cmd = caption_command(
+                ["-i", str(input_video)], subtitle_path,
+                [*video_codec_args("slow", mezzanine), "-c:a", "copy", str(output_video)],
+            )
 
-                # Add shadow if enabled
-                if style.shadow:
-                    filter_str += ":shadowcolor=black@0.5:shadowx=2:shadowy=2"
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"Caption burn failed: {result.stderr}")
+                subprocess.run(["cp", str(input_video), str(output_video)])
+                return False
 
-                filters.append(filter_str)
+            return True
+        except Exception as e:
+            print(f"Caption error: {e}")
+            subprocess.run(["cp", str(input_video), str(output_video)])
+            return False
 
-            filter_complex = ",".join(filters)
+    def mux_subtitles(
+        self,
+        input_video: Path,
+        output_video: Path,
+        captions: list[CaptionData],
+    ) -> bool:
+        """Add captions as a soft mov_text subtitle track without re-encoding."""
+        try:
+            srt_path = output_video.parent / f"{output_video.stem}.srt"
+            srt_path.write_text(generate_srt(captions), encoding="utf-8")
 
             cmd = [
                 "ffmpeg", "-y",
                 "-i", str(input_video),
-                "-vf", filter_complex,
-                "-c:v", "libx264", "-preset", "slow", "-crf", "18",
-                "-c:a", "copy",
+                "-i", str(srt_path),
+                "-map", "0:v", "-map", "0:a?", "-map", "1:s",
+                "-c:v", "copy", "-c:a", "copy", "-c:s", "mov_text",
+                "-metadata:s:s:0", "language=und",
+                "-movflags", "+faststart",
                 str(output_video)
             ]
 
             result = subprocess.run(cmd, capture_output=True, text=True)
             if result.returncode != 0:
-                print(f"Caption burn failed: {result.stderr}")
-                subprocess.run(["cp", str(input_video), str(output_video)])
+                print(f"Subtitle mux failed: {result.stderr[-2000:]}")
+                return False
 
             return True
         except Exception as e:
-            print(f"Caption error: {e}")
-            subprocess.run(["cp", str(input_video), str(output_video)])
-            return True
+            print(f"Subtitle mux error: {e}")
+            return False
+
+    def encode_output(self, input_video: Path, output_video: Path, encode_preset: str = "slow") -> bool:
+        """Encode a mezzanine file into the delivery MP4."""
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", str(input_video),
+            *video_codec_args(encode_preset),
+            *audio_codec_args(),
+            str(output_video)
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Output encode failed: {result.stderr[-2000:]}")
+            return False
+        return True
 
     def add_music(
         self,
@@ -465,50 +1823,38 @@ class VectCutProcessor:
         output_video: Path,
         music: MusicData,
         video_duration: float,
+        fetcher: Optional[MediaFetcher] = None,
+        video_args: Optional[list[str]] = None,
     ) -> bool:
-        """Add background music to video."""
+        """Add background music to video.
+
+        The video stream is copied unless video_args gives codec arguments. Returns
+        False when the music could not be added and the video was copied without it.
+        """
         try:
             # Download music file
             music_path = input_video.parent / "music.mp3"
-            if not download_media(music.audio_url, music_path):
+            fetch = fetcher.fetch if fetcher else download_media
+            if not fetch(music.audio_url, music_path):
                 subprocess.run(["cp", str(input_video), str(output_video)])
-                return True
-
-            # Build audio filter with volume and fade
-            audio_filter = f"[1:a]volume={music.volume}"
-
-            if music.fade_in > 0:
-                audio_filter += f",afade=t=in:st=0:d={music.fade_in}"
-
-            if music.fade_out > 0:
-                fade_start = video_duration - music.fade_out
-                audio_filter += f",afade=t=out:st={fade_start}:d={music.fade_out}"
-
-            audio_filter += "[music]"
+                return False
 
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", str(input_video),
-                "-i", str(music_path),
-                "-filter_complex",
-                f"{audio_filter};[0:a][music]amix=inputs=2:duration=first[a]",
-                "-map", "0:v", "-map", "[a]",
-                "-c:v", "copy",
-                "-c:a", "aac", "-b:a", "192k",
-                "-shortest",
-                str(output_video)
-            ]
+            cmd = music_command(
+                ["-i", str(input_video)], music_path, music, video_duration,
+                [*(video_args or ["-c:v", "copy"]), "-c:a", "aac", "-b:a", "192k", str(output_video)],
+            )
 
             result = subprocess.run(cmd, capture_output=True, text=True)
             if result.returncode != 0:
                 print(f"Music add failed: {result.stderr}")
                 subprocess.run(["cp", str(input_video), str(output_video)])
+                return False
 
             return True
         except Exception as e:
             print(f"Music error: {e}")
             subprocess.run(["cp", str(input_video), str(output_video)])
-            return True
+            return False
 
     def add_voiceovers(
         self,
@@ -517,11 +1863,16 @@ class VectCutProcessor:
         voiceovers: list[VoiceoverData],
         scene_start_time: float,
         strip_original_audio: bool = False,
+        fetcher: Optional[MediaFetcher] = None,
+        video_duration: Optional[float] = None,
+        mezzanine: bool = False,
     ) -> bool:
         """Add voiceover audio tracks to video at specified times.
 
         If strip_original_audio is True, the original video audio is removed
-        and replaced with only the voiceovers.
+        and replaced with only the voiceovers. Pass video_duration when the clip
+        length is already known to skip probing it. Returns False when mixing failed
+        and the video was copied without the voiceovers.
         """
         if not voiceovers:
             if strip_original_audio:
@@ -542,10 +1893,11 @@ class VectCutProcessor:
             # Download all voiceover audio files
             audio_inputs = []
             audio_files = []
+            fetch = fetcher.fetch if fetcher else download_media
 
             for i, vo in enumerate(voiceovers):
-                vo_path = input_video.parent / f"voiceover_{i}.wav"
-                if download_media(vo.audio_url, vo_path):
+                vo_path = input_video.parent / f"{input_video.stem}_voiceover_{i}.wav"
+                if fetch(vo.audio_url, vo_path):
                     audio_inputs.extend(["-i", str(vo_path)])
                     audio_files.append((vo_path, vo))
 
@@ -559,12 +1911,13 @@ class VectCutProcessor:
             if strip_original_audio:
                 # Only use voiceovers, no original audio
                 # Generate silent base audio matching video duration
-                probe = subprocess.run(
-                    ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-                     "-of", "default=noprint_wrappers=1:nokey=1", str(input_video)],
-                    capture_output=True, text=True
-                )
-                video_duration = float(probe.stdout.strip()) if probe.stdout.strip() else 10.0
+                if video_duration is None:
+                    probe = subprocess.run(
+                        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                         "-of", "default=noprint_wrappers=1:nokey=1", str(input_video)],
+                        capture_output=True, text=True
+                    )
+                    video_duration = float(probe.stdout.strip()) if probe.stdout.strip() else 10.0
 
                 amix_inputs = []
                 for i, (vo_path, vo) in enumerate(audio_files):
@@ -591,7 +1944,7 @@ class VectCutProcessor:
                     "-map", "0:v",
                     "-map", "[aout]",
                     "-c:v", "copy",
-                    "-c:a", "aac", "-b:a", "192k",
+                    *audio_codec_args(mezzanine=mezzanine),
                     "-shortest",
                     str(output_video)
                 ]
@@ -606,81 +1959,1156 @@ class VectCutProcessor:
                     )
                     amix_inputs.append(f"[vo{i}]")
 
-                filter_str = ";".join(filter_parts)
-                if filter_str:
-                    filter_str += ";"
-                filter_str += "".join(amix_inputs) + f"amix=inputs={len(amix_inputs)}:duration=first[aout]"
+                filter_str = ";".join(filter_parts)
+                if filter_str:
+                    filter_str += ";"
+                filter_str += "".join(amix_inputs) + f"amix=inputs={len(amix_inputs)}:duration=first[aout]"
+
+                cmd = [
+                    "ffmpeg", "-y",
+                    "-i", str(input_video),
+                    *audio_inputs,
+                    "-filter_complex", filter_str,
+                    "-map", "0:v",
+                    "-map", "[aout]",
+                    "-c:v", "copy",
+                    *audio_codec_args(mezzanine=mezzanine),
+                    str(output_video)
+                ]
+
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            for vo_path, _ in audio_files:
+                vo_path.unlink(missing_ok=True)
+            if result.returncode != 0:
+                print(f"Voiceover mixing failed: {result.stderr}")
+                subprocess.run(["cp", str(input_video), str(output_video)])
+                return False
+
+            return True
+        except Exception as e:
+            print(f"Voiceover error: {e}")
+            subprocess.run(["cp", str(input_video), str(output_video)])
+            return False
+
+    def image_to_video(
+        self,
+        image_path: Path,
+        output_path: Path,
+        duration: float,
+        width: int,
+        height: int,
+        fps: int,
+        ken_burns: bool = True,
+        threads: int = 0,
+        encode_preset: str = "slow",
+        keyframe_interval: float = 0,
+        mezzanine: bool = False,
+    ) -> bool:
+        """Convert static image to video with optional Ken Burns effect.
+
+        Ken Burns frames come from one decoded image: the crop path of the whole
+        clip is precomputed and every frame is a single resample of the canvas,
+        piped raw into the encoder. Stills are one frame held with tpad.
+        """
+        try:
+            canvas = None
+            if ken_burns:
+                # Oversample the canvas so the tightest crop still maps 1:1 to the output
+                canvas = load_canvas(
+                    image_path, round(width * KEN_BURNS_MAX_ZOOM), round(height * KEN_BURNS_MAX_ZOOM)
+                )
+
+            frame_count = max(int(round(duration * fps)), 1)
+            if canvas is not None:
+                video_input = [
+                    "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+                    "-framerate", str(fps), "-i", "pipe:0",
+                ]
+                filter_str = "setsar=1"
+            elif ken_burns:
+                # Pillow cannot decode this image, so zoompan animates its single frame
+                video_input = ["-i", str(image_path)]
+                filter_str = (
+                    f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+                    f"zoompan=z='min(zoom+{KEN_BURNS_ZOOM_STEP},{KEN_BURNS_MAX_ZOOM})':x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':d={frame_count}:s={width}x{height}:fps={fps}"
+                )
+            else:
+                # Simple scale without animation, one frame held for the whole clip
+                video_input = ["-framerate", str(fps), "-i", str(image_path)]
+                filter_str = (
+                    f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+                    f"tpad=stop_mode=clone:stop_duration={duration}"
+                )
+
+            cmd = [
+                "ffmpeg", "-y",
+                *video_input,
+                "-f", "lavfi", "-i", f"anullsrc=channel_layout=stereo:sample_rate=44100",
+                "-vf", filter_str,
+                *video_codec_args(encode_preset, mezzanine),
+                *audio_codec_args("128k", mezzanine),
+                "-threads", str(threads),
+                "-t", str(duration),
+                "-pix_fmt", "yuv420p",
+                *keyframe_args(fps, keyframe_interval),
+                str(output_path)
+            ]
+
+            if canvas is None:
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"Image to video failed: {result.stderr}")
+                    return False
+                return True
+
+            from PIL import Image
+
+            # stderr goes to a file so the encoder never blocks on it while we write frames
+            with tempfile.TemporaryFile() as log:
+                proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=log)
+                try:
+                    for box in ken_burns_boxes(frame_count, canvas.width, canvas.height):
+                        frame = canvas.resize((width, height), Image.Resampling.BILINEAR, box=tuple(box))
+                        proc.stdin.write(frame.tobytes())
+                except BrokenPipeError:
+                    pass
+                finally:
+                    # EOF lets the encoder finish, also when frame rendering failed
+                    proc.stdin.close()
+                if proc.wait() != 0:
+                    log.seek(0)
+                    print(f"Image to video failed: {log.read().decode(errors='replace')[-2000:]}")
+                    return False
+
+            return True
+        except Exception as e:
+            print(f"Image to video error: {e}")
+            return False
+
+    def normalize_video(
+        self,
+        source: str,
+        output_path: Path,
+        duration: float,
+        width: int,
+        height: int,
+        fps: int,
+        encode_preset: str = "slow",
+        threads: int = 0,
+        keyframe_interval: float = 0,
+        mezzanine: bool = False,
+        stream: bool = False,
+    ) -> Optional[bool]:
+        """Turn a source video into a scene clip of exactly duration.
+
+        Sources that already conform are trimmed by stream copy; smart rendering
+        (keyframe_interval > 0) needs its own keyframe grid in every clip, so it
+        always re-encodes. With stream=True the source is a URL that ffmpeg reads
+        over range requests, stopping once the clip's duration has been read.
+        Returns whether the source was passed through, or None on failure.
+        """
+        input_args = ["-t", str(duration)]
+        if stream:
+            input_args += stream_input_args()
+
+        def run(cmd: list[str]):
+            if not stream:
+                return subprocess.run(cmd, capture_output=True, text=True)
+            with get_host_limit(source):
+                return subprocess.run(cmd, capture_output=True, text=True)
+
+        if keyframe_interval <= 0 and is_conforming(probe_streams(source), width, height, fps, duration):
+            result = run([
+                "ffmpeg", "-y",
+                *input_args, "-i", source,
+                "-map", "0:v:0", "-map", "0:a:0?",
+                "-c", "copy",
+                "-t", str(duration),
+                str(output_path)
+            ])
+            if result.returncode == 0:
+                return True
+
+        # Normalize video format, padding short sources so the clip matches the timeline
+        result = run([
+            "ffmpeg", "-y",
+            *input_args, "-i", source,
+            "-vf", (
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+                f"tpad=stop_mode=clone:stop_duration={duration}"
+            ),
+            "-af", "apad",
+            *video_codec_args(encode_preset, mezzanine),
+            *audio_codec_args("256k", mezzanine),
+            "-ar", str(SCENE_SAMPLE_RATE), "-ac", str(SCENE_CHANNELS),
+            "-threads", str(threads),
+            "-t", str(duration),
+            *keyframe_args(fps, keyframe_interval),
+            str(output_path)
+        ])
+        if result.returncode != 0:
+            print(f"    Video normalization failed: {result.stderr[-500:]}")
+            return None
+        return False
+
+    def prepare_scene(
+        self,
+        i: int,
+        scene: SceneData,
+        request: VideoCompositionRequest,
+        temp_path: Path,
+        width: int,
+        height: int,
+        encode_preset: str,
+        threads: int = 0,
+        fetcher: Optional[MediaFetcher] = None,
+        checkpoint: Optional[JobCheckpoint] = None,
+        shared_clips: Optional[SharedClips] = None,
+    ) -> Optional[SceneClip]:
+        """Download and normalize one scene into a clip of exactly scene.duration.
+
+        With shared_clips, a scene identical to one already claimed by another scene
+        of the request links that scene's clip instead of being normalized again.
+        """
+        print(f"  Processing scene {i+1}/{len(request.scenes)}: {scene.id}")
+
+        # A retried job picks up the scenes it already normalized
+        restored = checkpoint.get(f"scene_{i:03d}", temp_path) if checkpoint else None
+        if restored:
+            print(f"    Scene {i+1} restored from checkpoint")
+            return restored["clips"][0]
+
+        mezzanine = use_mezzanine(request)
+        # In stream input mode ffmpeg reads remote videos in place when the server honors ranges
+        streamed = request.input_mode == "stream" and accepts_ranges(scene.video_url)
+
+        # Reuse the normalized clip from a previous render if nothing relevant changed;
+        # streamed scenes are never downloaded in full, so they have no content hash to key on
+        scene_cache = getattr(self, "scene_cache", None) if request.use_cache else None
+        cache_key = None
+        if (scene_cache or shared_clips) and fetcher and (scene.video_url or scene.image_url) and not streamed:
+            cache_key = scene_cache_key(scene, request, width, height, encode_preset, fetcher)
+
+        # Scenes repeating an earlier scene of this request reuse its clip
+        claimed = False
+        if shared_clips and cache_key:
+            first = shared_clips.claim(cache_key)
+            claimed = first is None
+            source = first.result() if first else None
+            if source:
+                print(f"    Scene {i+1} shares the clip of scene {source.scene_index + 1}")
+                shared_path = stage_path(temp_path / f"scene_shared_{i:03d}.mp4", mezzanine)
+                link_or_copy(source.path, shared_path)
+                clip = self.scene_clip(i, scene, shared_path, bake_audio=request.audio_engine == "ffmpeg")
+                clip.passthrough = source.passthrough
+                clip.cache_key = cache_key
+                if checkpoint:
+                    checkpoint.put(f"scene_{i:03d}", [clip], throttle=True)
+                return clip
+
+        clip = None
+        try:
+            if scene_cache and cache_key:
+                cached_path = stage_path(temp_path / f"scene_cached_{i:03d}.mp4", mezzanine)
+                if scene_cache.get(cache_key, cached_path):
+                    print(f"    Scene {i+1} served from cache")
+                    clip = self.scene_clip(i, scene, cached_path, bake_audio=request.audio_engine == "ffmpeg")
+                    clip.cache_key = cache_key
+                    return clip
+
+            clip = self.normalize_scene(
+                i, scene, request, temp_path, width, height, encode_preset, threads, fetcher,
+                cache_key=cache_key, streamed=streamed,
+            )
+            if clip and checkpoint:
+                checkpoint.put(f"scene_{i:03d}", [clip], throttle=True)
+            return clip
+        finally:
+            if claimed:
+                shared_clips.resolve(cache_key, clip)
+
+    def normalize_scene(
+        self,
+        i: int,
+        scene: SceneData,
+        request: VideoCompositionRequest,
+        temp_path: Path,
+        width: int,
+        height: int,
+        encode_preset: str,
+        threads: int = 0,
+        fetcher: Optional[MediaFetcher] = None,
+        cache_key: Optional[str] = None,
+        streamed: bool = False,
+    ) -> Optional[SceneClip]:
+        """Encode one scene's media into its clip, storing it in the scene cache under cache_key."""
+        fetch = fetcher.fetch if fetcher else download_media
+        scene_cache = getattr(self, "scene_cache", None) if request.use_cache else None
+        # Smart rendering needs identically encoded clips with keyframes on a fixed grid
+        smart = request.render_mode == "smart"
+        keyframe_interval = request.transition_duration if smart else 0
+        mezzanine = use_mezzanine(request)
+
+        video_path = stage_path(temp_path / f"scene_{i:03d}.mp4", mezzanine)
+        final_scene_path = stage_path(temp_path / f"scene_final_{i:03d}.mp4", mezzanine)
+        scene_created = False
+        passthrough = False
+        degraded = False
+
+        if scene.video_url:
+            def normalize(source: str, stream: bool) -> Optional[bool]:
+                return self.normalize_video(
+                    source, video_path, scene.duration, width, height, request.fps,
+                    encode_preset=encode_preset, threads=threads, keyframe_interval=keyframe_interval,
+                    mezzanine=mezzanine, stream=stream,
+                )
+
+            passthrough = None
+            if streamed:
+                print(f"    Streaming scene {i+1} from its URL")
+                passthrough = normalize(scene.video_url, stream=True)
+                if passthrough is None:
+                    print(f"    Streaming scene {i+1} failed, downloading it in full")
+
+            if passthrough is None:
+                raw_path = temp_path / f"raw_{i:03d}.mp4"
+                if not fetch(scene.video_url, raw_path):
+                    print(f"    Failed to download video for scene {i+1}")
+                    return None
+                passthrough = normalize(str(raw_path), stream=False)
+                raw_path.unlink(missing_ok=True)
+                if passthrough is None:
+                    print(f"    Failed to normalize video for scene {i+1}")
+                    return None
+
+            if passthrough:
+                print(f"    Scene {i+1} already conforms, trimmed without re-encoding")
+            scene_created = True
+        elif scene.image_url:
+            # Convert image to video (with Ken Burns effect if enabled)
+            image_path = temp_path / f"image_{i:03d}.jpg"
+            if fetch(scene.image_url, image_path):
+                if self.image_to_video(
+                    image_path, video_path, scene.duration, width, height, request.fps,
+                    ken_burns=request.ken_burns_effect, threads=threads,
+                    encode_preset=encode_preset if smart else "slow",
+                    keyframe_interval=keyframe_interval, mezzanine=mezzanine,
+                ):
+                    scene_created = True
+                else:
+                    print(f"    Failed to convert image to video for scene {i+1}")
+                image_path.unlink(missing_ok=True)
+            else:
+                print(f"    Failed to download image for scene {i+1}")
+        else:
+            print(f"    No media for scene {i+1}")
+
+        # Add voiceovers to scene if available; the numpy audio engine mixes them into the stem
+        bake_audio = request.audio_engine == "ffmpeg"
+        if scene_created:
+            if not bake_audio:
+                clip_path = video_path
+            elif scene.voiceovers and len(scene.voiceovers) > 0:
+                print(f"    Adding {len(scene.voiceovers)} voiceover(s) to scene {i+1} (strip_audio={scene.strip_original_audio})")
+                degraded = not self.add_voiceovers(
+                    video_path, final_scene_path, scene.voiceovers, 0,
+                    strip_original_audio=scene.strip_original_audio, fetcher=fetcher,
+                    video_duration=scene.duration, mezzanine=mezzanine
+                )
+                clip_path = final_scene_path
+            elif scene.strip_original_audio:
+                # Strip audio but no voiceovers
+                print(f"    Stripping audio from scene {i+1}")
+                self.add_voiceovers(video_path, final_scene_path, [], 0, strip_original_audio=True)
+                clip_path = final_scene_path
+            else:
+                clip_path = video_path
+
+            if clip_path != video_path:
+                video_path.unlink(missing_ok=True)
+            # A stream-copy trim is as cheap as a cache hit, so passthrough clips are not cached
+            if scene_cache and cache_key and not passthrough and not degraded:
+                scene_cache.put(cache_key, clip_path)
+            clip = self.scene_clip(i, scene, clip_path, bake_audio=bake_audio)
+            clip.passthrough = passthrough
+            clip.cache_key = cache_key
+            clip.degraded = degraded
+            return clip
+
+        return None
+
+    def scene_clip(self, i: int, scene: SceneData, clip_path: Path, bake_audio: bool = True) -> SceneClip:
+        """Describe a prepared scene clip for the timeline.
+
+        Audio presence follows from how the clip was prepared; only clips that keep
+        the source video's own audio are probed. bake_audio tells whether voiceovers
+        and audio stripping were applied to the clip.
+        """
+        if bake_audio and scene.strip_original_audio and not scene.voiceovers:
+            has_audio = False
+        elif not scene.video_url or (bake_audio and scene.voiceovers and scene.strip_original_audio):
+            has_audio = True
+        else:
+            has_audio = probe_media(clip_path)["has_audio"]
+
+        return SceneClip(
+            path=clip_path, duration=scene.duration, has_audio=has_audio,
+            transition_to_next=scene.transition_to_next, scene_index=i,
+        )
+
+    def merge_tree(
+        self,
+        segments: list[SceneClip],
+        temp_path: Path,
+        request: VideoCompositionRequest,
+        encode_preset: str,
+        until: int = 1,
+        scratch: Optional[ScratchSpace] = None,
+        checkpoint: Optional[JobCheckpoint] = None,
+        progress: Optional[JobProgress] = None,
+    ) -> list[SceneClip]:
+        """Merge clips pairwise in a balanced tree, one parallel round per level.
+
+        Each round merges adjacent pairs concurrently, so n clips take O(log n) rounds
+        instead of a chain of n-1 ever larger encodes. Each join overlaps by the
+        timeline's clamped transition overlap between the scenes meeting there, and
+        merged durations come from what the join actually produced, so intermediates
+        never need probing. Merging stops once at
+        most `until` segments are left. Merged files are deleted as soon as the next
+        round has consumed them; the input clips are kept. With a checkpoint, every
+        finished round is stored and a retried job resumes after the last one.
+        """
+        mezzanine = use_mezzanine(request)
+        inputs = {segment.path for segment in segments}
+        round_index = 0
+        stage = f"merge_{until}"
+        # Each segment carries the overlap with whatever follows it, as the timeline lays it out
+        segments = [
+            clip.model_copy(update={"overlap_out": get_transition_overlap(clip, following, request)})
+            for clip, following in zip(segments, segments[1:])
+        ] + segments[-1:]
+        # A stored round only continues a merge of the same scene clips
+        sources = hashlib.sha256(json.dumps([
+            [clip.scene_index, clip.cache_key, clip.duration, clip.transition_to_next, clip.overlap_out]
+            for clip in segments
+        ]).encode()).hexdigest()
+        restored = checkpoint.get(stage, temp_path) if checkpoint else None
+        if restored and restored.get("sources") != sources:
+            print("  Checkpointed merge is of other scene clips, merging from scratch")
+            for clip in restored["clips"]:
+                clip.path.unlink(missing_ok=True)
+            restored = None
+        if restored:
+            segments = restored["clips"]
+            round_index = restored["round"] + 1
+            print(f"  Resuming merge after round {round_index} from checkpoint")
+        while len(segments) > until:
+            pairs = [(segments[j], segments[j + 1]) for j in range(0, len(segments) - 1, 2)]
+            workers, threads = get_pool_size(len(pairs))
+            print(f"  Merge round {round_index + 1}: {len(segments)} segments, {len(pairs)} merge(s)")
+            if progress:
+                progress.update(merge_round=round_index + 1, merges=len(pairs), merges_done=0)
+            merged_count = [0]
+            count_lock = threading.Lock()
+
+            def merge(j: int, left: SceneClip, right: SceneClip) -> SceneClip:
+                output_path = stage_path(temp_path / f"merged_{round_index:02d}_{j:03d}.mp4", mezzanine)
+                # Use scene-specific transition or fall back to global transition_style
+                transition = left.transition_to_next or request.transition_style
+
+                if left.overlap_out > 0:
+                    duration = self.apply_transition(
+                        left.path, right.path, output_path,
+                        transition, transition_duration=left.overlap_out,
+                        encode_preset=encode_preset, duration1=left.duration, threads=threads,
+                        mezzanine=mezzanine, duration2=right.duration, has_audio=(left.has_audio, right.has_audio)
+                    )
+                elif left.passthrough or right.passthrough:
+                    # Stream-copy concat needs identical encoder settings on both sides,
+                    # so hard cuts next to a passthrough clip are joined by re-encoding
+                    duration = self.apply_transition(
+                        left.path, right.path, output_path, "none",
+                        encode_preset=encode_preset, duration1=left.duration, threads=threads,
+                        mezzanine=mezzanine, duration2=right.duration, has_audio=(left.has_audio, right.has_audio)
+                    )
+                elif self.simple_concat([left.path, right.path], output_path):
+                    duration = left.duration + right.duration
+                else:
+                    duration = None
+                if duration is None:
+                    raise RuntimeError(f"Merging segments {2 * j + 1} and {2 * j + 2} of round {round_index + 1} failed")
+
+                for segment in (left, right):
+                    if segment.path not in inputs:
+                        segment.path.unlink(missing_ok=True)
+
+                if progress:
+                    with count_lock:
+                        merged_count[0] += 1
+                        merges_done = merged_count[0]
+                    progress.update(merge_index=j, merges_done=merges_done)
+
+                # The merged segment leads into whatever followed its right half
+                return SceneClip(
+                    path=output_path, duration=duration,
+                    transition_to_next=right.transition_to_next, overlap_out=right.overlap_out,
+                )
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                merged = list(pool.map(lambda args: merge(*args), [(j, *pair) for j, pair in enumerate(pairs)]))
+
+            if len(segments) % 2:
+                merged.append(segments[-1])
+            segments = merged
+            if checkpoint:
+                checkpoint.put(stage, segments, throttle=True, round=round_index, sources=sources)
+            round_index += 1
+            if scratch:
+                scratch.check()
+
+        if checkpoint:
+            checkpoint.flush()
+        return segments
+
+    def render_piped(
+        self,
+        clips: list[SceneClip],
+        timeline: Timeline,
+        output: Path,
+        request: VideoCompositionRequest,
+        width: int,
+        height: int,
+        encode_preset: str = "slow",
+        music_path: Optional[Path] = None,
+        audio_stem: Optional[Path] = None,
+        scratch: Optional[ScratchSpace] = None,
+        checkpoint: Optional[JobCheckpoint] = None,
+        progress: Optional[JobProgress] = None,
+    ) -> bool:
+        """Compose iteratively, streaming the last stages through OS pipes.
+
+        The merge tree stops at two segments. Their transition, the caption burn-in
+        and the audio mux with the one delivery encode then run as concurrent ffmpeg
+        processes connected by pipes carrying raw video and PCM in NUT, so the
+        composed and captioned films are never written to disk.
+        """
+        try:
+            commands = []
+            merged = []
+            if len(clips) > 1:
+                left, right = self.merge_tree(
+                    clips, output.parent, request, encode_preset, until=2,
+                    scratch=scratch, checkpoint=checkpoint, progress=progress
+                )
+                clip_paths = {clip.path for clip in clips}
+                merged = [segment.path for segment in (left, right) if segment.path not in clip_paths]
+                # Use scene-specific transition or fall back to global transition_style; the
+                # overlap is the timeline's, clamped for short scenes and 0 for a hard cut
+                transition = left.transition_to_next or request.transition_style
+                if not left.overlap_out:
+                    transition = "none"
+                commands.append(transition_command(
+                    left.path, right.path, left.duration, transition, left.overlap_out, PIPE_OUTPUT,
+                    duration2=right.duration, has_audio=(left.has_audio, right.has_audio),
+                ))
+                source = PIPE_INPUT
+            else:
+                source = ["-i", str(clips[0].path)]
+
+            if timeline.captions:
+                subtitle_path = output.parent / "captions.ass"
+                subtitle_path.write_text(
+                    build_ass_subtitles(timeline.captions, width, height, request.caption_style),
+                    encoding="utf-8",
+                )
+                commands.append(caption_command(source, subtitle_path, PIPE_OUTPUT))
+                source = PIPE_INPUT
+
+            outputs = [*video_codec_args(encode_preset), *audio_codec_args(), str(output)]
+            if audio_stem:
+                commands.append(stem_mux_command(source, audio_stem, timeline.duration, outputs))
+            elif request.music and music_path:
+                commands.append(music_command(source, music_path, request.music, timeline.duration, outputs))
+            else:
+                commands.append(["ffmpeg", "-y", *source, *outputs])
+
+            print(f"  Streaming {len(commands)} stage(s) through pipes")
+            ok = run_pipeline(commands, output.parent)
+            for path in merged:
+                path.unlink(missing_ok=True)
+            return ok
+        except Exception as e:
+            print(f"Piped render error: {e}")
+            return False
+
+    def render_audio_stem(
+        self,
+        clips: list[SceneClip],
+        timeline: Timeline,
+        output: Path,
+        request: VideoCompositionRequest,
+        fetcher: Optional[MediaFetcher] = None,
+        music_path: Optional[Path] = None,
+        dropped: Optional[list[str]] = None,
+    ) -> bool:
+        """Mix scene audio, voiceovers and music into one float32 stem with NumPy.
+
+        Every source is decoded to PCM once and added into a memory-mapped buffer at
+        its timeline position. Scene audio crossfades linearly over transition
+        overlaps, voiceovers and music play at their volume, and the music fades in
+        and out over the whole film. The mix is scaled down only if it would clip.
+        Sources that fail to download or decode are left out and listed in dropped.
+        """
+        dropped = dropped if dropped is not None else []
+        import numpy as np
+
+        fetch = fetcher.fetch if fetcher else download_media
+        work_dir = output.parent / "stem"
+        work_dir.mkdir(exist_ok=True)
+
+        try:
+            # (path, start, length, gain, fade_in, fade_out, fade_out_end) per source
+            layers = []
+            for clip, segment in zip(clips, timeline.segments):
+                if clip.has_audio and not request.scenes[clip.scene_index].strip_original_audio:
+                    layers.append((
+                        clip.path, segment.start, clip.duration, 1.0,
+                        segment.overlap_in, segment.overlap_out, None,
+                    ))
+
+            voiceovers = [a for a in timeline.audio if a.kind == "voiceover"]
+            for i, vo in enumerate(voiceovers):
+                vo_path = work_dir / f"voiceover_{i:03d}.wav"
+                if fetch(vo.audio_url, vo_path):
+                    layers.append((vo_path, vo.start, vo.end - vo.start, vo.volume, 0.0, 0.0, None))
+                else:
+                    print(f"    Failed to download voiceover {i+1}")
+                    dropped.append(vo.audio_url)
+
+            if request.music and music_path:
+                music = request.music
+                layers.append((
+                    music_path, 0.0, timeline.duration, music.volume,
+                    music.fade_in, music.fade_out, timeline.duration,
+                ))
+
+            # Decode all sources concurrently; each is one ffmpeg process
+            def decode(j: int):
+                return decode_pcm(layers[j][0], work_dir / f"source_{j:03d}.f32", duration=layers[j][2])
+
+            workers, _ = get_pool_size(len(layers))
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                sources = list(pool.map(decode, range(len(layers))))
+
+            total = max(int(round(timeline.duration * STEM_SAMPLE_RATE)), 1)
+            mix = np.memmap(output, dtype=np.float32, mode="w+", shape=(total, 2))
+            mixed = 0
+            for layer, pcm in zip(layers, sources):
+                if pcm is None:
+                    dropped.append(str(layer[0]))
+                    continue
+                _, start, length, gain, fade_in, fade_out, fade_out_end = layer
+                mix_pcm(mix, pcm, start, length, gain, fade_in, fade_out, fade_out_end)
+                mixed += 1
+
+            # Decoded sources are no longer needed once mixed
+            del sources
+            for path in work_dir.iterdir():
+                path.unlink(missing_ok=True)
+
+            # Scale down only when the summed sources would clip
+            blocks = range(0, total, STEM_BLOCK_SAMPLES)
+            peak = max(float(np.abs(mix[b:b + STEM_BLOCK_SAMPLES]).max()) for b in blocks)
+            if peak > 1.0:
+                for b in blocks:
+                    mix[b:b + STEM_BLOCK_SAMPLES] /= peak
+            mix.flush()
+
+            print(f"  Audio stem: mixed {mixed} source(s) over {timeline.duration:.2f}s")
+            return True
+        except Exception as e:
+            print(f"Audio stem error: {e}")
+            return False
+
+    def mux_audio_stem(
+        self,
+        input_video: Path,
+        audio_stem: Path,
+        output_video: Path,
+        duration: float,
+        video_args: Optional[list[str]] = None,
+        progress: Optional[JobProgress] = None,
+    ) -> bool:
+        """Mux the audio stem onto a video.
+
+        The video stream is copied unless video_args gives codec arguments.
+        """
+        try:
+            cmd = stem_mux_command(
+                ["-i", str(input_video)], audio_stem, duration,
+                [*(video_args or ["-c:v", "copy"]), "-c:a", "aac", "-b:a", "192k", str(output_video)],
+            )
+
+            result = run_ffmpeg(cmd, progress, duration)
+            if result.returncode != 0:
+                print(f"Audio stem mux failed: {result.stderr[-2000:]}")
+                return False
+
+            return True
+        except Exception as e:
+            print(f"Audio stem mux error: {e}")
+            return False
+
+    def render_single_pass(
+        self,
+        clips: list[SceneClip],
+        timeline: Timeline,
+        output: Path,
+        request: VideoCompositionRequest,
+        width: int,
+        height: int,
+        encode_preset: str = "slow",
+        music_path: Optional[Path] = None,
+        audio_stem: Optional[Path] = None,
+        progress: Optional[JobProgress] = None,
+        fragmented: bool = False,
+    ) -> bool:
+        """Render all scenes, transitions, captions and music with one ffmpeg run.
+
+        With an audio_stem the graph only builds the video, and the stem is mapped
+        as the audio track. fragmented writes a fragmented MP4, whose bytes are final
+        as soon as they are written, so it can be uploaded during the encode.
+        """
+        try:
+            subtitle_path = None
+            if timeline.captions:
+                subtitle_path = output.parent / "captions.ass"
+                subtitle_path.write_text(
+                    build_ass_subtitles(timeline.captions, width, height, request.caption_style),
+                    encoding="utf-8",
+                )
+
+            graph = build_render_graph(
+                clips, timeline, request, width, height,
+                music_path=music_path, subtitle_path=subtitle_path, include_audio=audio_stem is None
+            )
+            input_args = graph.input_args
+            audio_map = "[aout]"
+            if audio_stem:
+                input_args = [*input_args, *stem_input_args(audio_stem)]
+                audio_map = f"{len(clips)}:a"
+
+            # The graph can be huge for long films, so pass it as a script file
+            script_path = output.parent / "render_graph.txt"
+            script_path.write_text(graph.filter_script)
+
+            cmd = [
+                "ffmpeg", "-y",
+                *input_args,
+                "-filter_complex_script", str(script_path),
+                "-map", "[vout]", "-map", audio_map,
+                "-c:v", "libx264", "-preset", encode_preset, "-crf", "18",
+                "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", "192k",
+                "-t", f"{graph.duration:.3f}",
+                *(["-movflags", "+frag_keyframe+empty_moov+default_base_moof"] if fragmented else []),
+                str(output)
+            ]
+
+            result = run_ffmpeg(cmd, progress, graph.duration)
+            if result.returncode != 0:
+                print(f"Single-pass render failed: {result.stderr[-2000:]}")
+                return False
+
+            return True
+        except Exception as e:
+            print(f"Single-pass render error: {e}")
+            return False
+
+    def render_transition_window(
+        self,
+        prev_clip: SceneClip,
+        next_clip: SceneClip,
+        window_start: float,
+        window_end: float,
+        overlap: float,
+        output: Path,
+        request: VideoCompositionRequest,
+        encode_preset: str,
+        subtitle_path: Optional[Path] = None,
+    ) -> bool:
+        """Encode the xfade between the tail of one clip and the head of the next.
+
+        The window runs from window_start in prev_clip to window_end in next_clip,
+        both grid keyframes, and is encoded with the same settings as the clips so it
+        can be stream-copied between their middles. subtitle_path burns in the
+        window's captions, timed from the start of the window.
+        """
+        transition = get_xfade_transition(prev_clip.transition_to_next or request.transition_style)
+        fps = request.fps
+        offset = prev_clip.duration - overlap - window_start
+        frames = round((offset + window_end) * fps)
+        # Restart timestamps at the first decoded frame, so fps maps it to frame 0
+        normalize = f"setpts=PTS-STARTPTS,fps={fps},format=yuv420p,setsar=1,settb=AVTB"
+        burn = f",{ass_filter(subtitle_path)}" if subtitle_path else ""
+
+        # Seek half a frame early so rounding cannot skip the keyframe at window_start.
+        # xfade ends the transition early when its first input runs out on the last
+        # transition frame, so that input gets one cloned frame more, the next clip
+        # one frame more than the window, and the output is cut to the window's frames.
+        cmd = [
+            "ffmpeg", "-y",
+            "-ss", f"{max(window_start - 0.5 / fps, 0):.6f}", "-i", str(prev_clip.path),
+            "-t", f"{window_end + 1 / fps:.6f}", "-i", str(next_clip.path),
+            "-filter_complex",
+            f"[0:v]{normalize},tpad=stop=1:stop_mode=clone[a];[1:v]{normalize}[b];"
+            f"[a][b]xfade=transition={transition}:duration={overlap:.6f}:offset={offset:.6f}{burn}[v]",
+            "-map", "[v]", "-an", "-frames:v", str(frames),
+            "-c:v", "libx264", "-preset", encode_preset, "-crf", "18",
+            *keyframe_args(request.fps, request.transition_duration),
+            str(output)
+        ]
+
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Transition window failed: {result.stderr[-2000:]}")
+            return False
+        return True
+
+    def render_captioned_middle(
+        self,
+        clip: SceneClip,
+        start: float,
+        end: float,
+        subtitle_path: Path,
+        output: Path,
+        request: VideoCompositionRequest,
+        encode_preset: str,
+    ) -> bool:
+        """Encode the part of a clip between two grid keyframes with captions burned in.
+
+        Used instead of a stream copy when captions fall on a clip middle; the encoder
+        settings match the transition windows so the result joins the same concat.
+        """
+        cmd = [
+            "ffmpeg", "-y",
+            "-ss", f"{start:.6f}", "-i", str(clip.path),
+            "-t", f"{end - start:.6f}",
+            "-vf", f"fps={request.fps},format=yuv420p,setsar=1,{ass_filter(subtitle_path)}",
+            "-an",
+            "-c:v", "libx264", "-preset", encode_preset, "-crf", "18",
+            *keyframe_args(request.fps, request.transition_duration),
+            str(output)
+        ]
+
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Captioned middle failed: {result.stderr[-2000:]}")
+            return False
+        return True
+
+    def render_smart(
+        self,
+        clips: list[SceneClip],
+        timeline: Timeline,
+        output: Path,
+        request: VideoCompositionRequest,
+        encode_preset: str = "slow",
+        music_path: Optional[Path] = None,
+        audio_stem: Optional[Path] = None,
+        manifest: Optional[RenderManifest] = None,
+    ) -> bool:
+        """Render transitions by re-encoding only the overlap windows.
+
+        Clips must come from smart-mode scene preparation: identical encoder settings
+        and closed GOPs with keyframes every transition_duration. The part of each clip
+        between the keyframes around its transitions is stream-copied, each transition
+        window is re-encoded with xfade, and the pieces are joined with the concat
+        demuxer. Captions are burned into the windows and middles they fall on, so
+        uncaptioned middles stay copies. Audio is the audio_stem if given, otherwise
+        scene audio and music are mixed in one separate audio-only pass.
+
+        With a manifest, encoded segments whose inputs match the project's previous
+        render are reused and newly encoded ones are stored for the next render.
+        """
+        fps = request.fps
+        grid = request.transition_duration
+        half_frame = 0.5 / fps
+        width, height = get_resolution(request.resolution)
+        work_dir = output.parent / "smart"
+        work_dir.mkdir(exist_ok=True)
+
+        def segment_key(kind: str, sources: list[SceneClip], *parts) -> Optional[str]:
+            # Segments built from a clip without a content key are never reused
+            if manifest is None or any(clip.cache_key is None for clip in sources):
+                return None
+            params = [SEGMENT_VERSION, fps, grid, encode_preset, kind, [clip.cache_key for clip in sources], *parts]
+            return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+        def subtitles_for(name: str, captions: list[CaptionData]) -> Optional[Path]:
+            if not captions:
+                return None
+            subtitle_path = work_dir / f"{name}.ass"
+            subtitle_path.write_text(
+                build_ass_subtitles(captions, width, height, request.caption_style), encoding="utf-8"
+            )
+            return subtitle_path
+
+        caption_style = request.caption_style.model_dump() if request.caption_style else None
 
-                cmd = [
-                    "ffmpeg", "-y",
-                    "-i", str(input_video),
-                    *audio_inputs,
-                    "-filter_complex", filter_str,
-                    "-map", "0:v",
-                    "-map", "[aout]",
-                    "-c:v", "copy",
-                    "-c:a", "aac", "-b:a", "192k",
-                    str(output_video)
-                ]
+        try:
+            # Copyable middle of each clip: from the first keyframe after its incoming
+            # transition to the last keyframe before its outgoing one
+            heads = [0.0] * len(clips)
+            tails = [clip.duration for clip in clips]
+            overlaps = [segment.overlap_in for segment in timeline.segments]
+            for i in range(1, len(clips)):
+                if overlaps[i] > 0:
+                    tails[i - 1] = keyframe_time(clips[i - 1].duration - overlaps[i], grid, fps, round_up=False)
+                    heads[i] = keyframe_time(overlaps[i], grid, fps, round_up=True)
+
+            if any(head > tail + 1e-6 for head, tail in zip(heads, tails)):
+                print("  Clips too short for smart rendering")
+                return False
 
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            segments = []
+            entries = []
+            encoded = 0.0
+            for i, clip in enumerate(clips):
+                clip_start = timeline.segments[i].start
+                if overlaps[i] > 0:
+                    span = (timeline.segments[i - 1].start + tails[i - 1], clip_start + heads[i])
+                    captions = captions_between(timeline.captions, *span)
+                    key = segment_key(
+                        "window", [clips[i - 1], clip], tails[i - 1], heads[i], overlaps[i],
+                        get_xfade_transition(clips[i - 1].transition_to_next or request.transition_style),
+                        [caption.model_dump() for caption in captions], caption_style if captions else None,
+                    )
+                    window = manifest.get(key) if manifest else None
+                    if window is None:
+                        window = work_dir / f"transition_{i:03d}.mp4"
+                        if not self.render_transition_window(
+                            clips[i - 1], clip, tails[i - 1], heads[i], overlaps[i],
+                            window, request, encode_preset,
+                            subtitle_path=subtitles_for(f"transition_{i:03d}", captions),
+                        ):
+                            return False
+                        encoded += span[1] - span[0]
+                        if manifest:
+                            window = manifest.put(key, window)
+                    segments.append(window)
+                    entries.append({
+                        "kind": "transition", "scene_index": clip.scene_index, "key": key,
+                        "start": span[0], "end": span[1], "stored": window.parent != work_dir,
+                    })
+
+                if tails[i] - heads[i] < half_frame:
+                    continue
+
+                span = (clip_start + heads[i], clip_start + tails[i])
+                captions = captions_between(timeline.captions, *span)
+                middle = work_dir / f"middle_{i:03d}.mp4"
+                if captions:
+                    # Captions need a re-encode, so the result is worth keeping
+                    key = segment_key(
+                        "middle", [clip], heads[i], tails[i],
+                        [caption.model_dump() for caption in captions], caption_style,
+                    )
+                    stored = manifest.get(key) if manifest else None
+                    if stored:
+                        middle = stored
+                    else:
+                        if not self.render_captioned_middle(
+                            clip, heads[i], tails[i], subtitles_for(f"middle_{i:03d}", captions),
+                            middle, request, encode_preset
+                        ):
+                            return False
+                        encoded += span[1] - span[0]
+                        if manifest:
+                            middle = manifest.put(key, middle)
+                else:
+                    # Seek a quarter frame past the keyframe so the demuxer lands exactly on it,
+                    # and stop half a frame early so the tail keyframe is left to the window
+                    key = segment_key("middle", [clip], heads[i], tails[i])
+                    lead = half_frame / 2 if heads[i] > 0 else 0
+                    seek = ["-ss", f"{heads[i] + lead:.6f}"] if heads[i] > 0 else []
+                    cmd = [
+                        "ffmpeg", "-y",
+                        *seek, "-i", str(clip.path),
+                        "-map", "0:v", "-c", "copy",
+                        "-t", f"{tails[i] - heads[i] - lead - half_frame:.6f}",
+                        "-avoid_negative_ts", "make_zero",
+                        str(middle)
+                    ]
+                    result = subprocess.run(cmd, capture_output=True, text=True)
+                    if result.returncode != 0:
+                        print(f"Middle segment copy failed: {result.stderr[-2000:]}")
+                        return False
+                segments.append(middle)
+                entries.append({
+                    "kind": "middle", "scene_index": clip.scene_index, "key": key,
+                    "start": span[0], "end": span[1], "stored": middle.parent != work_dir,
+                })
+
+            print(f"  Smart render re-encoded {encoded:.1f}s of {timeline.duration:.1f}s")
+            if manifest:
+                changed = manifest.changed_scenes([clip.cache_key for clip in clips])
+                print(f"  {changed} of {len(clips)} scene(s) changed, reused {manifest.reused} stored segment(s)")
+
+            # Join windows and middles without re-encoding
+            concat_file = work_dir / "segments.txt"
+            concat_file.write_text("".join(f"file '{segment}'\n" for segment in segments))
+            video_path = work_dir / "video.mp4"
+            result = subprocess.run(
+                ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_file),
+                 "-c", "copy", str(video_path)],
+                capture_output=True, text=True
+            )
+            # Stored segments stay for the next render until the manifest is saved
+            for segment in segments:
+                if segment.parent == work_dir:
+                    segment.unlink(missing_ok=True)
             if result.returncode != 0:
-                print(f"Voiceover mixing failed: {result.stderr}")
-                subprocess.run(["cp", str(input_video), str(output_video)])
+                print(f"Smart concat failed: {result.stderr[-2000:]}")
+                return False
+            if manifest:
+                manifest.save(entries, [clip.cache_key for clip in clips])
+
+            if audio_stem:
+                muxed = self.mux_audio_stem(video_path, audio_stem, output, timeline.duration)
+                video_path.unlink(missing_ok=True)
+                return muxed
+
+            # Mix scene audio with acrossfades and music in one audio-only pass
+            graph = build_render_graph(clips, timeline, request, 0, 0, music_path=music_path, include_video=False)
+            script_path = work_dir / "audio_graph.txt"
+            script_path.write_text(graph.filter_script)
+            audio_path = work_dir / "audio.m4a"
+            result = subprocess.run(
+                ["ffmpeg", "-y", *graph.input_args,
+                 "-filter_complex_script", str(script_path),
+                 "-map", "[aout]", "-c:a", "aac", "-b:a", "192k",
+                 "-t", f"{graph.duration:.3f}", str(audio_path)],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                print(f"Smart audio mix failed: {result.stderr[-2000:]}")
+                return False
+
+            result = subprocess.run(
+                ["ffmpeg", "-y", "-i", str(video_path), "-i", str(audio_path),
+                 "-map", "0:v", "-map", "1:a", "-c", "copy", str(output)],
+                capture_output=True, text=True
+            )
+            video_path.unlink(missing_ok=True)
+            audio_path.unlink(missing_ok=True)
+            if result.returncode != 0:
+                print(f"Smart mux failed: {result.stderr[-2000:]}")
+                return False
 
             return True
         except Exception as e:
-            print(f"Voiceover error: {e}")
-            subprocess.run(["cp", str(input_video), str(output_video)])
-            return True
+            print(f"Smart render error: {e}")
+            return False
 
-    def image_to_video(
+    def render_chunks(
         self,
-        image_path: Path,
-        output_path: Path,
-        duration: float,
+        request: VideoCompositionRequest,
+        temp_path: Path,
+        encode_preset: str,
+    ) -> Optional[tuple[list[RenderChunk], list[ChunkResult]]]:
+        """Split the film into chunks at scene boundaries and render them on parallel workers."""
+        if DISTRIBUTED_BACKEND == "local":
+            chunk_root = temp_path / "chunks"
+        else:
+            os.makedirs(CHUNK_DIR, exist_ok=True)
+            chunk_root = Path(tempfile.mkdtemp(dir=CHUNK_DIR))
+        chunks = plan_render_chunks(request, chunk_root, encode_preset)
+
+        print(f"  Rendering {len(chunks)} chunk(s) on the {DISTRIBUTED_BACKEND} backend")
+        try:
+            results = self.dispatch_chunks(request, chunks)
+        except Exception as e:
+            print(f"  Chunk rendering error: {e}")
+            return None
+
+        if not all(results):
+            print(f"  {sum(result is None for result in results)} chunk(s) failed")
+            return None
+        return chunks, results
+
+    def dispatch_chunks(
+        self, request: VideoCompositionRequest, chunks: list[RenderChunk]
+    ) -> list[Optional[ChunkResult]]:
+        """Render planned chunks in worker processes on this machine."""
+        return render_chunks_local(request, chunks)
+
+    def join_chunks(
+        self,
+        chunks: list[RenderChunk],
+        results: list[ChunkResult],
+        timeline: Timeline,
+        output: Path,
+        request: VideoCompositionRequest,
         width: int,
         height: int,
-        fps: int,
-        ken_burns: bool = True,
+        encode_preset: str,
+        audio_stem: Path,
     ) -> bool:
-        """Convert static image to video with optional Ken Burns effect."""
-        try:
-            if ken_burns:
-                # Add subtle zoom effect for visual interest
-                filter_str = (
-                    f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
-                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
-                    f"zoompan=z='min(zoom+0.001,1.1)':x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':d={int(duration*fps)}:s={width}x{height}:fps={fps}"
-                )
-            else:
-                # Simple scale without animation
-                filter_str = (
-                    f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
-                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"
-                )
+        """Join rendered chunk bodies with their seam transitions and mux the audio stem.
 
-            cmd = [
-                "ffmpeg", "-y",
-                "-loop", "1",
-                "-i", str(image_path),
-                "-f", "lavfi", "-i", f"anullsrc=channel_layout=stereo:sample_rate=44100",
-                "-vf", filter_str,
-                "-c:v", "libx264", "-preset", "slow", "-crf", "18",
-                "-c:a", "aac",
-                "-t", str(duration),
-                "-pix_fmt", "yuv420p",
-                str(output_path)
-            ]
+        Each seam is the xfade between one chunk's tail and the next chunk's head,
+        encoded like the bodies, with its captions burned in; everything else is
+        stream-copied.
+        """
+        work_dir = output.parent / "seams"
+        work_dir.mkdir(exist_ok=True)
 
-            result = subprocess.run(cmd, capture_output=True, text=True)
+        try:
+            segments = [results[0].body]
+            for i in range(1, len(chunks)):
+                overlap = chunks[i].overlap_in
+                if overlap > 0:
+                    prev_scene = request.scenes[chunks[i - 1].scene_end - 1]
+                    seam_start = timeline.segments[chunks[i].scene_start].start
+                    captions = captions_between(timeline.captions, seam_start, seam_start + overlap)
+                    subtitle_path = None
+                    if captions:
+                        subtitle_path = work_dir / f"seam_{i:03d}.ass"
+                        subtitle_path.write_text(
+                            build_ass_subtitles(captions, width, height, request.caption_style),
+                            encoding="utf-8",
+                        )
+                    seam = work_dir / f"seam_{i:03d}.mp4"
+                    if not self.render_transition_window(
+                        SceneClip(path=results[i - 1].tail, duration=overlap, transition_to_next=prev_scene.transition_to_next),
+                        SceneClip(path=results[i].head, duration=overlap),
+                        0, overlap, overlap, seam, request, encode_preset, subtitle_path=subtitle_path,
+                    ):
+                        return False
+                    segments.append(seam)
+                segments.append(results[i].body)
+
+            # Join bodies and seams without re-encoding
+            concat_file = work_dir / "segments.txt"
+            concat_file.write_text("".join(f"file '{segment}'\n" for segment in segments))
+            video_path = work_dir / "video.mp4"
+            result = subprocess.run(
+                ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_file),
+                 "-c", "copy", str(video_path)],
+                capture_output=True, text=True
+            )
             if result.returncode != 0:
-                print(f"Image to video failed: {result.stderr}")
+                print(f"Chunk concat failed: {result.stderr[-2000:]}")
                 return False
 
-            return True
+            muxed = self.mux_audio_stem(video_path, audio_stem, output, timeline.duration)
+            video_path.unlink(missing_ok=True)
+            return muxed
         except Exception as e:
-            print(f"Image to video error: {e}")
+            print(f"Chunk join error: {e}")
             return False
 
     def create_capcut_draft(
@@ -692,8 +3120,14 @@ class VectCutProcessor:
         width: int,
         height: int,
         fps: int,
+        timeline: Optional[Timeline] = None,
     ) -> bool:
-        """Create CapCut/Jianying compatible draft folder structure."""
+        """Create CapCut/Jianying compatible draft folder structure.
+
+        With a timeline, segments are placed where they appear in the rendered film,
+        cut at the middle of each transition so the video track never overlaps, and
+        voiceovers are added as audio segments.
+        """
         try:
             # Create draft structure
             draft_dir = output_dir / "draft"
@@ -707,20 +3141,35 @@ class VectCutProcessor:
             audio_segments = []
             text_segments = []
 
-            timeline_offset = 0
-            for i, scene in enumerate(scenes):
-                duration_us = int(scene.duration * 1000000)
+            # (scene, source start, target start, duration) in seconds
+            if timeline:
+                placements = []
+                for segment in timeline.segments:
+                    start = segment.start + segment.overlap_in / 2
+                    end = segment.end - segment.overlap_out / 2
+                    placements.append((scenes[segment.scene_index], segment.overlap_in / 2, start, end - start))
+                timeline_offset = int(timeline.duration * 1000000)
+            else:
+                placements = []
+                position = 0.0
+                for scene in scenes:
+                    placements.append((scene, 0.0, position, scene.duration))
+                    position += scene.duration
+                timeline_offset = int(position * 1000000)
+
+            for scene, source_start, target_start, duration in placements:
+                duration_us = int(duration * 1000000)
 
                 # Video segment
                 video_segments.append({
                     "id": f"video_{scene.id}",
                     "material_id": f"material_{scene.id}",
                     "source_timerange": {
-                        "start": 0,
+                        "start": int(source_start * 1000000),
                         "duration": duration_us,
                     },
                     "target_timerange": {
-                        "start": timeline_offset,
+                        "start": int(target_start * 1000000),
                         "duration": duration_us,
                     },
                     "speed": 1.0,
@@ -728,8 +3177,6 @@ class VectCutProcessor:
                     "extra_material_refs": [],
                 })
 
-                timeline_offset += duration_us
-
             # Caption segments
             for caption in captions:
                 text_segments.append({
@@ -744,6 +3191,20 @@ class VectCutProcessor:
                     "position": caption.position,
                 })
 
+            # Voiceover segments
+            voiceovers = [a for a in timeline.audio if a.kind == "voiceover"] if timeline else []
+            for i, clip in enumerate(voiceovers):
+                audio_segments.append({
+                    "id": f"voiceover_{i}",
+                    "type": "voiceover",
+                    "source_url": clip.audio_url,
+                    "volume": clip.volume,
+                    "target_timerange": {
+                        "start": int(clip.start * 1000000),
+                        "duration": int((clip.end - clip.start) * 1000000),
+                    },
+                })
+
             # Music segment
             if music:
                 audio_segments.append({
@@ -794,7 +3255,7 @@ class VectCutProcessor:
                         "path": scene.video_url or scene.image_url,
                         "duration": int(scene.duration * 1000000),
                     }
-                    for scene in scenes
+                    for scene, _, _, _ in placements
                 ],
             }
 
@@ -817,12 +3278,16 @@ class VectCutProcessor:
             print(f"CapCut draft error: {e}")
             return False
 
-    @modal.method()
     def compose(
         self,
         request: VideoCompositionRequest,
+        progress: Optional[JobProgress] = None,
     ) -> VideoCompositionResponse:
-        """Main composition method."""
+        """Main composition method.
+
+        progress reports the stages of a submitted job; compose_job owns it and
+        records the job's final status.
+        """
         width, height = get_resolution(request.resolution)
 
         # Use quality-focused encoding preset
@@ -835,139 +3300,361 @@ class VectCutProcessor:
             encode_preset = "slow"  # <200 scenes: best quality
 
         print(f"Starting composition: {len(request.scenes)} scenes, {width}x{height}, preset={encode_preset}")
-
-        with tempfile.TemporaryDirectory() as temp_dir:
+        stats = {}
+        # Fallbacks that left out part of the requested output; such renders are not cached
+        degraded = []
+        scratch_budget = int(request.scratch_budget_gb * 1024**3) if request.scratch_budget_gb else SCRATCH_BUDGET_BYTES
+        # Fingerprint before anything below adjusts the request
+        output_cache = getattr(self, "output_cache", None) if request.use_cache else None
+        fingerprint = request_fingerprint(request)
+        with_draft = request.output_format in ["draft", "both"]
+        if request.render_mode == "distributed":
+            # Chunks come back as video only; all audio is mixed into one stem here
+            request = request.model_copy(update={"audio_engine": "numpy"})
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            MediaFetcher(Path(temp_dir) / "media") as fetcher,
+            ScratchSpace(Path(temp_dir), scratch_budget) as scratch,
+        ):
             temp_path = Path(temp_dir)
 
-            # Step 1: Download and prepare all scene videos
-            print("Step 1: Downloading scene media...")
-            scene_videos = []
-
-            for i, scene in enumerate(request.scenes):
-                print(f"  Processing scene {i+1}/{len(request.scenes)}: {scene.id}")
-
-                video_path = temp_path / f"scene_{i:03d}.mp4"
-                final_scene_path = temp_path / f"scene_final_{i:03d}.mp4"
-                scene_created = False
-
-                if scene.video_url:
-                    # Download video
-                    raw_path = temp_path / f"raw_{i:03d}.mp4"
-                    if download_media(scene.video_url, raw_path):
-                        # Normalize video format
-                        cmd = [
-                            "ffmpeg", "-y",
-                            "-i", str(raw_path),
-                            "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
-                            "-c:v", "libx264", "-preset", encode_preset, "-crf", "18",
-                            "-c:a", "aac", "-b:a", "256k",
-                            "-t", str(scene.duration),
-                            str(video_path)
-                        ]
-                        subprocess.run(cmd, capture_output=True)
-                        scene_created = True
-                    else:
-                        print(f"    Failed to download video for scene {i+1}")
-                        continue
-                elif scene.image_url:
-                    # Convert image to video (with Ken Burns effect if enabled)
-                    image_path = temp_path / f"image_{i:03d}.jpg"
-                    if download_media(scene.image_url, image_path):
-                        if self.image_to_video(
-                            image_path, video_path, scene.duration, width, height, request.fps,
-                            ken_burns=request.ken_burns_effect
-                        ):
-                            scene_created = True
-                        else:
-                            print(f"    Failed to convert image to video for scene {i+1}")
-                    else:
-                        print(f"    Failed to download image for scene {i+1}")
+            scene_cache = getattr(self, "scene_cache", None) if request.use_cache else None
+            if scene_cache or output_cache:
+                try:
+                    # Pick up clips and compositions cached by other containers
+                    cache_volume.reload()
+                except Exception as e:
+                    print(f"  Cache volume reload failed: {e}")
+
+            # Identical requests (retries, double submits) get the stored result back
+            if output_cache:
+                cached = output_cache.get(fingerprint, temp_path, with_draft)
+                stats["output_cache"] = {"hit": cached is not None}
+                if cached is not None:
+                    print(f"  Served from output cache: {fingerprint[:12]}")
+                    response = VideoCompositionResponse(
+                        status="complete", duration=cached["duration"], file_size=cached["file_size"], stats=stats,
+                        srt_content=cached["srt_content"] if request.include_srt else None,
+                        vtt_content=cached["vtt_content"] if request.include_vtt else None,
+                    )
+                    return self.deliver_outputs(
+                        request, response, temp_path / "final.mp4",
+                        temp_path / "capcut_draft.zip" if with_draft else None,
+                    )
+
+            # Stages finished by an earlier attempt of this job are restored, not redone; only
+            # jobs with an ID pay for copying their stages to the volume
+            checkpoint = None
+            job_checkpoint_dir = getattr(self, "job_checkpoint_dir", None)
+            if job_checkpoint_dir and request.job_id:
+                JobCheckpoint.expire(job_checkpoint_dir)
+                checkpoint = JobCheckpoint(job_checkpoint_dir, request.job_id, commit=cache_volume.commit)
+                if checkpoint.state:
+                    print(f"  Resuming job {request.job_id[:12]} from {len(checkpoint.state)} checkpointed stage(s)")
+
+            if scene_cache:
+                cache_before = scene_cache.stats()
+
+            # Step 1 (distributed): workers prepare and render contiguous chunks of scenes
+            chunk_plan = None
+            if request.render_mode == "distributed":
+                print("Step 1: Rendering chunks on workers...")
+                if progress:
+                    progress.stage("rendering_chunks", scene_count=scene_count)
+                chunk_plan = self.render_chunks(request, temp_path, encode_preset)
+                if chunk_plan:
+                    stats["distributed"] = {"chunks": len(chunk_plan[0]), "backend": DISTRIBUTED_BACKEND}
                 else:
-                    print(f"    No media for scene {i+1}")
-
-                # Add voiceovers to scene if available
-                if scene_created:
-                    if scene.voiceovers and len(scene.voiceovers) > 0:
-                        print(f"    Adding {len(scene.voiceovers)} voiceover(s) to scene {i+1} (strip_audio={scene.strip_original_audio})")
-                        self.add_voiceovers(
-                            video_path, final_scene_path, scene.voiceovers, 0,
-                            strip_original_audio=scene.strip_original_audio
+                    print("  Distributed render failed, preparing scenes locally")
+
+            if chunk_plan:
+                scene_videos = [clip for result in chunk_plan[1] for clip in result.clips]
+            else:
+                # Step 1: Download and prepare all scene videos
+                print("Step 1: Downloading scene media...")
+                # Start every download now so fetching overlaps with scene encoding
+                done_scenes = frozenset(
+                    i for i in range(len(request.scenes)) if checkpoint and checkpoint.has(f"scene_{i:03d}")
+                )
+                print(f"  Prefetching {fetcher.prefetch(request, done_scenes)} media file(s)")
+
+                workers, threads = get_pool_size(len(request.scenes))
+                print(f"  Preparing scenes with {workers} worker(s), {threads} thread(s) each")
+                if progress:
+                    progress.stage("preparing_scenes", scene_count=scene_count, scenes_done=0)
+
+                # Prepare scenes concurrently; results keep scene order, failed scenes are skipped.
+                # Scenes repeating the same media with the same parameters are encoded once
+                shared_clips = SharedClips()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    futures = [
+                        pool.submit(
+                            self.prepare_scene, i, scene, request, temp_path,
+                            width, height, encode_preset, threads, fetcher, checkpoint, shared_clips
                         )
-                        scene_videos.append((final_scene_path, scene.transition_to_next))
-                    elif scene.strip_original_audio:
-                        # Strip audio but no voiceovers
-                        print(f"    Stripping audio from scene {i+1}")
-                        self.add_voiceovers(video_path, final_scene_path, [], 0, strip_original_audio=True)
-                        scene_videos.append((final_scene_path, scene.transition_to_next))
-                    else:
-                        scene_videos.append((video_path, scene.transition_to_next))
+                        for i, scene in enumerate(request.scenes)
+                    ]
+                    scene_videos = []
+                    for i, future in enumerate(futures):
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            print(f"    Failed to prepare scene {i+1}: {e}")
+                            continue
+                        if result:
+                            scene_videos.append(result)
+                        if progress:
+                            progress.update(current_scene=i + 1, scenes_done=i + 1)
+                        try:
+                            scratch.check()
+                        except ScratchBudgetExceeded:
+                            for pending in futures:
+                                pending.cancel()
+                            raise
+
+                if checkpoint:
+                    checkpoint.flush()
+                stats["dedup"] = {"shared_scenes": shared_clips.shared, "duplicate_media": fetcher.duplicates}
+                if shared_clips.shared or fetcher.duplicates:
+                    print(f"  Deduplicated: {stats['dedup']}")
+
+            # Scene sources now live in the clips; free their downloads
+            audio_urls = {vo.audio_url for scene in request.scenes for vo in scene.voiceovers or []}
+            if request.music:
+                audio_urls.add(request.music.audio_url)
+            for scene in request.scenes:
+                media_url = scene.video_url or scene.image_url
+                if media_url and media_url not in audio_urls:
+                    fetcher.discard(media_url)
+
+            stats["passthrough_scenes"] = sum(clip.passthrough for clip in scene_videos)
+            if stats["passthrough_scenes"]:
+                print(f"  {stats['passthrough_scenes']} scene(s) passed through without re-encoding")
+
+            if scene_cache:
+                after = scene_cache.stats()
+                stats["scene_cache"] = {k: after[k] - cache_before[k] for k in after}
+                print(f"  Scene cache: {stats['scene_cache']}")
+                if stats["scene_cache"]["stored"]:
+                    cache_volume.commit()
 
             if not scene_videos:
                 return VideoCompositionResponse(
                     status="error",
                     error="No valid scene media could be processed"
                 )
+            if len(scene_videos) < len(request.scenes):
+                degraded.append("skipped_scenes")
+            if any(clip.degraded for clip in scene_videos):
+                degraded.append("voiceovers")
 
-            # Step 2: Compose videos with transitions
-            print(f"Step 2: Composing {len(scene_videos)} scenes with transitions...")
+            # Apply audio_settings to music if provided
+            if request.music and request.audio_settings:
+                request.music.volume = request.audio_settings.music_volume
+                request.music.fade_in = request.audio_settings.fade_in
+                request.music.fade_out = request.audio_settings.fade_out
 
-            if len(scene_videos) == 1:
-                composed_path = scene_videos[0][0]
-            else:
-                # Iteratively apply transitions
-                composed_path = scene_videos[0][0]
-
-                for i in range(1, len(scene_videos)):
-                    next_video, _ = scene_videos[i]
-                    # Use scene-specific transition or fall back to global transition_style
-                    prev_transition = scene_videos[i-1][1] or request.transition_style
-
-                    output_path = temp_path / f"composed_{i:03d}.mp4"
-
-                    if prev_transition and prev_transition != "none":
-                        print(f"  Applying {prev_transition} transition between scene {i} and {i+1}")
-                        self.apply_transition(
-                            composed_path, next_video, output_path,
-                            prev_transition, transition_duration=request.transition_duration,
-                            encode_preset=encode_preset
-                        )
-                    else:
-                        self.simple_concat([composed_path, next_video], output_path)
-
-                    composed_path = output_path
-
-            # Step 3: Burn in captions
-            print("Step 3: Burning in captions...")
-            captioned_path = temp_path / "captioned.mp4"
-            self.burn_captions(
-                composed_path, captioned_path, request.captions, width, height,
-                caption_style=request.caption_style
-            )
-
-            # Step 4: Add music
             final_path = temp_path / "final.mp4"
-            if request.music:
-                print("Step 4: Adding background music...")
-                # Apply audio_settings to music if provided
-                if request.audio_settings:
-                    request.music.volume = request.audio_settings.music_volume
-                    request.music.fade_in = request.audio_settings.fade_in
-                    request.music.fade_out = request.audio_settings.fade_out
-
-                # Get video duration
-                probe = subprocess.run(
-                    ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-                     "-of", "default=noprint_wrappers=1:nokey=1", str(captioned_path)],
-                    capture_output=True, text=True
+            rendered = False
+            video_url = None
+
+            # Lay out segments, captions and audio once; later steps read timings from here
+            timeline = build_timeline(scene_videos, request)
+            print(f"  Timeline: {len(timeline.segments)} segments, {timeline.duration:.2f}s")
+
+            # Soft captions are muxed as a subtitle track at the end instead of drawn into the video
+            soft_captions = request.caption_mode == "soft" and bool(timeline.captions)
+            render_timeline = timeline.model_copy(update={"captions": []}) if soft_captions else timeline
+
+            music_path = None
+            if request.music and (
+                request.render_mode != "iterative" or request.audio_engine == "numpy" or request.stage_io == "pipes"
+            ):
+                music_path = temp_path / "music.mp3"
+                if not fetcher.fetch(request.music.audio_url, music_path):
+                    music_path = None
+                    degraded.append("music")
+
+            # Mix every audio source once; the renderers only mux the stem
+            audio_stem = None
+            if request.audio_engine == "numpy":
+                print("Step 2a: Mixing audio stem...")
+                if progress:
+                    progress.stage("mixing_audio")
+                audio_stem = temp_path / "audio_stem.f32"
+                dropped = []
+                if not self.render_audio_stem(
+                    scene_videos, timeline, audio_stem, request, fetcher=fetcher, music_path=music_path,
+                    dropped=dropped
+                ):
+                    return VideoCompositionResponse(status="error", error="Audio mixing failed")
+                if dropped:
+                    degraded.append("audio_sources")
+                scratch.check()
+
+            if chunk_plan:
+                # Steps 2-4: chunks already hold transitions and captions; render the seams between
+                # them, join everything by stream copy and mux the stem
+                print(f"Step 2: Joining {len(chunk_plan[0])} rendered chunk(s)...")
+                if progress:
+                    progress.stage("joining_chunks", chunks=len(chunk_plan[0]))
+                rendered = self.join_chunks(
+                    *chunk_plan, render_timeline, final_path, request, width, height, encode_preset, audio_stem
                 )
-                video_duration = float(probe.stdout.strip()) if probe.stdout.strip() else sum(s.duration for s in request.scenes)
-                self.add_music(captioned_path, final_path, request.music, video_duration)
-            else:
-                subprocess.run(["cp", str(captioned_path), str(final_path)])
+                if DISTRIBUTED_BACKEND != "local":
+                    shutil.rmtree(chunk_plan[0][0].output_dir.parent, ignore_errors=True)
+                    cache_volume.commit()
+                if not rendered:
+                    return VideoCompositionResponse(status="error", error="Joining rendered chunks failed")
+
+            # A distributed render whose chunks failed is rendered here in a single pass
+            if not rendered and request.render_mode in ("single_pass", "smart", "distributed"):
+                if request.render_mode != "smart":
+                    # Steps 2-4 in one ffmpeg run: transitions, captions and music
+                    print(f"Step 2: Rendering {len(scene_videos)} scenes in a single pass...")
+                    if progress:
+                        progress.stage("rendering", mode="single_pass")
+                    # Nothing rewrites the single-pass output, so it can go to S3 while it encodes
+                    streamed_upload = None
+                    if s3_configured(request) and request.output_format in ["mp4", "both"] and not soft_captions:
+                        try:
+                            streamed_upload = S3StreamingUpload(
+                                final_path, f"compositions/{request.project_id}/final.mp4", request
+                            )
+                        except Exception as e:
+                            print(f"  S3 streaming upload unavailable: {e}")
+                    rendered = self.render_single_pass(
+                        scene_videos, render_timeline, final_path, request, width, height,
+                        encode_preset=encode_preset, music_path=music_path, audio_stem=audio_stem,
+                        progress=progress, fragmented=streamed_upload is not None
+                    )
+                    if streamed_upload:
+                        video_url = streamed_upload.finish(rendered)
+                    if not rendered:
+                        print("  Single-pass render failed, falling back to iterative composition")
+                else:
+                    # Steps 2-4: re-encode transition windows and captioned spans only, mix audio
+                    # separately; the project's previous render supplies unchanged segments
+                    print(f"Step 2: Smart rendering {len(scene_videos)} scenes...")
+                    if progress:
+                        progress.stage("rendering", mode="smart")
+                    project_cache_dir = getattr(self, "project_cache_dir", None) if request.use_cache else None
+                    manifest = RenderManifest(project_cache_dir, request.project_id) if project_cache_dir else None
+                    rendered = self.render_smart(
+                        scene_videos, render_timeline, final_path, request,
+                        encode_preset=encode_preset, music_path=music_path, audio_stem=audio_stem,
+                        manifest=manifest
+                    )
+                    if manifest:
+                        stats["segments"] = manifest.stats()
+                        cache_volume.commit()
+                    if not rendered:
+                        print("  Smart render failed, falling back to iterative composition")
+
+            if not rendered and request.stage_io == "pipes":
+                # Steps 2-4 with the last transition, captions and music streamed through pipes
+                print(f"Step 2: Composing {len(scene_videos)} scenes through a pipeline...")
+                if progress:
+                    progress.stage("rendering", mode="piped")
+                rendered = self.render_piped(
+                    scene_videos, render_timeline, final_path, request, width, height,
+                    encode_preset=encode_preset, music_path=music_path, audio_stem=audio_stem,
+                    scratch=scratch, checkpoint=checkpoint, progress=progress
+                )
+                if not rendered:
+                    print("  Piped composition failed, falling back to file stages")
+
+            if not rendered:
+                mezzanine = use_mezzanine(request)
+                restored = checkpoint.get("captioned", temp_path) if checkpoint else None
+                if restored:
+                    # Steps 2 and 3 finished in an earlier attempt
+                    print("Steps 2-3: Captioned film restored from checkpoint")
+                    captioned_path = restored["clips"][0].path
+                else:
+                    # Step 2: Compose videos with transitions
+                    print(f"Step 2: Composing {len(scene_videos)} scenes with transitions...")
+                    if progress:
+                        progress.stage("merging", scene_count=len(scene_videos))
+
+                    if len(scene_videos) == 1:
+                        composed_path = scene_videos[0].path
+                    else:
+                        # Merge scenes in a balanced tree of parallel pairwise transitions
+                        composed_path = self.merge_tree(
+                            scene_videos, temp_path, request, encode_preset,
+                            scratch=scratch, checkpoint=checkpoint, progress=progress
+                        )[0].path
+
+                    # Step 3: Burn in captions
+                    captioned_path = composed_path
+                    if render_timeline.captions:
+                        print("Step 3: Burning in captions...")
+                        if progress:
+                            progress.stage("captions")
+                        captioned_path = stage_path(temp_path / "captioned.mp4", mezzanine)
+                        if not self.burn_captions(
+                            composed_path, captioned_path, render_timeline.captions, width, height,
+                            caption_style=request.caption_style, mezzanine=mezzanine
+                        ):
+                            degraded.append("captions")
+                        composed_path.unlink(missing_ok=True)
+                        if checkpoint and "captions" not in degraded:
+                            checkpoint.put("captioned", [SceneClip(path=captioned_path, duration=timeline.duration)])
+
+                # Step 4: Add music; mezzanine video gets its one delivery encode here
+                video_args = video_codec_args(encode_preset) if mezzanine else None
+                if audio_stem:
+                    print("Step 4: Adding audio stem...")
+                    if progress:
+                        progress.stage("audio_mux")
+                    if not self.mux_audio_stem(
+                        captioned_path, audio_stem, final_path, timeline.duration,
+                        video_args=video_args, progress=progress
+                    ):
+                        degraded.append("audio")
+                        if mezzanine:
+                            self.encode_output(captioned_path, final_path, encode_preset)
+                        else:
+                            subprocess.run(["cp", str(captioned_path), str(final_path)])
+                elif request.music:
+                    print("Step 4: Adding background music...")
+                    if progress:
+                        progress.stage("audio_mux")
+                    if not self.add_music(
+                        captioned_path, final_path, request.music, timeline.duration,
+                        fetcher=fetcher, video_args=video_args
+                    ):
+                        degraded.append("music")
+                elif mezzanine:
+                    self.encode_output(captioned_path, final_path, encode_preset)
+                else:
+                    subprocess.run(["cp", str(captioned_path), str(final_path)])
+                captioned_path.unlink(missing_ok=True)
+
+            # Only the final video is needed from here on
+            for clip in scene_videos:
+                clip.path.unlink(missing_ok=True)
+            if audio_stem:
+                audio_stem.unlink(missing_ok=True)
+
+            if soft_captions:
+                print("Step 3: Adding subtitle track...")
+                subtitled_path = temp_path / "subtitled.mp4"
+                if self.mux_subtitles(final_path, subtitled_path, timeline.captions):
+                    os.replace(subtitled_path, final_path)
+                else:
+                    degraded.append("subtitles")
+
+            stats["scratch"] = scratch.stats()
+            print(f"  Peak scratch usage: {stats['scratch']['peak_bytes'] / 1024**2:.1f} MB")
 
             # Step 5: Generate outputs
             print("Step 5: Generating outputs...")
-            response = VideoCompositionResponse(status="complete")
+            if progress:
+                progress.stage("outputs")
+            response = VideoCompositionResponse(status="complete", stats=stats)
 
             # Get final video info
             probe = subprocess.run(
@@ -980,30 +3667,23 @@ class VectCutProcessor:
                 response.duration = float(info.get("format", {}).get("duration", 0))
                 response.file_size = int(info.get("format", {}).get("size", 0))
 
-            # Generate SRT
-            if request.include_srt and request.captions:
-                response.srt_content = generate_srt(request.captions)
-
-            # Upload or encode video
-            if request.output_format in ["mp4", "both"]:
-                s3_key = f"compositions/{request.project_id}/final.mp4"
-                video_url = upload_to_s3(final_path, s3_key, request)
-
-                if video_url:
-                    response.video_url = video_url
-                else:
-                    # Return as base64
-                    with open(final_path, "rb") as f:
-                        response.video_base64 = base64.b64encode(f.read()).decode("utf-8")
-
-            # Create and upload CapCut draft
-            if request.output_format in ["draft", "both"]:
+            # Generate SRT and WebVTT
+            srt_content = generate_srt(timeline.captions) if request.captions else None
+            vtt_content = generate_vtt(timeline.captions) if request.captions else None
+            if request.include_srt:
+                response.srt_content = srt_content
+            if request.include_vtt:
+                response.vtt_content = vtt_content
+
+            # Create the CapCut draft
+            draft_zip = None
+            if with_draft:
                 draft_dir = temp_path / "capcut_draft"
                 draft_dir.mkdir(exist_ok=True)
 
                 self.create_capcut_draft(
-                    request.scenes, request.captions, request.music,
-                    draft_dir, width, height, request.fps
+                    request.scenes, timeline.captions, request.music,
+                    draft_dir, width, height, request.fps, timeline=timeline
                 )
 
                 # Zip the draft folder
@@ -1013,18 +3693,316 @@ class VectCutProcessor:
                         if file.is_file():
                             zf.write(file, file.relative_to(draft_dir))
 
-                s3_key = f"compositions/{request.project_id}/capcut_draft.zip"
-                draft_url = upload_to_s3(draft_zip, s3_key, request)
-
-                if draft_url:
-                    response.draft_url = draft_url
-                else:
-                    with open(draft_zip, "rb") as f:
-                        response.draft_base64 = base64.b64encode(f.read()).decode("utf-8")
+            # The job is done; its checkpoints are no longer needed
+            if checkpoint:
+                response.stats["checkpoint"] = {"restored_stages": checkpoint.restored}
+                checkpoint.clear()
+
+            if degraded:
+                stats["degraded"] = degraded
+                print(f"  Fallbacks left out: {', '.join(degraded)}")
+            if output_cache and not degraded:
+                output_cache.put(
+                    fingerprint, [final_path, draft_zip] if draft_zip else [final_path],
+                    {
+                        "duration": response.duration, "file_size": response.file_size,
+                        "srt_content": srt_content, "vtt_content": vtt_content,
+                    },
+                )
+                cache_volume.commit()
 
+            response = self.deliver_outputs(request, response, final_path, draft_zip, video_url=video_url)
             print(f"Composition complete! Duration: {response.duration}s, Size: {response.file_size} bytes")
             return response
 
+    def deliver_outputs(
+        self,
+        request: VideoCompositionRequest,
+        response: VideoCompositionResponse,
+        final_path: Path,
+        draft_zip: Optional[Path] = None,
+        video_url: Optional[str] = None,
+    ) -> VideoCompositionResponse:
+        """Upload the final video and draft zip to S3, or store them for download or inline them as base64.
+
+        Outputs are uploaded concurrently; video_url is the URL of a final video
+        already streamed to S3 while it was encoded.
+        """
+        # Outputs still to deliver, by response field prefix
+        outputs = {}
+        if request.output_format in ["mp4", "both"]:
+            if video_url:
+                response.video_url = video_url
+            else:
+                outputs["video"] = (final_path, f"compositions/{request.project_id}/final.mp4")
+        if draft_zip:
+            outputs["draft"] = (draft_zip, f"compositions/{request.project_id}/capcut_draft.zip")
+
+        # Files S3 did not take
+        pending = {}
+        if outputs and s3_configured(request):
+            with ThreadPoolExecutor(max_workers=len(outputs)) as pool:
+                urls = dict(zip(outputs, pool.map(lambda output: upload_to_s3(*output, request), outputs.values())))
+            for field, url in urls.items():
+                if url:
+                    setattr(response, f"{field}_url", url)
+                else:
+                    pending[field] = outputs[field][0]
+        else:
+            pending = {field: path for field, (path, _) in outputs.items()}
+
+        artifact_store = getattr(self, "artifact_store", None)
+        if pending and request.delivery == "download" and artifact_store:
+            # Keep the files on the volume; the response only carries their handles
+            try:
+                handles = artifact_store.put(list(pending.values()))
+                cache_volume.commit()
+                for field, handle in zip(pending, handles):
+                    setattr(response, f"{field}_handle", handle)
+                pending = {}
+            except OSError as e:
+                print(f"Artifact store failed, returning base64: {e}")
+
+        for field, path in pending.items():
+            # Return as base64
+            with open(path, "rb") as f:
+                setattr(response, f"{field}_base64", base64.b64encode(f.read()).decode("utf-8"))
+
+        return response
+
+
+def render_chunk(
+    request: VideoCompositionRequest,
+    chunk: RenderChunk,
+    processor: Optional[MediaProcessor] = None,
+) -> Optional[ChunkResult]:
+    """Prepare a chunk's scenes and render its part of the film.
+
+    The body covers the chunk's scenes and inner transitions without the overlaps
+    shared with the neighbouring chunks, and is encoded like the smart-render
+    windows so bodies and seams join by stream copy. The overlaps are written as
+    lossless head and tail pieces for the coordinator's seam transitions, and scene
+    audio as audio-only files for its stem. Outputs go to chunk.output_dir.
+    Both distributed backends call this; without a processor, scenes are prepared
+    by a plain MediaProcessor that has no scene cache.
+    """
+    processor = processor or MediaProcessor()
+    width, height = get_resolution(request.resolution)
+    fps = request.fps
+    print(f"Chunk {chunk.index}: preparing scenes {chunk.scene_start + 1}-{chunk.scene_end}")
+    chunk.output_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            MediaFetcher(Path(temp_dir) / "media") as fetcher,
+        ):
+            temp_path = Path(temp_dir)
+            indices = range(chunk.scene_start, chunk.scene_end)
+            workers, threads = get_pool_size(len(indices))
+            shared_clips = SharedClips()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                clips = list(pool.map(
+                    lambda i: processor.prepare_scene(
+                        i, request.scenes[i], request, temp_path, width, height,
+                        chunk.encode_preset, threads, fetcher, shared_clips=shared_clips
+                    ),
+                    indices,
+                ))
+            if not all(clips):
+                # Skipping a scene would shift every later chunk, so the chunk fails as a whole
+                print(f"Chunk {chunk.index}: scene preparation failed")
+                return None
+
+            timeline = build_timeline(clips, request)
+            head_frames = round(chunk.overlap_in * fps)
+            tail_frames = round(chunk.overlap_out * fps)
+            end_frame = round(timeline.duration * fps) - tail_frames
+            if end_frame <= head_frames:
+                print(f"Chunk {chunk.index}: no frames between the seams")
+                return None
+
+            # Body: the chunk's transitions in one graph, trimmed to the frames between the seams
+            graph = build_render_graph(
+                clips, timeline.model_copy(update={"captions": []}), request, width, height, include_audio=False
+            )
+            # Trimmed by time at half-frame marks rather than by frame count, so a frame
+            # xfade drops at the end of a transition can't shift the cut past the seam
+            body_filter = (
+                f"[vout]trim=start={(head_frames - 0.5) / fps:.6f}:end={(end_frame - 0.5) / fps:.6f},"
+                "setpts=PTS-STARTPTS"
+            )
+            if chunk.captions:
+                subtitle_path = temp_path / "captions.ass"
+                subtitle_path.write_text(
+                    build_ass_subtitles(chunk.captions, width, height, request.caption_style),
+                    encoding="utf-8",
+                )
+                body_filter += f",{ass_filter(subtitle_path)}"
+            script_path = temp_path / "render_graph.txt"
+            script_path.write_text(f"{graph.filter_script};\n{body_filter}[body]")
+
+            body_path = chunk.output_dir / "body.mp4"
+            cmd = [
+                "ffmpeg", "-y",
+                *graph.input_args,
+                "-filter_complex_script", str(script_path),
+                "-map", "[body]", "-an",
+                "-c:v", "libx264", "-preset", chunk.encode_preset, "-crf", "18",
+                *keyframe_args(fps, request.transition_duration),
+                str(body_path)
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"Chunk {chunk.index} render failed: {result.stderr[-2000:]}")
+                return None
+
+            def piece(clip: SceneClip, name: str, start: float, frames: int) -> Optional[Path]:
+                piece_path = chunk.output_dir / f"{name}.mkv"
+                cmd = [
+                    "ffmpeg", "-y",
+                    "-ss", f"{start:.6f}", "-i", str(clip.path),
+                    "-map", "0:v:0", "-frames:v", str(frames),
+                    *video_codec_args(mezzanine=True),
+                    str(piece_path)
+                ]
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"Chunk {chunk.index} {name} piece failed: {result.stderr[-2000:]}")
+                    return None
+                return piece_path
+
+            head = tail = None
+            if head_frames and not (head := piece(clips[0], "head", 0, head_frames)):
+                return None
+            if tail_frames and not (tail := piece(
+                clips[-1], "tail", clips[-1].duration - chunk.overlap_out, tail_frames
+            )):
+                return None
+
+            # Scene audio goes back as audio-only files; the coordinator mixes the whole stem
+            audio_clips = []
+            for clip in clips:
+                audio_path = chunk.output_dir / f"audio_{clip.scene_index:03d}.mka"
+                if clip.has_audio and not request.scenes[clip.scene_index].strip_original_audio:
+                    result = subprocess.run(
+                        ["ffmpeg", "-y", "-i", str(clip.path), "-map", "0:a:0", "-c:a", "copy", str(audio_path)],
+                        capture_output=True, text=True
+                    )
+                    if result.returncode != 0:
+                        print(f"Chunk {chunk.index} audio extract failed: {result.stderr[-2000:]}")
+                        return None
+                audio_clips.append(clip.model_copy(update={"path": audio_path, "passthrough": False}))
+
+            print(f"Chunk {chunk.index}: rendered {(end_frame - head_frames) / fps:.2f}s")
+            return ChunkResult(index=chunk.index, body=body_path, head=head, tail=tail, clips=audio_clips)
+    except Exception as e:
+        print(f"Chunk {chunk.index} error: {e}")
+        return None
+
+
+def plan_render_chunks(
+    request: VideoCompositionRequest,
+    chunk_root: Path,
+    encode_preset: str,
+) -> list[RenderChunk]:
+    """Plan the distributed render's chunks, each writing to a directory under chunk_root.
+
+    Chunks are planned on the timeline the request describes with every scene
+    present, so the workers can be given their seams and captions up front.
+    """
+    planned = [
+        SceneClip(path=Path(), duration=scene.duration, transition_to_next=scene.transition_to_next, scene_index=i)
+        for i, scene in enumerate(request.scenes)
+    ]
+    timeline = build_timeline(planned, request)
+    chunk_count = request.render_workers or math.ceil(len(planned) / DISTRIBUTED_CHUNK_SCENES)
+    ranges = plan_chunks(timeline, chunk_count)
+
+    chunks = []
+    for index, (start, end) in enumerate(ranges):
+        body_start = timeline.segments[start].start + timeline.segments[start].overlap_in
+        body_end = timeline.segments[end - 1].end - timeline.segments[end - 1].overlap_out
+        chunks.append(RenderChunk(
+            index=index, scene_start=start, scene_end=end,
+            overlap_in=timeline.segments[start].overlap_in if start > 0 else 0,
+            overlap_out=timeline.segments[end - 1].overlap_out if end < len(planned) else 0,
+            captions=captions_between(timeline.captions, body_start, body_end)
+            if request.caption_mode == "burned" else [],
+            encode_preset=encode_preset, output_dir=chunk_root / f"chunk_{index:03d}",
+        ))
+    return chunks
+
+
+def render_chunks_local(request: VideoCompositionRequest, chunks: list[RenderChunk]) -> list[Optional[ChunkResult]]:
+    """Render chunks on the local backend, one spawned worker process per chunk."""
+    with ProcessPoolExecutor(max_workers=len(chunks), mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(render_chunk, [request] * len(chunks), chunks))
+
+
+@app.cls(
+    image=image,
+    gpu="T4",  # Light GPU for video encoding
+    cpu=CONTAINER_CPUS,  # Parallel scene preparation
+    volumes={"/cache": cache_volume},
+    timeout=14400,  # 4 hours for very long videos with slow preset (360+ scenes)
+    scaledown_window=180,
+)
+class VectCutProcessor(MediaProcessor):
+    """Video composition processor using VectCutAPI and ffmpeg."""
+
+    @modal.enter()
+    def setup(self):
+        """Initialize processor when container starts."""
+        print("VectCutProcessor initializing...")
+
+        # Verify ffmpeg is available
+        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+        print(f"FFmpeg version: {result.stdout.split(chr(10))[0]}")
+
+        # Create working directories
+        os.makedirs("/cache/temp", exist_ok=True)
+        os.makedirs("/cache/output", exist_ok=True)
+
+        self.scene_cache = SceneCache(Path(SCENE_CACHE_DIR))
+        self.output_cache = OutputCache(Path(OUTPUT_CACHE_DIR))
+        self.project_cache_dir = Path(PROJECT_CACHE_DIR)
+        self.job_checkpoint_dir = Path(JOB_CHECKPOINT_DIR)
+        self.artifact_store = ArtifactStore(Path(ARTIFACT_DIR))
+
+        print("VectCutProcessor ready!")
+
+    @modal.method()
+    def render_chunk_remote(self, request: VideoCompositionRequest, chunk: RenderChunk) -> Optional[ChunkResult]:
+        """Render one chunk on its own container, handing outputs back through the cache volume."""
+        try:
+            cache_volume.reload()
+        except Exception as e:
+            print(f"  Cache volume reload failed: {e}")
+        result = render_chunk(request, chunk, self)
+        # Commits the chunk outputs and any scene clips cached on the way
+        cache_volume.commit()
+        return result
+
+    def dispatch_chunks(
+        self, request: VideoCompositionRequest, chunks: list[RenderChunk]
+    ) -> list[Optional[ChunkResult]]:
+        """Render planned chunks on the configured backend, one worker container per chunk on Modal."""
+        if DISTRIBUTED_BACKEND == "local":
+            return super().dispatch_chunks(request, chunks)
+        results = list(self.render_chunk_remote.map([request] * len(chunks), chunks))
+        cache_volume.reload()
+        return results
+
+    @modal.method()
+    def compose(
+        self,
+        request: VideoCompositionRequest,
+        progress: Optional[JobProgress] = None,
+    ) -> VideoCompositionResponse:
+        """Compose a film on the Modal container."""
+        return super().compose(request, progress)
+
     @modal.fastapi_endpoint(method="POST")
     def api(self, request: VideoCompositionRequest) -> VideoCompositionResponse:
         """FastAPI endpoint for video composition."""
@@ -1040,6 +4018,176 @@ class VectCutProcessor:
                 error=str(e)
             )
 
+    @modal.fastapi_endpoint(method="POST")
+    async def api_upload(self, request: "Request") -> VideoCompositionResponse:
+        """Composition endpoint taking multipart/form-data, for projects with large inline media.
+
+        The "request" field holds the VideoCompositionRequest JSON, whose media URLs
+        may name other parts as "part:<field name>". Media parts are streamed to the
+        intake directory on the volume, base64 data URLs decoded on the way, so the
+        request's memory stays bounded by the form parser's spool size, whatever the
+        size of the project.
+        """
+        try:
+            async with request.form() as form:
+                field = form.get("request")
+                if field is None:
+                    raise ValueError('Missing "request" field')
+                if isinstance(field, UploadFile):
+                    field = await field.read()
+                composition = VideoCompositionRequest.model_validate_json(field)
+
+                root = Path(UPLOAD_DIR)
+                expire_uploads(root)
+                uploads = {}
+                for name, part in form.multi_items():
+                    if name != "request" and isinstance(part, UploadFile):
+                        uploads[name] = await run_in_threadpool(store_upload, part.file, root)
+            print(f"Received {len(uploads)} media part(s) for {composition.project_id}")
+            resolve_parts(composition, uploads)
+            # Chunk workers and spawned jobs read uploads from the volume
+            cache_volume.commit()
+        except Exception as e:
+            print(f"Upload intake error: {e}")
+            return VideoCompositionResponse(status="error", error=f"Invalid upload: {e}")
+
+        print(f"API request: {composition.project_id}, {len(composition.scenes)} scenes")
+        try:
+            return await run_in_threadpool(self.compose.local, composition)
+        except Exception as e:
+            print(f"Composition error: {e}")
+            return VideoCompositionResponse(
+                status="error",
+                error=str(e)
+            )
+
+    @modal.method()
+    def compose_job(self, request: VideoCompositionRequest) -> VideoCompositionResponse:
+        """Run a submitted composition, record its final status and call back its client."""
+        print(f"Job {request.job_id[:12]}: {request.project_id}, {len(request.scenes)} scenes")
+        progress = JobProgress(job_store, request.job_id)
+        try:
+            response = self.compose.local(request, progress=progress)
+        except Exception as e:
+            print(f"Composition error: {e}")
+            response = VideoCompositionResponse(status="error", error=str(e))
+
+        # The status record carries everything but the inline payloads, which only the result holds
+        summary = response.model_dump(mode="json", exclude={"video_base64", "draft_base64", "srt_content", "vtt_content"})
+        record = progress.finish(response.status, stage=None, progress={}, response=summary)
+        if request.callback_url:
+            try:
+                get_http_session().post(request.callback_url, json=record, timeout=CALLBACK_TIMEOUT)
+            except Exception as e:
+                print(f"  Completion callback failed: {e}")
+        return response
+
+
+def job_call_pending(job_id: str) -> bool:
+    """Check whether a submitted job's spawned call is still queued or running."""
+    call_id = job_store.get(f"call:{job_id}")
+    if call_id is None:
+        return False
+    try:
+        modal.FunctionCall.from_id(call_id).get(timeout=0)
+    except (TimeoutError, modal.exception.TimeoutError):
+        return True
+    except Exception:
+        # The call crashed or its result expired
+        return False
+    return False
+
+
+@app.function(image=image)
+@modal.concurrent(max_inputs=100)
+@modal.fastapi_endpoint(method="POST")
+def submit(request: VideoCompositionRequest) -> dict:
+    """Start a composition in the background and return its job record for polling.
+
+    The job ID is request.job_id or the request fingerprint, so resubmitting a job
+    that is still queued or running returns that job instead of starting another,
+    while resubmitting one whose container died resumes it from its checkpoints.
+    """
+    job_id = request.job_id or request_fingerprint(request)
+    record = job_store.get(job_id)
+    if record and record["status"] in ("queued", "running") and job_call_pending(job_id):
+        return record
+
+    record = {"job_id": job_id, "status": "queued", "stage": None, "progress": {}, "submitted_at": time.time()}
+    job_store[job_id] = record
+    call = VectCutProcessor().compose_job.spawn(request.model_copy(update={"job_id": job_id}))
+    job_store[f"call:{job_id}"] = call.object_id
+    print(f"Submitted job {job_id[:12]}: {request.project_id}, {len(request.scenes)} scenes")
+    return record
+
+
+@app.function(image=image)
+@modal.concurrent(max_inputs=100)
+@modal.fastapi_endpoint(method="GET")
+def status(job_id: str) -> dict:
+    """Return a job's status record: its stage and progress while running, its summary when done."""
+    record = job_store.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return record
+
+
+@app.function(image=image)
+@modal.concurrent(max_inputs=100)
+@modal.fastapi_endpoint(method="GET")
+def result(job_id: str) -> VideoCompositionResponse:
+    """Return a finished job's composition response, or its status while it is still running."""
+    call_id = job_store.get(f"call:{job_id}")
+    if call_id is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    try:
+        return modal.FunctionCall.from_id(call_id).get(timeout=0)
+    except (TimeoutError, modal.exception.TimeoutError):
+        record = job_store.get(job_id) or {}
+        return VideoCompositionResponse(
+            status=record.get("status", "queued"),
+            stats={"stage": record.get("stage"), "progress": record.get("progress", {})},
+        )
+
+
+@app.function(image=image, volumes={"/cache": cache_volume})
+@modal.concurrent(max_inputs=100)
+@modal.fastapi_endpoint(method="GET")
+def download(handle: str, request: "Request"):
+    """Stream a stored video or draft zip by its handle, honouring single-range requests."""
+    path = ArtifactStore(Path(ARTIFACT_DIR)).path(handle)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown artifact: {handle}")
+    if not path.exists():
+        # Stored by a container after this one last saw the volume
+        try:
+            cache_volume.reload()
+        except Exception as e:
+            print(f"  Cache volume reload failed: {e}")
+        if not path.exists():
+            raise HTTPException(status_code=404, detail=f"Unknown artifact: {handle}")
+
+    size = path.stat().st_size
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), size)
+    except ValueError:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    start, end = byte_range or (0, size - 1)
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f'attachment; filename="{path.name}"',
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        read_file_range(path, start, end),
+        status_code=206 if byte_range else 200,
+        media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+        headers=headers,
+    )
+
 
 @app.local_entrypoint()
 def main():
@@ -1099,3 +4247,48 @@ def main():
 
     if result.error:
         print(f"Error: {result.error}")
+
+
+@app.function(image=image, timeout=14400)
+def benchmark(render_mode: str = "iterative", scene_count: int = 6, resolution: str = "hd") -> dict:
+    """Compare wall-clock time of delivery and mezzanine intermediates.
+
+    Both arms bypass the scene, output and segment caches, so every run renders
+    from scratch.
+
+    Run: modal run modal/vectcut_processor.py::benchmark --render-mode iterative
+    """
+    processor = VectCutProcessor()
+
+    scenes = [
+        SceneData(
+            id=f"scene{i + 1}",
+            image_url=f"https://picsum.photos/seed/{i}/1920/1080",
+            duration=4.0,
+        )
+        for i in range(scene_count)
+    ]
+    captions = [
+        CaptionData(text=f"Caption {i + 1}", start_time=i * 3.0 + 0.5, end_time=i * 3.0 + 2.5)
+        for i in range(scene_count)
+    ]
+
+    timings = {}
+    for intermediate_format in ("delivery", "mezzanine"):
+        request = VideoCompositionRequest(
+            project_id="benchmark",
+            scenes=scenes,
+            captions=captions,
+            output_format="mp4",
+            resolution=resolution,
+            render_mode=render_mode,
+            intermediate_format=intermediate_format,
+            use_cache=False,
+        )
+        start = time.time()
+        result = processor.compose.remote(request)
+        timings[intermediate_format] = time.time() - start
+        print(f"{intermediate_format}: {result.status}, {timings[intermediate_format]:.1f}s, {result.file_size} bytes")
+
+    print(f"Mezzanine speedup: {timings['delivery'] / timings['mezzanine']:.2f}x")
+    return timings
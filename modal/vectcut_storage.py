@@ -0,0 +1,225 @@
+"""Delivery storage: S3 uploads and the artifacts served by the download endpoint."""
+import os
+import time
+import shutil
+import secrets
+import threading
+from pathlib import Path
+from typing import Optional
+
+from vectcut_models import VideoCompositionRequest
+
+
+# S3 upload tuning
+S3_PART_SIZE = int(float(os.environ.get("VECTCUT_S3_PART_MB", "16")) * 1024**2)  # Multipart part size, 5 MB minimum
+S3_MAX_CONCURRENCY = int(os.environ.get("VECTCUT_S3_CONCURRENCY", "10"))  # Parallel parts per file
+S3_POLL_INTERVAL = 0.5  # Seconds between size checks of a file still being written
+
+_s3_clients: dict[tuple, object] = {}
+_s3_lock = threading.Lock()
+
+
+def s3_configured(request: VideoCompositionRequest) -> bool:
+    """Check whether a request carries S3 credentials for its results."""
+    return all([request.s3_bucket, request.s3_access_key, request.s3_secret_key])
+
+
+def get_s3_client(request: VideoCompositionRequest):
+    """Get the shared S3 client for a request's credentials and endpoint.
+
+    boto3 clients are thread-safe, so one client per credential set serves every
+    upload of the container, reusing its connection pool.
+    """
+    import boto3
+    from botocore.config import Config
+
+    key = (request.s3_region, request.s3_access_key, request.s3_secret_key, request.s3_endpoint_url)
+    with _s3_lock:
+        client = _s3_clients.get(key)
+        if client is None:
+            client = boto3.client(
+                "s3",
+                region_name=request.s3_region or "us-east-1",
+                endpoint_url=request.s3_endpoint_url,
+                aws_access_key_id=request.s3_access_key,
+                aws_secret_access_key=request.s3_secret_key,
+                config=Config(max_pool_connections=S3_MAX_CONCURRENCY * 2, retries={"max_attempts": 5}),
+            )
+            _s3_clients[key] = client
+        return client
+
+
+def s3_url(s3_key: str, request: VideoCompositionRequest) -> str:
+    """Get the URL of an uploaded object; custom endpoints (MinIO, moto) use path-style URLs."""
+    if request.s3_endpoint_url:
+        return f"{request.s3_endpoint_url.rstrip('/')}/{request.s3_bucket}/{s3_key}"
+    return f"https://{request.s3_bucket}.s3.{request.s3_region or 'us-east-1'}.amazonaws.com/{s3_key}"
+
+
+def s3_content_type(s3_key: str) -> str:
+    """Get the content type an output is uploaded with."""
+    return "video/mp4" if s3_key.endswith(".mp4") else "application/zip"
+
+
+def upload_to_s3(file_path: Path, s3_key: str, request: VideoCompositionRequest) -> Optional[str]:
+    """Upload file to S3 and return URL.
+
+    Files above S3_PART_SIZE go up as a multipart upload of S3_MAX_CONCURRENCY
+    parallel parts.
+    """
+    if not s3_configured(request):
+        return None
+
+    try:
+        from boto3.s3.transfer import TransferConfig
+
+        get_s3_client(request).upload_file(
+            str(file_path),
+            request.s3_bucket,
+            s3_key,
+            ExtraArgs={"ContentType": s3_content_type(s3_key)},
+            Config=TransferConfig(
+                multipart_threshold=S3_PART_SIZE,
+                multipart_chunksize=S3_PART_SIZE,
+                max_concurrency=S3_MAX_CONCURRENCY,
+            ),
+        )
+
+        url = s3_url(s3_key, request)
+        print(f"Uploaded to S3: {url}")
+        return url
+    except Exception as e:
+        print(f"S3 upload failed: {e}")
+        return None
+
+
+class S3StreamingUpload:
+    """Multipart upload of a file while its writer is still producing it.
+
+    A background thread tails the file and uploads every S3_PART_SIZE bytes as a
+    part as soon as they are on disk; finish() uploads the remainder as the last
+    part once the writer is done and completes the upload. Only files whose written
+    bytes never change can be streamed, such as fragmented MP4 with an empty moov.
+    """
+
+    def __init__(self, path: Path, s3_key: str, request: VideoCompositionRequest):
+        self.path = path
+        self.s3_key = s3_key
+        self.request = request
+        self.client = get_s3_client(request)
+        self.upload_id = self.client.create_multipart_upload(
+            Bucket=request.s3_bucket, Key=s3_key, ContentType=s3_content_type(s3_key)
+        )["UploadId"]
+        self.parts = []
+        self.offset = 0
+        self.error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _upload_part(self, f, size: int) -> None:
+        f.seek(self.offset)
+        body = f.read(size)
+        number = len(self.parts) + 1
+        etag = self.client.upload_part(
+            Bucket=self.request.s3_bucket, Key=self.s3_key, UploadId=self.upload_id,
+            PartNumber=number, Body=body,
+        )["ETag"]
+        self.parts.append({"PartNumber": number, "ETag": etag})
+        self.offset += len(body)
+
+    def _run(self) -> None:
+        try:
+            while not self._done.is_set():
+                try:
+                    size = self.path.stat().st_size
+                except FileNotFoundError:
+                    size = 0
+                if size - self.offset >= S3_PART_SIZE:
+                    with open(self.path, "rb") as f:
+                        self._upload_part(f, S3_PART_SIZE)
+                else:
+                    self._done.wait(S3_POLL_INTERVAL)
+        except Exception as e:
+            self.error = e
+
+    def finish(self, ok: bool) -> Optional[str]:
+        """Upload the rest once the file is complete and return its URL; abort if not ok."""
+        self._done.set()
+        self._thread.join()
+        try:
+            if ok and self.error is None:
+                with open(self.path, "rb") as f:
+                    # The last part may be smaller than S3_PART_SIZE
+                    remaining = self.path.stat().st_size - self.offset
+                    if remaining > 0 or not self.parts:
+                        self._upload_part(f, remaining)
+                self.client.complete_multipart_upload(
+                    Bucket=self.request.s3_bucket, Key=self.s3_key, UploadId=self.upload_id,
+                    MultipartUpload={"Parts": self.parts},
+                )
+                url = s3_url(self.s3_key, self.request)
+                print(f"Streamed to S3 in {len(self.parts)} part(s): {url}")
+                return url
+            if self.error:
+                print(f"S3 streaming upload failed: {self.error}")
+        except Exception as e:
+            print(f"S3 streaming upload failed: {e}")
+        try:
+            self.client.abort_multipart_upload(Bucket=self.request.s3_bucket, Key=self.s3_key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"  Multipart abort failed: {e}")
+        return None
+
+
+# Rendered files kept on the vectcut-cache volume for the download endpoint
+ARTIFACT_DIR = "/cache/artifacts"
+ARTIFACT_TTL = float(os.environ.get("VECTCUT_ARTIFACT_TTL_HOURS", "24")) * 3600
+
+
+class ArtifactStore:
+    """Rendered files served by the download endpoint.
+
+    put() copies a job's files into a directory named by a random token and returns
+    one handle per file, "<token>/<file name>"; the unguessable token is all a
+    download needs. Artifacts expire ttl seconds after they were stored.
+    """
+
+    def __init__(self, root: Path, ttl: float = ARTIFACT_TTL):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def put(self, files: list[Path]) -> list[str]:
+        """Store files together and return their handles, after expiring old artifacts."""
+        self.expire()
+        token = secrets.token_hex(16)
+        tmp_dir = self.root / f".{token}.tmp"
+        tmp_dir.mkdir()
+        for path in files:
+            shutil.copyfile(path, tmp_dir / path.name)
+        os.replace(tmp_dir, self.root / token)
+        return [f"{token}/{path.name}" for path in files]
+
+    def path(self, handle: str) -> Optional[Path]:
+        """Get the file behind a handle, or None for malformed handles."""
+        token, _, name = handle.partition("/")
+        if len(token) != 32 or not all(c in "0123456789abcdef" for c in token):
+            return None
+        if name not in ("final.mp4", "capcut_draft.zip"):
+            return None
+        return self.root / token / name
+
+    def expire(self) -> int:
+        """Delete artifacts stored more than ttl seconds ago."""
+        expired = 0
+        now = time.time()
+        for entry in self.root.glob("[!.]*"):
+            try:
+                stale = now - entry.stat().st_mtime > self.ttl
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(entry, ignore_errors=True)
+                expired += 1
+        return expired